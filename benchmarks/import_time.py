@@ -0,0 +1,131 @@
+"""Import time of the client, measured with `python -X importtime` in fresh interpreters.
+
+Each statement is executed in a new interpreter and the cumulative import time of all modules it imports
+is summed up. The best of several runs is compared against a budget, and certain heavy dependencies
+must not be imported at all. The exit code is 1 if a budget is exceeded.
+
+Run from the repository root:
+
+python -m benchmarks.import_time --output import_time.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+
+from mass_api_client.__version__ import __version__
+
+# Statement -> (budget in milliseconds, modules which must not be imported)
+BUDGETS = {
+    'import mass_api_client': (25, ['requests', 'marshmallow', 'mass_api_client.resources']),
+    'from mass_api_client import ConnectionManager': (120, ['requests', 'marshmallow']),
+    'from mass_api_client.resources import Sample': (150, ['requests', 'marshmallow']),
+}
+
+
+def parse_importtime(output):
+    """
+    :param output: The stderr output of `python -X importtime`.
+    :return: A tuple of the cumulative import time in microseconds of the top-level imports
+             after interpreter startup and the names of all modules imported after startup.
+    """
+    total = 0
+    modules = []
+    started = False
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            cumulative = int(cumulative)
+        except ValueError:
+            continue
+
+        if not started:
+            # Everything up to and including `site` is imported at interpreter startup.
+            started = name.strip() == 'site' and not name.startswith('  ')
+            continue
+
+        modules.append(name.strip())
+        if not name[1:].startswith(' '):
+            total += cumulative
+
+    return total, modules
+
+
+def measure(statement, repeat=5):
+    """
+    :return: A dictionary with the best and median import time in milliseconds and the imported modules.
+    """
+    timings = []
+    modules = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+        total, modules = parse_importtime(result.stderr)
+        timings.append(total / 1000)
+
+    timings.sort()
+    return {'best_milliseconds': timings[0], 'median_milliseconds': timings[len(timings) // 2],
+            'modules': len(modules), 'imported': modules}
+
+
+def check(results, budgets=BUDGETS, timing=True):
+    """
+    :param timing: Whether to check the time budgets. Otherwise only the forbidden imports are checked,
+                   which does not depend on the speed of the machine.
+    :return: A list of human readable budget violations.
+    """
+    violations = []
+    for statement, (budget, forbidden) in sorted(budgets.items()):
+        result = results[statement]
+        if timing and result['best_milliseconds'] > budget:
+            violations.append('{}: {:.1f} ms exceeds the budget of {} ms'.format(
+                statement, result['best_milliseconds'], budget))
+        for module in forbidden:
+            if module in result['imported']:
+                violations.append('{}: imports {}'.format(statement, module))
+    return violations
+
+
+def run(statements=None, repeat=5):
+    results = {}
+    for statement in statements or sorted(BUDGETS):
+        results[statement] = measure(statement, repeat)
+        print('{:<48} {:.1f} ms, {} modules'.format(statement, results[statement]['best_milliseconds'],
+                                                   results[statement]['modules']), file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    results = run(repeat=args.repeat)
+    violations = check(results)
+    for violation in violations:
+        print(violation, file=sys.stderr)
+
+    output = {
+        'version': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'benchmarks': {statement: {key: value for key, value in result.items() if key != 'imported'}
+                       for statement, result in results.items()},
+        'violations': violations,
+    }
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(output, fp, indent=2, sort_keys=True)
+    else:
+        json.dump(output, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
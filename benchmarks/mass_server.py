@@ -0,0 +1,461 @@
+"""A local in-process stand-in for the MASS server API.
+
+The server keeps all objects in memory and only implements what the client needs for benchmarks and tests:
+paginated lists, detail views, file and report object downloads, file and report submission.
+
+Example
+-------
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager
+from mass_api_client.resources import Sample
+
+with MassStandInServer(sample_count=1000, latency=0.005) as server:
+    ConnectionManager().register_connection('default', 'key', server.base_url)
+    samples = list(Sample.items())
+"""
+import email.parser
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit, parse_qsl
+
+from mass_api_client import compression
+
+DATE = '2016-10-21T14:20:25+00:00'
+ANALYSIS_SYSTEM_ID = 'benchmark'
+ANALYSIS_SYSTEM_INSTANCE_UUID = '5a391093-f251-4c08-991d-26fc5e0e5793'
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class MassStandInServer:
+    def __init__(self, sample_count=100, report_count=None, scheduled_analysis_count=0, page_size=50,
+                 file_size=64 * 1024, report_object_size=1000, latency=0.0, include_count=True, download_encoding=None,
+                 bulk_endpoints=False, max_concurrent_posts=None, host='127.0.0.1'):
+        """
+        :param sample_count: The number of file samples available at start.
+        :param report_count: The number of reports available at start. Defaults to `sample_count`.
+        :param scheduled_analysis_count: The number of scheduled analyses for the analysis system instance.
+        :param page_size: The default number of objects per page.
+        :param file_size: The size in bytes of each sample file.
+        :param report_object_size: The number of strings in each JSON report object.
+        :param latency: The time in seconds each request is delayed.
+        :param include_count: Whether list responses contain the total number of objects as `count`.
+        :param download_encoding: If set, e.g. to 'gzip', files are sent compressed to clients accepting the encoding.
+        :param bulk_endpoints: Whether scheduled analyses and analysis requests can be created in bulk.
+        :param max_concurrent_posts: If set, POST requests beyond this number of concurrent ones are answered with 503.
+        :param host: The interface to bind to. A free port is chosen automatically.
+        """
+        self.page_size = page_size
+        self.file_size = file_size
+        self.report_object_size = report_object_size
+        self.latency = latency
+        self.include_count = include_count
+        self.download_encoding = download_encoding
+        self.bulk_endpoints = bulk_endpoints
+        self.max_concurrent_posts = max_concurrent_posts
+        self.host = host
+
+        self.request_count = 0
+        self.received_bytes = 0
+        self.concurrent_posts = 0
+        self.rejected_posts = 0
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._file_content = (bytes(range(256)) * (file_size // 256 + 1))[:file_size]
+        self._compressed_files = {}
+
+        self.samples = {}
+        self.files = {}
+        self.reports = {}
+        self.scheduled_analyses = {}
+        self.analysis_requests = {}
+        self.sample_relations = {}
+
+        self._httpd = None
+        self._thread = None
+        self.base_url = None
+
+        for _ in range(sample_count):
+            self.add_file_sample()
+        sample_ids = list(self.samples)
+        for i in range(sample_count if report_count is None else report_count):
+            if sample_ids:
+                self.add_report(sample_ids[i % len(sample_ids)])
+        for i in range(scheduled_analysis_count):
+            if sample_ids:
+                self.add_scheduled_analysis(sample_ids[i % len(sample_ids)])
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        server = self
+
+        class Handler(_Handler):
+            mass = server
+
+        self._httpd = _ThreadingHTTPServer((self.host, 0), Handler)
+        self.base_url = 'http://{}:{}/api/'.format(self.host, self._httpd.server_address[1])
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+
+    def _new_id(self):
+        with self._lock:
+            self._next_id += 1
+            return '{:024x}'.format(self._next_id)
+
+    def _url(self, path):
+        # Objects are created before the server is started, so the urls are built relative to a placeholder.
+        return '{{base_url}}{}'.format(path)
+
+    def add_file_sample(self, content=None, filename='file.bin', tags=None):
+        sample_id = self._new_id()
+        if content is None:
+            content = self._file_content
+
+        self.files[sample_id] = content
+        self.samples[sample_id] = {
+            '_cls': 'Sample.FileSample',
+            'delivery_date': DATE,
+            'dispatched_to': [],
+            'file': self._url('sample/{}/download/'.format(sample_id)),
+            'file_names': [filename],
+            'file_size': len(content),
+            'first_seen': DATE,
+            'id': sample_id,
+            'magic_string': 'data',
+            'md5sum': hashlib.md5(content).hexdigest(),
+            'mime_type': 'application/octet-stream',
+            'sha1sum': hashlib.sha1(content).hexdigest(),
+            'sha256sum': hashlib.sha256(content).hexdigest(),
+            'sha512sum': hashlib.sha512(content).hexdigest(),
+            'shannon_entropy': 8.0,
+            'ssdeep_hash': '3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C',
+            'tags': list(tags or ['sample-type:filesample']),
+            'tlp_level': 0,
+            'url': self._url('sample/{}/'.format(sample_id)),
+        }
+        return self.samples[sample_id]
+
+    def add_report(self, sample_id, json_report_objects=('strings',)):
+        report_id = self._new_id()
+        self.reports[report_id] = {
+            'additional_metadata': {},
+            'analysis_date': DATE,
+            'analysis_system': self._url('analysis_system/{}/'.format(ANALYSIS_SYSTEM_ID)),
+            'error_message': None,
+            'id': report_id,
+            'json_report_objects': {key: self._url('report/{}/json_report_object/{}/'.format(report_id, key))
+                                    for key in json_report_objects},
+            'raw_report_objects': {},
+            'sample': self._url('sample/{}/'.format(sample_id)),
+            'status': 0,
+            'tags': [],
+            'upload_date': DATE,
+            'url': self._url('report/{}/'.format(report_id)),
+        }
+        return self.reports[report_id]
+
+    def add_scheduled_analysis(self, sample_id, priority=0, analysis_scheduled=DATE):
+        scheduled_analysis_id = self._new_id()
+        self.scheduled_analyses[scheduled_analysis_id] = {
+            'analysis_scheduled': analysis_scheduled,
+            'analysis_system_instance': self._url('analysis_system_instance/{}/'.format(ANALYSIS_SYSTEM_INSTANCE_UUID)),
+            'id': scheduled_analysis_id,
+            'priority': priority,
+            'sample': self._url('sample/{}/'.format(sample_id)),
+            'url': self._url('scheduled_analysis/{}/'.format(scheduled_analysis_id)),
+        }
+        return self.scheduled_analyses[scheduled_analysis_id]
+
+    def add_sample_relation(self, sample_id, other_id, relation_type='dropped_by', **extra):
+        sample_relation_id = self._new_id()
+        self.sample_relations[sample_relation_id] = dict(extra, **{
+            '_cls': 'SampleRelation.{}SampleRelation'.format(
+                ''.join(part.capitalize() for part in relation_type.split('_'))),
+            'id': sample_relation_id,
+            'other': self._url('sample/{}/'.format(other_id)),
+            'sample': self._url('sample/{}/'.format(sample_id)),
+            'url': self._url('sample_relation/{}/'.format(sample_relation_id)),
+        })
+        return self.sample_relations[sample_relation_id]
+
+    def create_sample_relation(self, relation_type, data):
+        sample_id = self._sample_id(data.get('sample'))
+        other_id = self._sample_id(data.get('other'))
+        if sample_id is None or other_id is None:
+            return {'error': 'Unknown sample'}
+        extra = {key: value for key, value in data.items() if key not in ('sample', 'other', '_cls')}
+        return self.add_sample_relation(sample_id, other_id, relation_type, **extra)
+
+    def relation_graph(self, sample_id):
+        url = self._url('sample/{}/'.format(sample_id))
+        return [r for r in self.sample_relations.values() if url in (r['sample'], r['other'])]
+
+    def _sample_id(self, url):
+        if url is None:
+            return None
+        sample_id = str(url).rstrip('/').rsplit('/', 1)[-1]
+        return sample_id if sample_id in self.samples else None
+
+    def create_scheduled_analysis(self, data):
+        sample_id = self._sample_id(data.get('sample'))
+        if sample_id is None:
+            return {'error': 'Unknown sample'}
+        return self.add_scheduled_analysis(sample_id, priority=data.get('priority', 0))
+
+    def create_analysis_request(self, data):
+        sample_id = self._sample_id(data.get('sample'))
+        if sample_id is None:
+            return {'error': 'Unknown sample'}
+        analysis_request_id = self._new_id()
+        self.analysis_requests[analysis_request_id] = {
+            'analysis_requested': DATE,
+            'analysis_system': data['analysis_system'],
+            'id': analysis_request_id,
+            'priority': data.get('priority', 0),
+            'sample': self._url('sample/{}/'.format(sample_id)),
+            'url': self._url('analysis_request/{}/'.format(analysis_request_id)),
+        }
+        return self.analysis_requests[analysis_request_id]
+
+    def analysis_system_instance(self):
+        return {
+            'analysis_system': self._url('analysis_system/{}/'.format(ANALYSIS_SYSTEM_ID)),
+            'id': '5834ae94a7a7f11e52b06287',
+            'is_online': True,
+            'last_seen': DATE,
+            'scheduled_analyses_count': len(self.scheduled_analyses),
+            'url': self._url('analysis_system_instance/{}/'.format(ANALYSIS_SYSTEM_INSTANCE_UUID)),
+            'uuid': ANALYSIS_SYSTEM_INSTANCE_UUID,
+        }
+
+    def json_report_object(self):
+        return ['string {}'.format(i) for i in range(self.report_object_size)]
+
+    def create_file_sample(self, files, metadata):
+        filename, content = files['file']
+        sha256sum = hashlib.sha256(content).hexdigest()
+        for sample in self.samples.values():
+            if sample.get('sha256sum') == sha256sum:
+                return sample
+        return self.add_file_sample(content, filename=filename, tags=metadata.get('tags'))
+
+    def submit_report(self, scheduled_analysis_id, files, metadata):
+        scheduled_analysis = self.scheduled_analyses.pop(scheduled_analysis_id, None)
+        if scheduled_analysis is None:
+            return None
+
+        sample_id = scheduled_analysis['sample'].rstrip('/').rsplit('/', 1)[1]
+        report = self.add_report(sample_id, json_report_objects=[key for key in files if key != 'metadata'])
+        report['tags'] = metadata.get('tags', [])
+        report['additional_metadata'] = metadata.get('additional_metadata', {})
+        return report
+
+    def page(self, objects, path, query):
+        objects = _filter(objects, query)
+        page = int(query.get('page', 1))
+        per_page = int(query.get('per_page', self.page_size))
+        start = (page - 1) * per_page
+        results = [_project(o, query) for o in objects[start:start + per_page]]
+
+        def page_url(number):
+            params = dict(query, page=number)
+            return self._url('{}?{}'.format(path, '&'.join('{}={}'.format(k, v) for k, v in sorted(params.items()))))
+
+        response = {
+            'next': page_url(page + 1) if start + per_page < len(objects) else None,
+            'previous': page_url(page - 1) if page > 1 else None,
+            'results': results,
+        }
+        if self.include_count:
+            response['count'] = len(objects)
+        return response
+
+
+def _project(obj, query):
+    if not query.get('fields'):
+        return obj
+    fields = query['fields'].split(',')
+    return {key: value for key, value in obj.items() if key in fields}
+
+
+def _filter(objects, query):
+    for key, value in query.items():
+        if key in ('page', 'per_page', 'fields', 'depth'):
+            continue
+        if key == 'tags__all':
+            tags = value.split(',')
+            objects = [o for o in objects if all(tag in o.get('tags', []) for tag in tags)]
+        elif key.endswith('__startswith'):
+            field = key[:-len('__startswith')]
+            objects = [o for o in objects if str(o.get(field, '')).startswith(value)]
+        else:
+            objects = [o for o in objects if str(o.get(key, '')) == value]
+    return objects
+
+
+class _Handler(BaseHTTPRequestHandler):
+    mass = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch(self._get_routes())
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.body = self.rfile.read(length)
+        with self.mass._lock:
+            self.mass.received_bytes += length
+            self.mass.concurrent_posts += 1
+            overloaded = (self.mass.max_concurrent_posts is not None and
+                          self.mass.concurrent_posts > self.mass.max_concurrent_posts)
+            self.mass.rejected_posts += overloaded
+        try:
+            if overloaded:
+                return self._send_json({'error': 'Service unavailable'}, status=503)
+            self.body = _decompress(self.body, self.headers.get('Content-Encoding'))
+            self._dispatch(self._post_routes())
+        finally:
+            with self.mass._lock:
+                self.mass.concurrent_posts -= 1
+
+    def _dispatch(self, routes):
+        with self.mass._lock:
+            self.mass.request_count += 1
+        if self.mass.latency:
+            time.sleep(self.mass.latency)
+
+        split = urlsplit(self.path)
+        self.query = dict(parse_qsl(split.query))
+        for pattern, handler in routes:
+            match = re.match('^/api/{}$'.format(pattern), split.path)
+            if match:
+                return handler(*match.groups())
+        self._send_json({'error': 'Not found'}, status=404)
+
+    def _get_routes(self):
+        mass = self.mass
+        return [
+            (r'sample/', lambda: self._send_page(list(mass.samples.values()), 'sample/')),
+            (r'sample/(\w+)/', lambda i: self._send_object(mass.samples.get(i))),
+            (r'sample/(\w+)/download/', self._send_file),
+            (r'sample/(\w+)/reports/', lambda i: self._send_page(
+                [r for r in mass.reports.values() if r['sample'] == mass._url('sample/{}/'.format(i))],
+                'sample/{}/reports/'.format(i))),
+            (r'sample/(\w+)/relation_graph/', lambda i: self._send_page(mass.relation_graph(i),
+                                                                        'sample/{}/relation_graph/'.format(i))),
+            (r'sample_relation/', lambda: self._send_page(list(mass.sample_relations.values()), 'sample_relation/')),
+            (r'sample_relation/(\w+)/', lambda i: self._send_object(mass.sample_relations.get(i))),
+            (r'report/', lambda: self._send_page(list(mass.reports.values()), 'report/')),
+            (r'report/(\w+)/', lambda i: self._send_object(mass.reports.get(i))),
+            (r'report/(\w+)/json_report_object/(\w+)/', lambda i, key: self._send_json(mass.json_report_object())),
+            (r'scheduled_analysis/', lambda: self._send_page(list(mass.scheduled_analyses.values()),
+                                                             'scheduled_analysis/')),
+            (r'scheduled_analysis/(\w+)/', lambda i: self._send_object(mass.scheduled_analyses.get(i))),
+            (r'analysis_system_instance/([\w-]+)/', lambda i: self._send_object(mass.analysis_system_instance())),
+            (r'analysis_system_instance/([\w-]+)/scheduled_analyses/', lambda i: self._send_page(
+                list(mass.scheduled_analyses.values()),
+                'analysis_system_instance/{}/scheduled_analyses/'.format(i))),
+        ]
+
+    def _post_routes(self):
+        mass = self.mass
+        return [
+            (r'sample/submit_file/', lambda: self._send_object(mass.create_file_sample(*self._multipart()),
+                                                               status=201)),
+            (r'scheduled_analysis/(\w+)/submit_report/', lambda i: self._send_object(mass.submit_report(
+                i, *self._multipart()), status=201)),
+            (r'scheduled_analysis/', lambda: self._send_created(mass.create_scheduled_analysis)),
+            (r'analysis_request/', lambda: self._send_created(mass.create_analysis_request)),
+            (r'sample_relation/submit_(\w+)/', lambda relation_type: self._send_created(
+                lambda data: mass.create_sample_relation(relation_type, data))),
+            (r'scheduled_analysis/bulk/', lambda: self._send_bulk(mass.create_scheduled_analysis)),
+            (r'analysis_request/bulk/', lambda: self._send_bulk(mass.create_analysis_request)),
+        ]
+
+    def _send_created(self, create):
+        obj = create(json.loads(self.body.decode()))
+        self._send_json(obj, status=400 if 'error' in obj else 201)
+
+    def _send_bulk(self, create):
+        if not self.mass.bulk_endpoints:
+            return self._send_json({'error': 'Not found'}, status=404)
+        self._send_json([create(data) for data in json.loads(self.body.decode())], status=201)
+
+    def _multipart(self):
+        message = email.parser.BytesParser().parsebytes(
+            'Content-Type: {}\r\n\r\n'.format(self.headers['Content-Type']).encode() + self.body)
+        files = {}
+        for part in message.get_payload():
+            payload = _decompress(part.get_payload(decode=True), part.get('Content-Encoding'))
+            files[part.get_param('name', header='content-disposition')] = (part.get_filename(), payload)
+        metadata = json.loads(files.pop('metadata')[1].decode())
+        return files, metadata
+
+    def _send_page(self, objects, path):
+        self._send_json(self.mass.page(objects, path, self.query))
+
+    def _send_object(self, obj, status=200):
+        if obj is None:
+            return self._send_json({'error': 'Not found'}, status=404)
+        self._send_json(_project(obj, self.query), status=status)
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).replace('{base_url}', self.mass.base_url).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_file(self, sample_id):
+        content = self.mass.files.get(sample_id)
+        if content is None:
+            return self._send_json({'error': 'Not found'}, status=404)
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        encoding = self.mass.download_encoding
+        if encoding and encoding in self.headers.get('Accept-Encoding', ''):
+            key = (sample_id, encoding)
+            if key not in self.mass._compressed_files:
+                self.mass._compressed_files[key] = compression.compress(content, encoding)
+            content = self.mass._compressed_files[key]
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        view = memoryview(content)
+        for start in range(0, len(content), 64 * 1024):
+            self.wfile.write(view[start:start + 64 * 1024])
+
+
+def _decompress(data, encoding):
+    if not encoding:
+        return data
+    decompressor = compression.decompressor(encoding)
+    return decompressor.decompress(data) + decompressor.flush()
@@ -0,0 +1,247 @@
+"""End-to-end benchmarks of the client against a local stand-in MASS server.
+
+Run from the repository root:
+
+python -m benchmarks.run --output results.json
+python -m benchmarks.run --compare results.json
+
+The results are written as JSON, so they can be compared between versions.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager
+from mass_api_client.__version__ import __version__
+from mass_api_client.fingerprint import fingerprint as fingerprint_file, shannon_entropy
+from mass_api_client.hashing import ALGORITHMS, hash_file
+from mass_api_client.relation_writer import RelationWriter
+from mass_api_client.resources import Sample, FileSample, Report
+from mass_api_client.tag_filter import TagFilter, TagFilterIndex
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def _timed(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), sorted(timings)[len(timings) // 2], result
+
+
+def _result(best, median, **values):
+    values.update({'best_seconds': best, 'median_seconds': median})
+    return values
+
+
+@benchmark
+def pagination(args):
+    with MassStandInServer(sample_count=args.samples, page_size=args.page_size, latency=args.latency) as server:
+        ConnectionManager().register_connection('default', 'benchmark', server.base_url)
+        best, median, count = _timed(lambda: sum(1 for _ in Sample.items()), args.repeat)
+    return _result(best, median, objects=count, objects_per_second=count / best)
+
+
+@benchmark
+def sequential_pagination(args):
+    with MassStandInServer(sample_count=args.samples, page_size=args.page_size, latency=args.latency) as server:
+        ConnectionManager().register_connection('default', 'benchmark', server.base_url)
+        best, median, count = _timed(lambda: sum(1 for _ in Sample.items(max_workers=1)), args.repeat)
+    return _result(best, median, objects=count, objects_per_second=count / best)
+
+
+@benchmark
+def detail_lookups(args):
+    with MassStandInServer(sample_count=args.lookups, latency=args.latency) as server:
+        ConnectionManager().register_connection('default', 'benchmark', server.base_url)
+        ids = list(server.samples)
+        best, median, _ = _timed(lambda: [Sample.get(i) for i in ids], args.repeat)
+    return _result(best, median, lookups=len(ids), lookups_per_second=len(ids) / best)
+
+
+@benchmark
+def report_lookups(args):
+    with MassStandInServer(sample_count=1, report_count=args.lookups, latency=args.latency) as server:
+        ConnectionManager().register_connection('default', 'benchmark', server.base_url)
+        ids = list(server.reports)
+        best, median, _ = _timed(lambda: [Report.get(i).json_reports for i in ids], args.repeat)
+    return _result(best, median, lookups=len(ids), lookups_per_second=len(ids) / best)
+
+
+@benchmark
+def upload(args):
+    size = args.file_size
+    with MassStandInServer(sample_count=0, latency=args.latency) as server:
+        ConnectionManager().register_connection('default', 'benchmark', server.base_url, timeout=60)
+        counter = iter(range(sys.maxsize))
+
+        def upload_file():
+            content = next(counter).to_bytes(8, 'big') + bytes(size - 8)
+            FileSample.create('file.bin', io.BytesIO(content))
+
+        best, median, _ = _timed(upload_file, args.repeat)
+    return _result(best, median, bytes=size, megabytes_per_second=size / best / 1e6)
+
+
+@benchmark
+def download(args):
+    size = args.file_size
+    with MassStandInServer(sample_count=1, file_size=size, latency=args.latency) as server:
+        ConnectionManager().register_connection('default', 'benchmark', server.base_url, timeout=60)
+        sample = Sample.get(next(iter(server.samples)))
+
+        def download_file():
+            with sample.temporary_file() as f:
+                return f.tell()
+
+        best, median, downloaded = _timed(download_file, args.repeat)
+    return _result(best, median, bytes=downloaded, megabytes_per_second=downloaded / best / 1e6)
+
+
+def run(args):
+    names = args.benchmarks or sorted(BENCHMARKS)
+    results = {}
+    for name in names:
+        results[name] = BENCHMARKS[name](args)
+        print('{:<20} {}'.format(name, json.dumps(results[name], sort_keys=True)), file=sys.stderr)
+
+    return {
+        'version': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'parameters': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'benchmarks': results,
+    }
+
+
+def compare(old, new):
+    """
+    :return: A list of (benchmark, metric, old value, new value, ratio) tuples for all throughput metrics.
+    """
+    rows = []
+    for name, values in sorted(new['benchmarks'].items()):
+        for metric, value in sorted(values.items()):
+            if metric.endswith('_per_second') and metric in old['benchmarks'].get(name, {}):
+                old_value = old['benchmarks'][name][metric]
+                rows.append((name, metric, old_value, value, value / old_value if old_value else float('inf')))
+    return rows
+
+
+@benchmark
+def relations(args):
+    # Enough samples for the number of distinct relations written in each run.
+    sample_count = int(args.lookups ** 0.5) + 2
+    with MassStandInServer(sample_count=sample_count, report_count=0, latency=args.latency) as server:
+        ConnectionManager().register_connection('default', 'benchmark', server.base_url)
+        urls = [s.url for s in Sample.items()]
+        pairs = [(sample, other) for sample in urls for other in urls if sample != other][:args.lookups]
+
+        def write_relations():
+            with RelationWriter(skip_existing=False) as writer:
+                for sample, other in pairs:
+                    writer.write(sample, other, 'ssdeep', {'match': 50})
+            return writer.stats.created
+
+        best, median, created = _timed(write_relations, args.repeat)
+    return _result(best, median, relations=created, relations_per_second=created / best)
+
+
+@benchmark
+def fingerprint(args):
+    size = args.file_size
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(os.urandom(size // 2) + bytes(size - size // 2))
+
+        def separate_passes():
+            for algorithm in ALGORITHMS:
+                hash_file(path, algorithms=(algorithm,))
+            with open(path, 'rb') as f:
+                shannon_entropy(f.read())
+
+        best, median, _ = _timed(lambda: fingerprint_file(path), args.repeat)
+        separate_best, _, _ = _timed(separate_passes, args.repeat)
+    finally:
+        os.remove(path)
+    return _result(best, median, bytes=size, megabytes_per_second=size / best / 1e6,
+                   separate_passes_megabytes_per_second=size / separate_best / 1e6)
+
+
+@benchmark
+def tag_routing(args):
+    # One analysis system per family tag, a few per sample type and a few selecting by negation.
+    families = ['family:{}'.format(i) for i in range(500)]
+    expressions = ['sample-type:filesample and {} and not tag:benign'.format(family) for family in families]
+    expressions += ['sample-type:{} and not tag:packed'.format(t) for t in ('filesample', 'domainsample', 'ipsample')]
+    expressions += ['not tag:benign and not tag:whitelisted', '(tag:packed or tag:signed) and not family:0']
+    filters = [TagFilter(expression) for expression in expressions]
+    index = TagFilterIndex()
+    for i, tag_filter in enumerate(filters):
+        index.add(i, tag_filter)
+
+    tag_sets = [frozenset(['sample-type:filesample', families[i % len(families)],
+                           'tag:packed' if i % 3 else 'tag:benign']) for i in range(args.samples)]
+
+    def evaluate_all():
+        return sum(1 for tags in tag_sets for tag_filter in filters if tag_filter(tags))
+
+    best, median, routed = _timed(lambda: sum(len(index.match(tags)) for tags in tag_sets), args.repeat)
+    all_best, _, all_routed = _timed(evaluate_all, args.repeat)
+    if routed != all_routed:
+        raise RuntimeError('The index found {} routes instead of {}.'.format(routed, all_routed))
+    return _result(best, median, samples=len(tag_sets), filters=len(filters), routes=routed,
+                   samples_per_second=len(tag_sets) / best, all_filters_samples_per_second=len(tag_sets) / all_best)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('benchmarks', nargs='*',
+                        help='Benchmarks to run (default: all): {}'.format(', '.join(sorted(BENCHMARKS))))
+    parser.add_argument('--samples', type=int, default=2000, help='Number of samples for pagination')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--lookups', type=int, default=200, help='Number of detail lookups')
+    parser.add_argument('--file-size', type=int, default=16 * 1024 * 1024, help='Size in bytes of up- and downloads')
+    parser.add_argument('--latency', type=float, default=0.0, help='Simulated server latency in seconds')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Compare the results with a previous JSON result file')
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error('Unknown benchmark: {}'.format(name))
+
+    results = run(args)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    if args.compare:
+        with open(args.compare) as fp:
+            old = json.load(fp)
+        for row in compare(old, results):
+            print('{:<20} {:<28} {:>14.2f} {:>14.2f} {:>7.2f}x'.format(*row), file=sys.stderr)
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
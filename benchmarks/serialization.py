@@ -0,0 +1,234 @@
+"""Micro-benchmarks of the (de)serialization hot paths of the resources.
+
+For each schema in :mod:`mass_api_client.schemas` realistic payloads are generated and the following paths
+are measured per item:
+
+- deserialize: `BaseResource._deserialize` of a single object
+- deserialize_page: `BaseResource._deserialize(many=True)` of a page of objects
+- create_instance: `BaseResource._create_instance_from_data`
+- to_json: `BaseResource._to_json`
+- dump: `schema.dump` of the creation arguments, as done by `BaseResource._create`
+
+Besides the time per item, `tracemalloc` reports the peak memory and the number of memory blocks
+still allocated by the results per item.
+
+Run from the repository root:
+
+python -m benchmarks.serialization --output serialization.json
+"""
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from mass_api_client.__version__ import __version__
+from mass_api_client.resources import AnalysisRequest, AnalysisSystem, AnalysisSystemInstance, Report, \
+    ScheduledAnalysis, DomainSample, IPSample, URISample, FileSample, ExecutableBinarySample, SampleRelation, \
+    DroppedBySampleRelation, ResolvedBySampleRelation, RetrievedBySampleRelation, ContactedBySampleRelation, \
+    SsdeepSampleRelation
+
+BASE_URL = 'http://localhost:5000/api/'
+DATE = '2016-11-08T17:03:46+00:00'
+
+
+def _id(i):
+    return '{:024x}'.format(i)
+
+
+def _url(path, i):
+    return '{}{}/{}/'.format(BASE_URL, path, _id(i))
+
+
+def _sample(cls, i, **fields):
+    data = {
+        '_cls': cls,
+        'delivery_date': DATE,
+        'dispatched_to': [],
+        'first_seen': DATE,
+        'id': _id(i),
+        'tags': ['sample-type:{}'.format(cls.rsplit('.', 1)[-1].lower()), 'tag:{}'.format(i % 10)],
+        'tlp_level': 0,
+        'url': _url('sample', i),
+    }
+    data.update(fields)
+    return data
+
+
+def _file_fields(i):
+    return {
+        'file': '{}download/'.format(_url('sample', i)),
+        'file_names': ['file{}.bin'.format(i)],
+        'file_size': 1024 * i,
+        'magic_string': 'PE32 executable (GUI) Intel 80386, for MS Windows',
+        'md5sum': '{:032x}'.format(i),
+        'mime_type': 'application/x-dosexec',
+        'sha1sum': '{:040x}'.format(i),
+        'sha256sum': '{:064x}'.format(i),
+        'sha512sum': '{:0128x}'.format(i),
+        'shannon_entropy': 7.5,
+        'ssdeep_hash': '3145728:6eav2yDMNmp6r/dzWev0t/FT774wflib+/dhwK8Jc4Fi2:/av2X/vKZ7vflY+/58',
+    }
+
+
+def _strings(prefix, count):
+    return ['{} {}'.format(prefix, j) for j in range(count)]
+
+
+def generate_payloads(strings=5000, events=500):
+    """
+    :param strings: The number of strings of each :class:`ExecutableBinarySample`.
+    :param events: The number of imports, sections, resources and events of each :class:`ExecutableBinarySample`.
+    :return: A dictionary mapping a name to a tuple of the resource class and a function creating the i-th payload.
+    """
+    relation_classes = [DroppedBySampleRelation, ResolvedBySampleRelation, RetrievedBySampleRelation,
+                        ContactedBySampleRelation, SsdeepSampleRelation]
+
+    def relation(i):
+        cls = relation_classes[i % len(relation_classes)]
+        data = {'_cls': cls._class_identifier, 'id': _id(i), 'url': _url('sample_relation', i),
+                'sample': _url('sample', i), 'other': _url('sample', i + 1)}
+        if cls is SsdeepSampleRelation:
+            data['match'] = 85.0
+        return data
+
+    def executable_binary_sample(i):
+        fields = _file_fields(i)
+        fields.update({
+            'filesystem_events': _strings('C:\\Windows\\Temp\\file', events),
+            'registry_events': _strings('HKLM\\Software\\Key', events),
+            'sections': _strings('.section', events // 50 or 1),
+            'resources': _strings('RT_ICON', events // 10 or 1),
+            'imports': _strings('kernel32.dll!Function', events),
+            'strings': _strings('string', strings),
+        })
+        return _sample('Sample.FileSample.ExecutableBinarySample', i, **fields)
+
+    return {
+        'AnalysisRequest': (AnalysisRequest, lambda i: {
+            'id': _id(i), 'url': _url('analysis_request', i), 'analysis_system': _url('analysis_system', 1),
+            'sample': _url('sample', i), 'analysis_requested': DATE, 'priority': i % 5}),
+        'AnalysisSystem': (AnalysisSystem, lambda i: {
+            'id': _id(i), 'url': _url('analysis_system', i), 'identifier_name': 'system{}'.format(i),
+            'verbose_name': 'System {}'.format(i), 'information_text': 'An analysis system',
+            'tag_filter_expression': 'sample-type:filesample and not tag:1'}),
+        'AnalysisSystemInstance': (AnalysisSystemInstance, lambda i: {
+            'id': _id(i), 'url': _url('analysis_system_instance', i), 'analysis_system': _url('analysis_system', 1),
+            'uuid': '5a391093-f251-4c08-991d-{:012x}'.format(i), 'last_seen': DATE, 'is_online': True,
+            'scheduled_analyses_count': i}),
+        'Report': (Report, lambda i: {
+            'id': _id(i), 'url': _url('report', i), 'analysis_system': _url('analysis_system', 1),
+            'sample': _url('sample', i), 'analysis_date': DATE, 'upload_date': DATE, 'status': 0,
+            'error_message': None, 'tags': ['tag:{}'.format(i % 10)], 'additional_metadata': {'number': i},
+            'json_report_objects': {'strings': '{}json_report_object/strings/'.format(_url('report', i))},
+            'raw_report_objects': {'graph': '{}raw_report_object/graph/'.format(_url('report', i))}}),
+        'ScheduledAnalysis': (ScheduledAnalysis, lambda i: {
+            'id': _id(i), 'url': _url('scheduled_analysis', i), 'analysis_scheduled': DATE, 'priority': 0,
+            'analysis_system_instance': _url('analysis_system_instance', 1), 'sample': _url('sample', i)}),
+        'DomainSample': (DomainSample, lambda i: _sample('Sample.DomainSample', i, domain='host{}.example.com'.format(i))),
+        'IPSample': (IPSample, lambda i: _sample('Sample.IPSample', i, ip_address='10.0.{}.{}'.format(i // 256 % 256, i % 256))),
+        'URISample': (URISample, lambda i: _sample('Sample.URISample', i, uri='http://example.com/{}'.format(i))),
+        'FileSample': (FileSample, lambda i: _sample('Sample.FileSample', i, **_file_fields(i))),
+        'ExecutableBinarySample': (ExecutableBinarySample, executable_binary_sample),
+        'SampleRelation (mixed page)': (SampleRelation, relation),
+    }
+
+
+def _creation_kwargs(data, schema):
+    return {key: value for key, value in data.items()
+            if key in schema.fields and not schema.fields[key].dump_only and key not in ('id', 'url', '_cls')}
+
+
+def _measure(func, items):
+    gc.collect()
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    elapsed = time.perf_counter() - start
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    baseline, _ = tracemalloc.get_traced_memory()
+    results = [func(item) for item in items]
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    del results
+
+    return {
+        'microseconds_per_item': elapsed / len(items) * 1e6,
+        'retained_blocks_per_item': blocks / len(items),
+        'peak_bytes_per_item': (peak - baseline) / len(items),
+    }
+
+
+def run(count=200, page_size=50, strings=5000, events=500, names=None):
+    results = {}
+    for name, (resource, payload) in sorted(generate_payloads(strings, events).items()):
+        if names and name not in names:
+            continue
+
+        size = count if resource is not ExecutableBinarySample else max(1, count // 20)
+        data = [payload(i) for i in range(1, size + 1)]
+        pages = [data[i:i + page_size] for i in range(0, len(data), page_size)]
+        deserialized = [resource._deserialize(item) for item in data]
+        instances = [resource._create_instance_from_data(item) for item in deserialized]
+
+        def dump(item, resource=resource):
+            schema = resource._search_subclass(item['_cls']).schema if '_cls' in item else resource.schema
+            return schema.dump(_creation_kwargs(item, schema))
+
+        paths = {
+            'deserialize': _measure(resource._deserialize, data),
+            'deserialize_page': _measure(lambda page: resource._deserialize(page, many=True), pages),
+            'create_instance': _measure(resource._create_instance_from_data, deserialized),
+            'to_json': _measure(lambda instance: instance._to_json(), instances),
+            'dump': _measure(dump, data),
+        }
+        paths['deserialize_page']['microseconds_per_item'] *= len(pages) / len(data)
+        paths['deserialize_page']['retained_blocks_per_item'] *= len(pages) / len(data)
+        paths['deserialize_page']['peak_bytes_per_item'] *= len(pages) / len(data)
+
+        results[name] = {'items': size, 'paths': paths}
+        print('{:<28} {}'.format(name, ' '.join('{}={:.1f}us'.format(path, values['microseconds_per_item'])
+                                                for path, values in sorted(paths.items()))), file=sys.stderr)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('schemas', nargs='*', help='Names of the payloads to benchmark (default: all)')
+    parser.add_argument('--count', type=int, default=200, help='Number of items per schema')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--strings', type=int, default=5000, help='Strings per ExecutableBinarySample')
+    parser.add_argument('--events', type=int, default=500, help='Imports and events per ExecutableBinarySample')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    results = {
+        'version': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'parameters': {'count': args.count, 'page_size': args.page_size, 'strings': args.strings,
+                       'events': args.events},
+        'benchmarks': run(args.count, args.page_size, args.strings, args.events, args.schemas),
+    }
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
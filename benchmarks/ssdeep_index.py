@@ -0,0 +1,162 @@
+"""Benchmark of :class:`~mass_api_client.similarity.SsdeepIndex` on a synthetic corpus of ssdeep hashes.
+
+The corpus consists of families of similar hashes: each family has a random base hash and variants with a few
+edited characters, some of them at twice the block size of the base. The hashes are added to the index one by one,
+as they would arrive from the server, and the rate, the number of compared candidates and the peak memory are
+reported. The cost of comparing all pairs is estimated from the time of single comparisons. The index is checked
+against all-pairs comparison on a smaller corpus.
+
+Run from the repository root:
+
+python -m benchmarks.ssdeep_index --count 1000000 --output ssdeep_index.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+from mass_api_client.__version__ import __version__
+from mass_api_client.similarity import SsdeepIndex, SPAMSUM_LENGTH, MIN_BLOCKSIZE, compare
+
+ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+
+def _digest(rng, length):
+    return ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def _mutate(rng, digest, edits, max_length):
+    digest = list(digest)
+    for _ in range(edits):
+        position = rng.randrange(len(digest) + 1)
+        operation = rng.random()
+        if operation < 0.5 and position < len(digest):
+            digest[position] = rng.choice(ALPHABET)
+        elif operation < 0.75 and len(digest) < max_length:
+            digest.insert(position, rng.choice(ALPHABET))
+        elif position < len(digest) and len(digest) > 1:
+            del digest[position]
+    return ''.join(digest)
+
+
+def generate_corpus(count, family_size=4, max_edits=8, seed=0):
+    """
+    :param count: The number of hashes.
+    :param family_size: The average number of hashes per family.
+    :param max_edits: The maximum number of edited characters of a variant.
+    :param seed: The seed of the random number generator.
+    :return: A list of ssdeep hashes in random order.
+    """
+    rng = random.Random(seed)
+    hashes = []
+    while len(hashes) < count:
+        blocksize = MIN_BLOCKSIZE * 2 ** rng.randint(0, 16)
+        digest1 = _digest(rng, rng.randint(SPAMSUM_LENGTH // 2, SPAMSUM_LENGTH))
+        digest2 = _digest(rng, rng.randint(SPAMSUM_LENGTH // 4, SPAMSUM_LENGTH // 2))
+        for _ in range(rng.randint(1, 2 * family_size - 1)):
+            if rng.random() < 0.1:
+                # The same file grown or shrunk enough to be hashed at twice the block size.
+                variant = (blocksize * 2, _mutate(rng, digest2, rng.randint(0, max_edits), SPAMSUM_LENGTH),
+                           _digest(rng, rng.randint(SPAMSUM_LENGTH // 4, SPAMSUM_LENGTH // 2)))
+            else:
+                variant = (blocksize, _mutate(rng, digest1, rng.randint(0, max_edits), SPAMSUM_LENGTH),
+                           _mutate(rng, digest2, rng.randint(0, max_edits), SPAMSUM_LENGTH // 2))
+            hashes.append('{}:{}:{}'.format(*variant))
+    del hashes[count:]
+    rng.shuffle(hashes)
+    return hashes
+
+
+def _peak_memory():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def verify(hashes, threshold):
+    """
+    :return: The number of matches found by all-pairs comparison and by the index.
+    """
+    expected = sum(1 for i in range(len(hashes)) for j in range(i)
+                   if compare(hashes[i], hashes[j]) >= threshold)
+    index = SsdeepIndex(threshold)
+    found = sum(len(index.add(i, ssdeep_hash)) for i, ssdeep_hash in enumerate(hashes))
+    return expected, found
+
+
+def run(count=1000000, threshold=50, family_size=4, verify_count=1000, seed=0):
+    start = time.perf_counter()
+    hashes = generate_corpus(count, family_size, seed=seed)
+    generated = time.perf_counter() - start
+    print('Generated {} hashes in {:.1f} s'.format(count, generated), file=sys.stderr)
+
+    index = SsdeepIndex(threshold, capacity=count)
+    matches = 0
+    start = time.perf_counter()
+    for i, ssdeep_hash in enumerate(hashes):
+        matches += len(index.add(i, ssdeep_hash))
+    elapsed = time.perf_counter() - start
+
+    rng = random.Random(seed)
+    pairs = [(rng.choice(hashes), rng.choice(hashes)) for _ in range(10000)]
+    compare_start = time.perf_counter()
+    for hash1, hash2 in pairs:
+        compare(hash1, hash2)
+    seconds_per_compare = (time.perf_counter() - compare_start) / len(pairs)
+
+    # A separate small corpus, as the families of the large one are spread over all of it.
+    expected, found = verify(generate_corpus(verify_count, family_size, seed=seed + 1), threshold)
+    return {
+        'hashes': count,
+        'threshold': threshold,
+        'seconds': elapsed,
+        'hashes_per_second': count / elapsed,
+        'matches': matches,
+        'comparisons': index.comparisons,
+        'comparisons_per_hash': index.comparisons / count,
+        'all_pairs_comparisons': count * (count - 1) // 2,
+        'all_pairs_estimated_seconds': count * (count - 1) // 2 * seconds_per_compare,
+        'peak_memory_bytes': _peak_memory(),
+        'verified_hashes': verify_count,
+        'verified_matches': expected,
+        'verified_matches_found': found,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000000, help='Number of hashes in the corpus')
+    parser.add_argument('--threshold', type=int, default=50, help='Minimum score of a match')
+    parser.add_argument('--family-size', type=int, default=4, help='Average number of similar hashes per family')
+    parser.add_argument('--verify', type=int, default=1000,
+                        help='Number of hashes checked against all-pairs comparison')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    args = parser.parse_args(argv)
+
+    results = {
+        'version': __version__,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'parameters': {'count': args.count, 'threshold': args.threshold, 'family_size': args.family_size,
+                       'verify': args.verify, 'seed': args.seed},
+        'benchmarks': {'ssdeep_index': run(args.count, args.threshold, args.family_size, args.verify, args.seed)},
+    }
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(results, fp, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
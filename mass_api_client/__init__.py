@@ -1,4 +1,11 @@
-import mass_api_client.resources
-from mass_api_client.connection_manager import ConnectionManager
-from mass_api_client.switch_connection import SwitchConnection
-from mass_api_client import utils 
+from mass_api_client._lazy import lazy_attributes
+
+__all__ = ['ConnectionManager', 'HedgingPolicy', 'SwitchConnection', 'resources', 'utils']
+
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'ConnectionManager': '.connection_manager',
+    'HedgingPolicy': '.hedging',
+    'SwitchConnection': '.switch_connection',
+    'resources': None,
+    'utils': None,
+})
@@ -0,0 +1,45 @@
+"""Lazy attributes of packages, so that importing the package does not import all of its modules."""
+import importlib
+
+_requests = None
+
+
+def lazy_attributes(package, attributes):
+    """
+    Create the module level `__getattr__` and `__dir__` functions of a package.
+
+    :param package: The name of the package.
+    :param attributes: A dictionary mapping attribute names to the (relative) name of the module defining them.
+                       If the module name is None, the attribute is the submodule of the same name.
+    :return: A tuple of the `__getattr__` and `__dir__` functions.
+    """
+    namespace = importlib.import_module(package).__dict__
+
+    def __getattr__(name):
+        if name not in attributes:
+            raise AttributeError("module '{}' has no attribute '{}'".format(package, name))
+
+        module_name = attributes[name]
+        if module_name is None:
+            value = importlib.import_module('{}.{}'.format(package, name))
+        else:
+            value = getattr(importlib.import_module(module_name, package), name)
+        namespace[name] = value
+        return value
+
+    def __dir__():
+        return sorted(set(namespace) | set(attributes))
+
+    return __getattr__, __dir__
+
+
+def get_requests():
+    """
+    :return: The `requests` module. It is imported on first use, because importing it takes most of the import time
+             of the package.
+    """
+    global _requests
+    if _requests is None:
+        import requests
+        _requests = requests
+    return _requests
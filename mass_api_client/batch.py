@@ -0,0 +1,364 @@
+"""Creation of many objects at once.
+
+Objects are created with a bounded number of concurrent requests. The limit can adapt to the server: it grows by one
+after each window of successful requests and is halved when the server is overloaded (additive increase,
+multiplicative decrease). The outcome of every item is collected instead of aborting on the first error, and the
+progress can be recorded in a checkpoint file to resume an interrupted batch. If the server offers a bulk endpoint
+for the resource, the objects are posted in chunks instead of one by one.
+"""
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from mass_api_client._lazy import get_requests
+from mass_api_client.connection_manager import ConnectionManager
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_RETRIES = 3
+DEFAULT_BULK_SIZE = 100
+# Only these are retried: the server rejected the request without processing it. A 502 or 504 may come from a gateway
+# after the server created the object, and retrying a POST would then create it twice.
+OVERLOAD_STATUS_CODES = (429, 503)
+
+# (base url, creation point) -> whether the server offers a bulk endpoint
+_bulk_endpoints = {}
+_bulk_endpoints_lock = threading.Lock()
+
+
+class BatchItem(namedtuple('BatchItem', ['key', 'result', 'error', 'skipped'])):
+    """
+    The outcome of a single item. Items skipped because they are already recorded in the checkpoint have
+    `skipped` set and the url of the created object as `result`.
+    """
+    __slots__ = ()
+
+
+class BatchResult:
+    def __init__(self, items):
+        """
+        :param items: A list of :class:`BatchItem` objects in the order of the input.
+        """
+        self.items = items
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def results(self):
+        """The created objects, in the order of the input."""
+        return [item.result for item in self.items if item.error is None and not item.skipped]
+
+    @property
+    def errors(self):
+        """A list of (key, exception) tuples of the failed items."""
+        return [(item.key, item.error) for item in self.items if item.error is not None]
+
+    @property
+    def succeeded(self):
+        return sum(1 for item in self.items if item.error is None and not item.skipped)
+
+    @property
+    def failed(self):
+        return sum(1 for item in self.items if item.error is not None)
+
+    @property
+    def skipped(self):
+        return sum(1 for item in self.items if item.skipped)
+
+
+class AdaptiveConcurrency:
+    def __init__(self, maximum, minimum=1, initial=None):
+        """
+        A concurrency limit adapting to the load of the server.
+
+        :param maximum: The maximum limit.
+        :param minimum: The minimum limit.
+        :param initial: The initial limit. Defaults to the minimum.
+        """
+        self.maximum = maximum
+        self.minimum = minimum
+        self.limit = initial or minimum
+        self._successes = 0
+        self._lock = threading.Lock()
+
+    def on_success(self):
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self.limit:
+                self.limit = min(self.maximum, self.limit + 1)
+                self._successes = 0
+
+    def on_overload(self):
+        with self._lock:
+            self.limit = max(self.minimum, self.limit // 2)
+            self._successes = 0
+
+
+class Checkpoint:
+    def __init__(self, path):
+        """
+        Append-only record of the processed items, one JSON object per line. It is used for the created objects of
+        a batch and for the files of :mod:`mass_api_client.ingest`.
+
+        :param path: The path of the checkpoint file. It is created if it does not exist.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = {}
+        if os.path.exists(path):
+            with open(path) as fp:
+                for line in fp:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # The last line may be incomplete if the process was killed.
+                        continue
+                    self._done[record['key']] = record
+        self._file = open(path, 'a')
+
+    def __contains__(self, key):
+        return key in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+    def get(self, key):
+        """
+        :return: The record of the key, a dictionary of the key and the recorded values, or None.
+        """
+        return self._done.get(key)
+
+    def record(self, key, **values):
+        """
+        Record an item as processed.
+
+        :param key: The key identifying the item.
+        :param values: JSON serializable values recorded with the key, e.g. the url of the created object.
+        """
+        record = dict(values, key=key)
+        with self._lock:
+            self._done[key] = record
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def is_overload(error):
+    """
+    :return: Whether an exception indicates that the server is overloaded and the request should be retried. This is
+             only the case if the request has certainly not been processed, so that retrying a POST request does not
+             create a duplicate.
+    """
+    if isinstance(error, get_requests().HTTPError):
+        return error.response is not None and error.response.status_code in OVERLOAD_STATUS_CODES
+    return _is_not_sent(error)
+
+
+def _is_not_sent(error):
+    # The connection could not be established. Read timeouts and connections reset later may happen after the server
+    # has processed the request.
+    from urllib3.exceptions import NewConnectionError
+    requests = get_requests()
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.ConnectionError) or not error.args:
+        return False
+    return isinstance(getattr(error.args[0], 'reason', error.args[0]), NewConnectionError)
+
+
+def run_batch(function, items, keys=None, max_workers=DEFAULT_MAX_WORKERS, adaptive=False, retries=DEFAULT_RETRIES,
+              on_result=None):
+    """
+    Call a function for each item with a bounded number of concurrent calls.
+
+    Calls failing because the server is overloaded or could not be reached, see :func:`is_overload`, are retried with
+    an exponential backoff. Other errors are collected.
+
+    :param function: The function called with each item.
+    :param items: An iterable of items.
+    :param keys: The keys identifying the items in the result. Defaults to the indices of the items.
+    :param max_workers: The maximum number of concurrent calls.
+    :param adaptive: If True, the number of concurrent calls adapts between 1 and `max_workers`, see
+                     :class:`AdaptiveConcurrency`. An :class:`AdaptiveConcurrency` object may be passed instead.
+    :param retries: The number of retries of calls failing because of an overloaded server.
+    :param on_result: A function called with each :class:`BatchItem` as soon as it is done.
+    :return: A :class:`BatchResult`.
+    """
+    if adaptive is True:
+        adaptive = AdaptiveConcurrency(max_workers)
+
+    outcomes = {}
+    condition = threading.Condition()
+    running = [0]
+
+    def call(index, key, item):
+        error = result = None
+        for attempt in range(retries + 1):
+            try:
+                result = function(item)
+                error = None
+                if adaptive:
+                    adaptive.on_success()
+                break
+            except Exception as e:
+                error = e
+                if not is_overload(e):
+                    break
+                if adaptive:
+                    adaptive.on_overload()
+                if attempt < retries:
+                    time.sleep(0.1 * 2 ** attempt)
+
+        outcome = BatchItem(key, result, error, False)
+        try:
+            if on_result is not None:
+                on_result(outcome)
+        finally:
+            with condition:
+                outcomes[index] = outcome
+                running[0] -= 1
+                condition.notify_all()
+
+    def free_slot():
+        return running[0] < (adaptive.limit if adaptive else max_workers)
+
+    keys = iter(keys) if keys is not None else None
+    count = 0
+    with ThreadPoolExecutor(max_workers) as executor:
+        for index, item in enumerate(items):
+            key = next(keys) if keys is not None else index
+            with condition:
+                condition.wait_for(free_slot)
+                running[0] += 1
+            executor.submit(call, index, key, item)
+            count = index + 1
+
+    return BatchResult([outcomes[index] for index in range(count)])
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _post_bulk(resource, con, chunk):
+    response = con.post_json('{}/bulk/'.format(resource._creation_point), [serialized for _, serialized in chunk],
+                             resource=resource.__name__, operation='create_many')
+    if not isinstance(response, list) or len(response) != len(chunk):
+        raise ValueError('The bulk endpoint returned {} objects for {} items.'.format(
+            len(response) if isinstance(response, list) else 'no list of', len(chunk)))
+
+    outcomes = []
+    for (key, _), data in zip(chunk, response):
+        if isinstance(data, dict) and 'error' in data:
+            outcomes.append(BatchItem(key, None, ValueError(data['error']), False))
+            continue
+        try:
+            outcomes.append(BatchItem(key, resource._create_instance_from_data(resource._deserialize(data)),
+                                      None, False))
+        except ValueError as e:
+            outcomes.append(BatchItem(key, None, e, False))
+    return outcomes
+
+
+def _is_missing_endpoint(error):
+    return (isinstance(error, get_requests().HTTPError) and error.response is not None and
+            error.response.status_code in (404, 405))
+
+
+def create_many(resource, objects, keys=None, max_workers=DEFAULT_MAX_WORKERS, adaptive=False, checkpoint=None,
+                bulk=None, bulk_size=DEFAULT_BULK_SIZE):
+    """
+    Create many objects of a resource.
+
+    :param resource: The resource class.
+    :param objects: A list of dictionaries with the keyword arguments of `resource._create`.
+    :param keys: Unique keys identifying the objects in the result and the checkpoint, e.g. sample urls.
+                 Defaults to the indices of the objects.
+    :param max_workers: The maximum number of concurrent requests.
+    :param adaptive: If True, the number of concurrent requests adapts to the server, see :func:`run_batch`.
+    :param checkpoint: The path of a checkpoint file. Objects recorded in it are skipped and created objects are
+                       recorded.
+    :param bulk: Whether to use the bulk endpoint of the resource. By default it is used if the server offers it.
+    :param bulk_size: The number of objects posted to the bulk endpoint at once.
+    :return: A :class:`BatchResult`.
+    """
+    objects = list(objects)
+    keys = list(keys) if keys is not None else list(range(len(objects)))
+    if len(keys) != len(objects):
+        raise ValueError('Expected one key per object.')
+    if len(set(keys)) != len(keys):
+        raise ValueError('The keys of the objects must be unique.')
+
+    checkpoint = Checkpoint(checkpoint) if checkpoint else None
+    try:
+        outcomes = {}
+        pending = []
+        for key, kwargs in zip(keys, objects):
+            if checkpoint is not None and key in checkpoint:
+                outcomes[key] = BatchItem(key, checkpoint.get(key)['url'], None, True)
+            else:
+                pending.append((key, kwargs))
+
+        def record(outcome):
+            if checkpoint is not None and outcome.error is None:
+                checkpoint.record(outcome.key, url=outcome.result.url)
+
+        chunk_items = {}
+
+        def record_chunk(chunk_outcome):
+            # The items of each chunk are recorded as soon as it is done, so an interrupted batch can be resumed.
+            chunk = chunks[chunk_outcome.key]
+            if chunk_outcome.error is not None:
+                items = [BatchItem(key, None, chunk_outcome.error, False) for key, _ in chunk]
+            else:
+                items = chunk_outcome.result
+            for outcome in items:
+                record(outcome)
+            chunk_items[chunk_outcome.key] = items
+
+        con = ConnectionManager().get_connection(resource._connection_alias)
+        endpoint = (con.base_url, resource._creation_point)
+        if bulk is None:
+            with _bulk_endpoints_lock:
+                bulk = _bulk_endpoints.get(endpoint, True)
+
+        if bulk and pending:
+            chunks = [[(key, resource.schema.dump(kwargs)[0]) for key, kwargs in chunk]
+                      for chunk in _chunks(pending, bulk_size)]
+            # The first chunk probes whether the server offers the bulk endpoint.
+            first = run_batch(lambda chunk: _post_bulk(resource, con, chunk), chunks[:1], max_workers=1,
+                              on_result=record_chunk)
+            if _is_missing_endpoint(first.items[0].error):
+                with _bulk_endpoints_lock:
+                    _bulk_endpoints[endpoint] = False
+                bulk = False
+            else:
+                if first.items[0].error is None:
+                    with _bulk_endpoints_lock:
+                        _bulk_endpoints[endpoint] = True
+                run_batch(lambda chunk: _post_bulk(resource, con, chunk), chunks[1:], keys=range(1, len(chunks)),
+                          max_workers=max_workers, adaptive=adaptive, on_result=record_chunk)
+                for index in range(len(chunks)):
+                    for outcome in chunk_items[index]:
+                        outcomes[outcome.key] = outcome
+
+        if not bulk and pending:
+            result = run_batch(lambda kwargs: resource._create(**kwargs), [kwargs for _, kwargs in pending],
+                               keys=[key for key, _ in pending], max_workers=max_workers, adaptive=adaptive,
+                               on_result=record)
+            for outcome in result:
+                outcomes[outcome.key] = outcome
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+
+    return BatchResult([outcomes[key] for key in keys])
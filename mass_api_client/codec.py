@@ -0,0 +1,85 @@
+"""JSON codecs used by the connections to encode request bodies and decode responses.
+
+`orjson` is used if it is installed, otherwise the standard library.
+Both codecs serialize `datetime`, `date` and `time` objects in ISO 8601 format.
+"""
+import abc
+import datetime
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONCodec(abc.ABC):
+    name = None
+
+    @abc.abstractmethod
+    def dumps(self, obj):
+        """
+        :return: The JSON representation of the object as UTF-8 encoded bytes.
+        """
+
+    @abc.abstractmethod
+    def loads(self, data):
+        """
+        :param data: The JSON document as bytes or string.
+        :return: The deserialized object.
+        """
+
+
+class StdlibJSONCodec(JSONCodec):
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, default=_default).encode('utf-8')
+
+    def loads(self, data):
+        # json.loads decodes bytes itself, only memoryviews have to be copied.
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise ValueError("The 'orjson' package is not installed.")
+
+    def dumps(self, obj):
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+def _default(obj):
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(obj).__name__))
+
+
+_CODECS = {
+    'json': StdlibJSONCodec,
+    'orjson': OrjsonCodec,
+}
+
+
+def get_codec(codec=None):
+    """
+    :param codec: A :class:`JSONCodec` object, the name of a codec ('json' or 'orjson')
+                  or None for the fastest installed codec.
+    :return: A :class:`JSONCodec` object.
+    :raises: A `ValueError` if the codec is unknown or not installed.
+    """
+    if isinstance(codec, JSONCodec):
+        return codec
+    if codec is None:
+        codec = 'orjson' if orjson is not None else 'json'
+    if codec not in _CODECS:
+        raise ValueError("Unknown JSON codec '{}'. Use one of {}.".format(codec, sorted(_CODECS)))
+    return _CODECS[codec]()
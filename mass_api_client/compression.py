@@ -0,0 +1,148 @@
+"""Compression of request bodies and decompression of downloads.
+
+gzip and deflate are always available, zstd only if the `zstandard` package is installed.
+"""
+import tempfile
+import zlib
+
+DEFAULT_THRESHOLD = 1024
+SAMPLE_SIZE = 64 * 1024
+SPOOL_SIZE = 4 * 1024 * 1024
+MIN_SAVINGS = 0.1
+
+_zstandard = None
+
+
+def _get_zstandard():
+    # Imported on first use to keep importing the package fast.
+    global _zstandard
+    if _zstandard is None:
+        try:
+            import zstandard
+        except ImportError:
+            zstandard = False
+        _zstandard = zstandard
+    return _zstandard or None
+
+
+def available_encodings():
+    """
+    :return: The supported content encodings, ordered by preference.
+    """
+    encodings = ['gzip', 'deflate']
+    if _get_zstandard() is not None:
+        encodings.insert(0, 'zstd')
+    return encodings
+
+
+def accept_encoding():
+    return ', '.join(available_encodings())
+
+
+def resolve_encoding(encoding):
+    """
+    :param encoding: 'gzip', 'zstd', 'auto' for the best available encoding or None to disable compression.
+    :return: The content encoding to use or None.
+    :raises: A `ValueError` if the encoding is not available.
+    """
+    if encoding is None:
+        return None
+    if encoding == 'auto':
+        return available_encodings()[0]
+    if encoding not in ('gzip', 'zstd') or encoding not in available_encodings():
+        raise ValueError("Compression '{}' is not available. Use one of {}.".format(
+            encoding, [e for e in available_encodings() if e != 'deflate']))
+    return encoding
+
+
+def compress(data, encoding):
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == 'zstd':
+        return _get_zstandard().ZstdCompressor(level=3).compress(data)
+    raise ValueError("Unknown content encoding '{}'".format(encoding))
+
+
+def compress_file(file, encoding, chunk_size=1024 * 1024, spool_size=SPOOL_SIZE):
+    """
+    Compress the remaining content of a file-like object while streaming it.
+
+    :param spool_size: The compressed content is kept in memory up to this number of bytes and written to a
+                       temporary file beyond.
+    :return: A binary temporary file with the compressed content, positioned at its start. The caller closes it.
+    """
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    elif encoding == 'zstd':
+        compressor = _get_zstandard().ZstdCompressor(level=3).compressobj()
+    else:
+        raise ValueError("Unknown content encoding '{}'".format(encoding))
+
+    compressed = tempfile.SpooledTemporaryFile(max_size=spool_size)
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            compressed.write(compressor.compress(chunk))
+        compressed.write(compressor.flush())
+    except BaseException:
+        compressed.close()
+        raise
+
+    compressed.seek(0)
+    return compressed
+
+
+def is_worth_compressing(sample, encoding, threshold=DEFAULT_THRESHOLD):
+    """
+    Decide whether compressing data is worth the CPU time.
+
+    :param sample: The data or its first bytes.
+    :param encoding: The content encoding.
+    :param threshold: Data smaller than this number of bytes is never compressed.
+    :return: True if the data is large enough and a sample of it shrinks by at least 10%.
+    """
+    if len(sample) < threshold:
+        return False
+    sample = sample[:SAMPLE_SIZE]
+    return len(compress(sample, encoding)) <= len(sample) * (1 - MIN_SAVINGS)
+
+
+class _ZstdDecompressor:
+    def __init__(self):
+        self._decompressor = _get_zstandard().ZstdDecompressor().decompressobj()
+
+    def decompress(self, data):
+        return self._decompressor.decompress(data)
+
+    def flush(self):
+        return b''
+
+
+class _IdentityDecompressor:
+    def decompress(self, data):
+        return data
+
+    def flush(self):
+        return b''
+
+
+def decompressor(encoding):
+    """
+    :param encoding: The value of the Content-Encoding header of a response.
+    :return: An object with `decompress(chunk)` and `flush()` methods for streaming decompression.
+    """
+    encoding = (encoding or '').strip().lower()
+    if encoding in ('', 'identity'):
+        return _IdentityDecompressor()
+    if encoding in ('gzip', 'x-gzip'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return zlib.decompressobj()
+    if encoding == 'zstd' and _get_zstandard() is not None:
+        return _ZstdDecompressor()
+    raise ValueError("Unsupported content encoding '{}'".format(encoding))
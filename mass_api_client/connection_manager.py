@@ -1,59 +1,225 @@
-import json
-from contextlib import closing
+from contextlib import closing, contextmanager
 
-import requests
+from mass_api_client import compression
+from mass_api_client.codec import get_codec
+from mass_api_client import json_stream
+from mass_api_client import tracing
+from mass_api_client._lazy import get_requests
+from mass_api_client.compression import resolve_encoding, DEFAULT_THRESHOLD
+from mass_api_client.hedging import HedgingCancelled
+from mass_api_client.metrics import Metrics, RequestInfo
 
 
 class Connection:
-    def __init__(self, api_key, base_url, timeout):
+    def __init__(self, api_key, base_url, timeout, hedging=None, encoding=None,
+                 compression_threshold=DEFAULT_THRESHOLD, codec=None):
         self._api_key = api_key
         self._base_url = base_url
         self._timeout = timeout
+        self._hedging = hedging
+        self._encoding = resolve_encoding(encoding)
+        self._compression_threshold = compression_threshold
+        self._codec = get_codec(codec)
+        self._pre_request_hooks = []
+        self._post_request_hooks = []
+        self.metrics = None
         self._default_headers = {'content-type': 'application/json',
                                  'Authorization': 'APIKEY {}'.format(api_key)}
 
+    @property
+    def base_url(self):
+        return self._base_url
+
+    def add_pre_request_hook(self, hook):
+        """
+        Add a function which is called with a :class:`~mass_api_client.metrics.RequestInfo` before each request.
+        """
+        self._pre_request_hooks.append(hook)
+
+    def add_post_request_hook(self, hook):
+        """
+        Add a function which is called with a :class:`~mass_api_client.metrics.RequestInfo` after each request,
+        whether it succeeded or not.
+        """
+        self._post_request_hooks.append(hook)
+
+    def remove_hook(self, hook):
+        for hooks in (self._pre_request_hooks, self._post_request_hooks):
+            if hook in hooks:
+                hooks.remove(hook)
+
+    def enable_metrics(self, metrics=None):
+        """
+        Collect request counts, latencies, transferred bytes and errors of this connection.
+
+        :param metrics: A :class:`~mass_api_client.metrics.Metrics` object, which may be shared between connections.
+                        A new one is created if None.
+        :return: The :class:`~mass_api_client.metrics.Metrics` object.
+        """
+        if self.metrics is not None:
+            self.remove_hook(self.metrics.observe)
+
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.add_post_request_hook(self.metrics.observe)
+        return self.metrics
+
+    def _instrumented(self, method, url, resource, operation, func):
+        with self._instrument(method, url, resource, operation) as info:
+            return func(info)
+
+    @contextmanager
+    def _instrument(self, method, url, resource, operation, detached=False):
+        # Yields the RequestInfo of the request, or None if there are neither hooks nor a tracer.
+        # A detached span is not the active span, so the context may be suspended, e.g. around a yield.
+        tracer = tracing.get_tracer()
+        if not self._pre_request_hooks and not self._post_request_hooks and not tracer.enabled:
+            yield None
+            return
+
+        info = RequestInfo(method, url, resource, operation)
+        name, attributes = 'HTTP {}'.format(method), {'http.method': method, 'http.url': url}
+        spans = _detached_span(tracer, name, attributes) if detached else tracer.start_span(name, attributes)
+        with spans as span:
+            for hook in self._pre_request_hooks:
+                hook(info)
+
+            try:
+                yield info
+            except Exception as e:
+                info.error = e
+                response = getattr(e, 'response', None)
+                if response is not None:
+                    info.status_code = response.status_code
+                raise
+            finally:
+                info.finish()
+                span.set_attributes(info.attributes())
+                for hook in self._post_request_hooks:
+                    hook(info)
+
     def get_stream(self, url, append_base_url, params):
         if append_base_url:
             url = self._base_url + url
 
-        r = requests.get(url, stream=True, headers=self._default_headers, params=params, timeout=self._timeout)
+        headers = dict(self._default_headers, **{'Accept-Encoding': compression.accept_encoding()})
+        r = get_requests().get(url, stream=True, headers=headers, params=params, timeout=self._timeout)
         r.raise_for_status()
         return r
 
-    def download_to_file(self, url, file, append_base_url=True, params=None):
+    def _iter_decoded(self, r, chunk_size, info=None):
+        if not hasattr(r.raw, 'stream'):
+            for block in r.iter_content(chunk_size):
+                if info is not None:
+                    info.bytes_received += len(block)
+                yield block
+            return
+
+        decompressor = compression.decompressor(r.headers.get('Content-Encoding'))
+        for block in r.raw.stream(chunk_size, decode_content=False):
+            if info is not None:
+                info.bytes_received += len(block)
+            block = decompressor.decompress(block)
+            if block:
+                yield block
+        block = decompressor.flush()
+        if block:
+            yield block
+
+    def download_to_file(self, url, file, append_base_url=True, params=None, resource=None, operation='download'):
         if params is None:
             params = {}
 
-        with closing(self.get_stream(url, append_base_url, params)) as r:
-            for block in r.iter_content(1024):
-                if not block:
-                    break
-                file.write(block)
-            file.flush()
+        def download(info):
+            with closing(self.get_stream(url, append_base_url, params)) as r:
+                for block in self._iter_decoded(r, 65536, info):
+                    file.write(block)
+                file.flush()
+                if info is not None:
+                    info.status_code = r.status_code
+
+        self._instrumented('GET', url, resource, operation, download)
 
-    def get_json(self, url, append_base_url=True, params=None):
+    def get_json(self, url, append_base_url=True, params=None, resource=None, operation='get'):
         if params is None:
             params = {}
 
         if append_base_url:
             url = self._base_url + url
 
-        r = requests.get(url, headers=self._default_headers, params=params, timeout=self._timeout)
-        r.raise_for_status()
-        return r.json()
+        def get(info):
+            if self._hedging is not None:
+                r = self._hedging.execute(lambda attempt_url, cancelled: self._hedged_get(attempt_url, params, cancelled),
+                                          url, self._base_url)
+            else:
+                r = get_requests().get(url, headers=self._default_headers, params=params, timeout=self._timeout)
+                r.raise_for_status()
+            _record_response(info, r)
+            return self._codec.loads(r.content)
+
+        return self._instrumented('GET', url, resource, operation, get)
+
+    def iter_json(self, url, path='item', append_base_url=True, params=None, chunk_size=65536, resource=None,
+                  operation='stream'):
+        """
+        Incrementally parse a JSON response and yield the values at the given path.
+
+        Only the current value is held in memory. If the iterator is closed early, the rest of the response
+        is not downloaded.
 
-    def post_json(self, url, data, append_base_url=True, params=None):
+        :param path: The path of the values, see :mod:`mass_api_client.json_stream`.
+                     By default the elements of a top-level array are yielded.
+        :param chunk_size: The number of bytes read at once.
+        :return: An iterator over the values.
+        """
         if params is None:
             params = {}
 
         if append_base_url:
             url = self._base_url + url
 
-        r = requests.post(url, json.dumps(data), headers=self._default_headers, params=params, timeout=self._timeout)
+        # The request is instrumented until the iteration ends, so the duration and the received bytes cover
+        # the consumed part of the body. Its span is detached, as streams may be interleaved or abandoned.
+        with self._instrument('GET', url, resource, operation, detached=True) as info:
+            with closing(self.get_stream(url, False, params)) as r:
+                if info is not None:
+                    info.status_code = r.status_code
+                for value in json_stream.iter_items(self._iter_decoded(r, chunk_size, info), path):
+                    yield value
+
+    def _hedged_get(self, url, params, cancelled):
+        r = get_requests().get(url, stream=True, headers=self._default_headers, params=params, timeout=self._timeout)
+        if cancelled.is_set():
+            r.close()
+            raise HedgingCancelled()
+
         r.raise_for_status()
-        return r.json()
+        r.content  # read the body before returning, so the attempt only wins once it is complete
+        return r
 
-    def post_multipart(self, url, metadata, append_base_url=True, params=None, json_files=None, binary_files=None):
+    def post_json(self, url, data, append_base_url=True, params=None, resource=None, operation='create'):
+        if params is None:
+            params = {}
+
+        if append_base_url:
+            url = self._base_url + url
+
+        body = self._codec.dumps(data)
+        headers = self._default_headers
+        if self._encoding is not None:
+            if compression.is_worth_compressing(body, self._encoding, self._compression_threshold):
+                body = compression.compress(body, self._encoding)
+                headers = dict(headers, **{'Content-Encoding': self._encoding})
+
+        def post(info):
+            r = get_requests().post(url, body, headers=headers, params=params, timeout=self._timeout)
+            r.raise_for_status()
+            _record_response(info, r, body)
+            return self._codec.loads(r.content)
+
+        return self._instrumented('POST', url, resource, operation, post)
+
+    def post_multipart(self, url, metadata, append_base_url=True, params=None, json_files=None, binary_files=None,
+                       resource=None, operation='upload'):
         if params is None:
             params = {}
         if binary_files is None:
@@ -69,16 +235,81 @@ class Connection:
         json_files['metadata'] = (None, metadata)
 
         for key, value in json_files.items():
-            files[key] = (value[0], json.dumps(value[1]), 'application/json')
+            files[key] = self._compressed_part(value[0], self._codec.dumps(value[1]), 'application/json')
 
         for key, value in binary_files.items():
-            files[key] = (value[0], value[1], 'binary/octet-stream')
+            files[key] = self._compressed_part(value[0], value[1], 'binary/octet-stream')
 
-        r = requests.post(url, headers=headers, params=params, files=files, timeout=self._timeout)
-        r.raise_for_status()
-        if r.status_code == 204:
-            return dict()
-        return r.json()
+        def post(info):
+            r = get_requests().post(url, headers=headers, params=params, files=files, timeout=self._timeout)
+            r.raise_for_status()
+            _record_response(info, r)
+            if r.status_code == 204:
+                return dict()
+            return self._codec.loads(r.content)
+
+        try:
+            return self._instrumented('POST', url, resource, operation, post)
+        finally:
+            for part in files.values():
+                if len(part) == 4 and hasattr(part[1], 'close'):
+                    # The compressed copy of a file, see _compressed_part.
+                    part[1].close()
+
+    def _compressed_part(self, filename, data, content_type):
+        if self._encoding is None:
+            return filename, data, content_type
+
+        if hasattr(data, 'read'):
+            sample = _read_sample(data)
+            threshold = min(self._compression_threshold, compression.SAMPLE_SIZE)
+            if sample is None or not compression.is_worth_compressing(sample, self._encoding, threshold):
+                return filename, data, content_type
+            compressed = compression.compress_file(data, self._encoding)
+        else:
+            encoded = data.encode('utf-8') if isinstance(data, str) else data
+            if not compression.is_worth_compressing(encoded, self._encoding, self._compression_threshold):
+                return filename, data, content_type
+            compressed = compression.compress(encoded, self._encoding)
+
+        return filename, compressed, content_type, {'Content-Encoding': self._encoding}
+
+
+def _read_sample(file):
+    try:
+        position = file.tell()
+        sample = file.read(compression.SAMPLE_SIZE)
+        file.seek(position)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+    if isinstance(sample, str):
+        sample = sample.encode('utf-8')
+    return sample
+
+
+def _record_response(info, r, body=None):
+    if info is None:
+        return
+
+    info.status_code = r.status_code
+    info.bytes_received += len(r.content)
+    if body is None:
+        body = getattr(r.request, 'body', None)
+    if body is not None and hasattr(body, '__len__'):
+        info.bytes_sent += len(body)
+
+
+@contextmanager
+def _detached_span(tracer, name, attributes):
+    span = tracer.start_detached_span(name, attributes)
+    try:
+        yield span
+    except Exception as e:
+        span.record_exception(e)
+        raise
+    finally:
+        span.end()
 
 
 class ConnectionManager:
@@ -91,7 +322,8 @@ class ConnectionManager:
 
         return self._connections[alias]
 
-    def register_connection(self, alias, api_key, base_url, timeout=5):
+    def register_connection(self, alias, api_key, base_url, timeout=5, hedging=None, encoding=None,
+                            compression_threshold=DEFAULT_THRESHOLD, codec=None):
         """
         Create and register a new connection.
 
@@ -101,11 +333,20 @@ class ConnectionManager:
         :param base_url: The api url including protocol, host, port (optional) and location.
         :param timeout: The time in seconds to wait for 'connect' and 'read' respectively.
                         Use a tuple to set these values separately or None to wait forever.
+        :param hedging: A :class:`~mass_api_client.hedging.HedgingPolicy` to hedge idempotent JSON GET requests.
+                        Hedging is disabled if None.
+        :param encoding: The content encoding used to compress JSON request bodies and multipart parts:
+                         'gzip', 'zstd' (requires the `zstandard` package), 'auto' for the best available
+                         encoding or None to disable compression. The server has to support compressed requests.
+        :param compression_threshold: Request bodies and parts smaller than this number of bytes are sent uncompressed.
+        :param codec: The :class:`~mass_api_client.codec.JSONCodec` or its name ('json' or 'orjson') used to encode
+                      request bodies and decode responses. By default `orjson` is used if it is installed.
         :return:
         """
         if not base_url.endswith('/'):
             base_url += '/'
 
-        self._connections[alias] = Connection(api_key, base_url, timeout)
+        self._connections[alias] = Connection(api_key, base_url, timeout, hedging=hedging, encoding=encoding,
+                                              compression_threshold=compression_threshold, codec=codec)
 
 
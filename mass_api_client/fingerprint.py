@@ -0,0 +1,174 @@
+"""Local fingerprints of sample files, computed in a single streaming pass.
+
+A file is read once with large buffers. Each buffer updates all hashes, the byte histogram from which the Shannon
+entropy is computed and, if the `ssdeep` package is installed, the ssdeep hash. The histogram is counted with
+`numpy.bincount` if NumPy is installed and with :class:`collections.Counter` otherwise. The result uses the field
+names of :class:`~mass_api_client.schemas.FileSampleSchema`, so it can be used to deduplicate and triage files
+before they are submitted.
+
+for path, fingerprint in fingerprint_files(paths, processes=8):
+    print(path, fingerprint['sha256sum'], fingerprint['shannon_entropy'])
+"""
+import math
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from mass_api_client.hashing import ALGORITHMS, MultiHasher, iter_chunks
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+_numpy = None
+_ssdeep = None
+
+
+def _get_numpy():
+    # Imported on first use to keep importing the package fast.
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError:
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+
+def _get_ssdeep():
+    global _ssdeep
+    if _ssdeep is None:
+        try:
+            import ssdeep
+        except ImportError:
+            ssdeep = False
+        _ssdeep = ssdeep
+    return _ssdeep or None
+
+
+def ssdeep_available():
+    """
+    :return: Whether ssdeep hashes can be computed, which requires the `ssdeep` package.
+    """
+    return _get_ssdeep() is not None
+
+
+class ByteHistogram:
+    def __init__(self):
+        """
+        The number of occurrences of each byte value in a stream of chunks.
+        """
+        self._numpy = _get_numpy()
+        self.size = 0
+        self._counts = self._numpy.zeros(256, dtype=self._numpy.int64) if self._numpy is not None else Counter()
+
+    def update(self, chunk):
+        if self._numpy is None:
+            self._counts.update(chunk)
+        else:
+            numpy = self._numpy
+            # Counting pairs of bytes takes half as many steps as counting single bytes. The counts of the
+            # pairs are folded into the counts of their first and second bytes.
+            pairs = numpy.bincount(numpy.frombuffer(chunk, dtype=numpy.uint16, count=len(chunk) // 2),
+                                   minlength=1 << 16).reshape(256, 256)
+            self._counts += pairs.sum(axis=0)
+            self._counts += pairs.sum(axis=1)
+            if len(chunk) % 2:
+                self._counts[chunk[-1]] += 1
+        self.size += len(chunk)
+
+    def counts(self):
+        """
+        :return: A list of the number of occurrences of the byte values 0 to 255.
+        """
+        if self._numpy is None:
+            return [self._counts[value] for value in range(256)]
+        return self._counts.tolist()
+
+    def entropy(self):
+        """
+        :return: The Shannon entropy in bits per byte, between 0 and 8.
+        """
+        if not self.size:
+            return 0.0
+        if self._numpy is None:
+            entropy = -sum(count / self.size * math.log2(count / self.size) for count in self._counts.values()
+                           if count)
+        else:
+            probabilities = self._counts[self._counts > 0] / self.size
+            entropy = float(-(probabilities * self._numpy.log2(probabilities)).sum())
+        return min(8.0, max(0.0, entropy))
+
+
+def shannon_entropy(data):
+    """
+    :param data: A bytes-like object.
+    :return: The Shannon entropy of the data in bits per byte.
+    """
+    histogram = ByteHistogram()
+    histogram.update(data)
+    return histogram.entropy()
+
+
+def fingerprint(file, algorithms=ALGORITHMS, entropy=True, ssdeep=None, chunk_size=CHUNK_SIZE):
+    """
+    Compute the hashes, the size, the entropy and the ssdeep hash of a file while reading it only once.
+
+    :param file: A path or a binary file-like object, which is read from its current position.
+    :param algorithms: The names of the `hashlib` algorithms, see :func:`~mass_api_client.hashing.hash_file`.
+    :param entropy: Whether to compute the `shannon_entropy`.
+    :param ssdeep: Whether to compute the `ssdeep_hash`. By default it is computed if the `ssdeep` package is
+                   installed.
+    :param chunk_size: The number of bytes read at once.
+    :return: A dictionary keyed like the fields of :class:`~mass_api_client.schemas.FileSampleSchema`.
+    :raises: A `ValueError` if `ssdeep` is True and the `ssdeep` package is not installed.
+    """
+    if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+        with open(file, 'rb', buffering=0) as f:
+            return fingerprint(f, algorithms, entropy, ssdeep, chunk_size)
+
+    ssdeep_module = _get_ssdeep() if ssdeep is not False else None
+    if ssdeep and ssdeep_module is None:
+        raise ValueError('ssdeep hashes require the ssdeep package.')
+
+    hasher = MultiHasher(algorithms)
+    histogram = ByteHistogram() if entropy else None
+    ssdeep_hash = ssdeep_module.Hash() if ssdeep_module is not None else None
+    for chunk in iter_chunks(file, chunk_size):
+        hasher.update(chunk)
+        if histogram is not None:
+            histogram.update(chunk)
+        if ssdeep_hash is not None:
+            # The ssdeep package only accepts bytes.
+            ssdeep_hash.update(bytes(chunk))
+
+    result = hasher.result()
+    if histogram is not None:
+        result['shannon_entropy'] = histogram.entropy()
+    if ssdeep_hash is not None:
+        result['ssdeep_hash'] = ssdeep_hash.digest()
+    return result
+
+
+def _fingerprint_task(task):
+    path, options = task
+    return fingerprint(path, **options)
+
+
+def fingerprint_files(paths, processes=None, **options):
+    """
+    Fingerprint files in a process pool.
+
+    :param paths: An iterable of paths.
+    :param processes: The number of processes. Defaults to the number of CPUs, 1 fingerprints in-process.
+    :param options: Keyword arguments of :func:`fingerprint`.
+    :return: A generator of (path, fingerprint) tuples in the order of the paths.
+    """
+    processes = processes or os.cpu_count() or 1
+    paths = list(paths)
+    tasks = [(path, options) for path in paths]
+    if processes == 1:
+        yield from zip(paths, map(_fingerprint_task, tasks))
+        return
+
+    with ProcessPoolExecutor(processes) as pool:
+        yield from zip(paths, pool.map(_fingerprint_task, tasks, chunksize=max(1, len(tasks) // (4 * processes))))
@@ -0,0 +1,78 @@
+"""Hashing of sample files in a single streaming pass."""
+import hashlib
+
+ALGORITHMS = ('md5', 'sha1', 'sha256', 'sha512')
+CHUNK_SIZE = 1024 * 1024
+
+
+def iter_chunks(file, chunk_size=CHUNK_SIZE):
+    """
+    Read a binary file-like object in chunks.
+
+    If the file supports `readinto`, the same buffer is reused for all chunks, so each chunk is only valid until
+    the next one is read.
+
+    :param file: A binary file-like object, which is read from its current position.
+    :param chunk_size: The number of bytes read at once.
+    :return: A generator of bytes-like objects.
+    """
+    if hasattr(file, 'readinto'):
+        buffer = bytearray(chunk_size)
+        view = memoryview(buffer)
+        while True:
+            length = file.readinto(buffer)
+            if not length:
+                break
+            yield view[:length]
+    else:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+class MultiHasher:
+    def __init__(self, algorithms=ALGORITHMS):
+        """
+        Several hashes of the same data, updated together.
+
+        :param algorithms: The names of the `hashlib` algorithms.
+        """
+        self.algorithms = algorithms
+        self.size = 0
+        self._hashes = [hashlib.new(algorithm) for algorithm in algorithms]
+
+    def update(self, chunk):
+        for h in self._hashes:
+            h.update(chunk)
+        self.size += len(chunk)
+
+    def result(self):
+        """
+        :return: A dictionary with the hex digests keyed like the fields of
+                 :class:`~mass_api_client.schemas.FileSampleSchema` (e.g. `sha256sum`) and the `file_size`.
+        """
+        result = {'{}sum'.format(algorithm): h.hexdigest() for algorithm, h in zip(self.algorithms, self._hashes)}
+        result['file_size'] = self.size
+        return result
+
+
+def hash_file(file, algorithms=ALGORITHMS, chunk_size=CHUNK_SIZE):
+    """
+    Compute several hashes of a file while reading it only once.
+
+    :param file: A path or a binary file-like object, which is read from its current position.
+    :param algorithms: The names of the `hashlib` algorithms.
+    :param chunk_size: The number of bytes read at once.
+    :return: A dictionary with the hex digests keyed like the fields of
+             :class:`~mass_api_client.schemas.FileSampleSchema` (e.g. `sha256sum`) and the `file_size`.
+    """
+    if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+        with open(file, 'rb', buffering=0) as f:
+            return hash_file(f, algorithms, chunk_size)
+
+    hasher = MultiHasher(algorithms)
+    for chunk in iter_chunks(file, chunk_size):
+        hasher.update(chunk)
+    return hasher.result()
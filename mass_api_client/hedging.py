@@ -0,0 +1,166 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class HedgingCancelled(Exception):
+    pass
+
+
+class HedgingPolicy:
+    def __init__(self, delay=0.1, percentile=None, budget=0.05, burst=10, alternate_base_urls=None,
+                 max_workers=8, window=1000, min_samples=20):
+        """
+        Configuration and state for hedged GET requests.
+
+        If a request has not answered after `delay` seconds, a duplicate is sent and the first
+        successful answer is used. The losing request is cancelled.
+
+        :param delay: The time in seconds to wait before sending a hedged request.
+        :param percentile: If set (e.g. 95), the delay is the observed latency percentile of previous requests.
+                           `delay` is used until `min_samples` latencies have been observed.
+        :param budget: The fraction of requests that may be hedged. Each request earns `budget` tokens,
+                       each hedged request costs one token.
+        :param burst: The maximum number of saved tokens.
+        :param alternate_base_urls: A list of base urls hedged requests are sent to in turn.
+                                    If empty, hedged requests go to the same endpoint.
+        :param max_workers: The number of threads used to run the requests.
+        :param window: The number of latencies kept for the percentile estimation.
+        :param min_samples: The number of latencies needed before the percentile is used.
+        """
+        self.delay = delay
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.alternate_base_urls = list(alternate_base_urls or [])
+        self.min_samples = min_samples
+
+        self.requests_sent = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+        self._tokens = float(burst)
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._next_alternate = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def current_delay(self):
+        """
+        :return: The time in seconds after which a hedged request is sent.
+        """
+        if self.percentile is None:
+            return self.delay
+
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.delay
+            latencies = sorted(self._latencies)
+
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100.0))
+        return latencies[index]
+
+    def _earn_token(self):
+        with self._lock:
+            self.requests_sent += 1
+            self._tokens = min(float(self.burst), self._tokens + self.budget)
+
+    def _acquire_token(self):
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            self.hedges_sent += 1
+            return True
+
+    def _hedge_url(self, url, base_url):
+        if not self.alternate_base_urls or not url.startswith(base_url):
+            return url
+
+        with self._lock:
+            alternate = self.alternate_base_urls[self._next_alternate % len(self.alternate_base_urls)]
+            self._next_alternate += 1
+
+        if not alternate.endswith('/'):
+            alternate += '/'
+        return alternate + url[len(base_url):]
+
+    def execute(self, send, url, base_url):
+        """
+        Run a request with hedging.
+
+        :param send: A function taking the url and a `threading.Event`. The function should return the response
+                     and stop early by raising :class:`HedgingCancelled` once the event is set.
+        :param url: The full url of the request.
+        :param base_url: The base url of the connection, which is replaced by the alternate base urls.
+        :return: The result of the first successful attempt.
+        :raises: The exception of the primary request if all attempts failed.
+        """
+        self._earn_token()
+        cancelled = threading.Event()
+        start = time.monotonic()
+
+        recorded = []
+
+        def record_primary_latency():
+            # Only the first observation counts: either the completion of the primary request or, if it lost
+            # or was cancelled, the time of the cancellation as a lower bound of its latency.
+            with self._lock:
+                if not recorded:
+                    recorded.append(True)
+                    self._latencies.append(time.monotonic() - start)
+
+        def run(attempt_url, primary):
+            result = send(attempt_url, cancelled)
+            if primary:
+                record_primary_latency()
+            return result
+
+        primary = self._executor.submit(run, url, True)
+        attempts = [primary]
+        done, _ = wait(attempts, timeout=self.current_delay())
+
+        if not done and self._acquire_token():
+            attempts.append(self._executor.submit(run, self._hedge_url(url, base_url), False))
+
+        winner = None
+        errors = []
+        pending = set(attempts)
+        while pending and winner is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    winner = future
+                    break
+                errors.append(future.exception())
+
+        cancelled.set()
+        if not primary.done() or primary.cancelled() or isinstance(primary.exception(), HedgingCancelled):
+            record_primary_latency()
+        for future in pending:
+            if not future.cancel():
+                future.add_done_callback(_close_result)
+
+        if winner is None:
+            if primary.exception() is not None:
+                raise primary.exception()
+            raise errors[0]
+
+        if winner is not primary:
+            with self._lock:
+                self.hedges_won += 1
+
+        return winner.result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+def _close_result(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+
+    close = getattr(future.result(), 'close', None)
+    if close is not None:
+        close()
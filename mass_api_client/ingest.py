@@ -0,0 +1,337 @@
+"""Bulk ingestion of files as file samples.
+
+Files are collected from directories and, optionally, zip and tar archives. They are hashed in a process pool,
+checked for existence on the server in batches by their SHA-256 and only new files are uploaded.
+Progress is appended to a checkpoint file, so an interrupted ingestion can be resumed.
+
+mass-ingest --base-url http://localhost:5000/api/ --api-key KEY --checkpoint corpus.ckpt /data/corpus
+"""
+import argparse
+import logging
+import os
+import sys
+import tarfile
+import threading
+import time
+import zipfile
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from mass_api_client.batch import Checkpoint
+from mass_api_client.hashing import hash_file
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_UPLOAD_WORKERS = 4
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class Source(namedtuple('Source', ['path', 'member', 'archive'])):
+    """
+    A file on disk or a member of an archive.
+
+    `archive` is None for plain files, otherwise 'zip' or 'tar'.
+    """
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return self.path if self.member is None else '{}::{}'.format(self.path, self.member)
+
+    @property
+    def name(self):
+        return os.path.basename(self.member if self.member is not None else self.path)
+
+
+def open_sources(sources):
+    """
+    Open files one after another. The members of an archive are read from a single handle of the archive, and a
+    compressed tar archive is only decompressed once.
+
+    :param sources: :class:`Source` objects of the same file or archive, in the order of the archive.
+    :return: An iterator over `(source, file)` tuples. A file can only be read until the next tuple is requested.
+    """
+    if not sources:
+        return
+    path, archive = sources[0].path, sources[0].archive
+    if archive is None:
+        for source in sources:
+            with open(source.path, 'rb') as f:
+                yield source, f
+    elif archive == 'zip':
+        with zipfile.ZipFile(path) as zf:
+            for source in sources:
+                with zf.open(source.member) as f:
+                    yield source, f
+    else:
+        pending = iter(sources)
+        source = next(pending, None)
+        # The stream mode never seeks backwards.
+        with tarfile.open(path, 'r|*') as tf:
+            for info in tf:
+                if source is None:
+                    break
+                if info.isfile() and info.name == source.member:
+                    yield source, tf.extractfile(info)
+                    source = next(pending, None)
+        if source is not None:
+            raise ValueError('{} is missing in {}.'.format(source.member, path))
+
+
+def _archive_type(path):
+    if zipfile.is_zipfile(path):
+        return 'zip'
+    if tarfile.is_tarfile(path):
+        return 'tar'
+    return None
+
+
+def iter_sources(paths, archives=False):
+    """
+    Walk the given paths.
+
+    :param paths: Files and directories.
+    :param archives: If True, zip and tar archives are expanded.
+    :return: An iterator over `(path, archive type)` tuples. The archive type is None for plain files.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    file_path = os.path.join(root, name)
+                    yield file_path, _archive_type(file_path) if archives else None
+        else:
+            yield path, _archive_type(path) if archives else None
+
+
+def _hash_task(task):
+    path, archive = task
+    if archive is None:
+        return [(Source(path, None, None), hash_file(path, algorithms=('sha256',)))]
+
+    results = []
+    if archive == 'zip':
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if not info.is_dir():
+                    with zf.open(info) as f:
+                        results.append((Source(path, info.filename, 'zip'), hash_file(f, algorithms=('sha256',))))
+    else:
+        with tarfile.open(path) as tf:
+            for info in tf:
+                if info.isfile():
+                    results.append((Source(path, info.name, 'tar'),
+                                    hash_file(tf.extractfile(info), algorithms=('sha256',))))
+    return results
+
+
+class IngestStats:
+    def __init__(self):
+        self.files = 0
+        self.skipped = 0
+        self.existing = 0
+        self.duplicates = 0
+        self.uploaded = 0
+        self.failed = 0
+        self.bytes_hashed = 0
+        self.bytes_uploaded = 0
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+
+    def summary(self):
+        duration = self.duration if self.duration is not None else time.perf_counter() - self.start
+        duration = max(duration, 1e-9)
+        return ('{} files in {:.1f} s ({:.1f} files/s, {:.1f} MB/s hashed): {} uploaded ({:.1f} MB/s), '
+                '{} already on the server, {} duplicates, {} skipped from checkpoint, {} failed').format(
+            self.files, duration, self.files / duration, self.bytes_hashed / duration / 1e6, self.uploaded,
+            self.bytes_uploaded / duration / 1e6, self.existing, self.duplicates, self.skipped, self.failed)
+
+
+class Ingestor:
+    def __init__(self, tlp_level=0, tags=None, archives=False, hash_workers=None,
+                 upload_workers=DEFAULT_UPLOAD_WORKERS, batch_size=DEFAULT_BATCH_SIZE, checkpoint=None):
+        """
+        Upload files as :class:`~mass_api_client.resources.FileSample` objects, skipping known files.
+
+        :param tlp_level: The TLP level of the new samples.
+        :param tags: The tags of the new samples.
+        :param archives: If True, the members of zip and tar archives are ingested instead of the archives.
+        :param hash_workers: The number of hashing processes. Defaults to the number of CPUs, 1 hashes in-process.
+        :param upload_workers: The maximum number of concurrent existence checks and uploads.
+        :param batch_size: The number of files hashed and checked on the server at once.
+        :param checkpoint: The path of a checkpoint file to resume from and to record progress to.
+        """
+        self.tlp_level = tlp_level
+        self.tags = list(tags or [])
+        self.archives = archives
+        self.hash_workers = hash_workers or os.cpu_count() or 1
+        self.upload_workers = upload_workers
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint
+        self.stats = None
+
+    def run(self, paths):
+        """
+        :param paths: Files and directories to ingest.
+        :return: An :class:`IngestStats` object.
+        """
+        self.stats = IngestStats()
+        checkpoint = Checkpoint(self.checkpoint_path) if self.checkpoint_path else None
+        seen = set()
+        lock = threading.Lock()
+        in_flight = threading.BoundedSemaphore(2 * self.upload_workers)
+
+        pool = ProcessPoolExecutor(self.hash_workers) if self.hash_workers > 1 else None
+        executor = ThreadPoolExecutor(self.upload_workers)
+
+        def upload(files):
+            in_flight.acquire()
+            future = executor.submit(self._upload, files, checkpoint, lock)
+            future.add_done_callback(lambda f: in_flight.release())
+
+        try:
+            for batch in self._batches(iter_sources(paths, self.archives), checkpoint):
+                if pool is not None:
+                    hashed = pool.map(_hash_task, batch, chunksize=max(1, len(batch) // (4 * self.hash_workers)))
+                else:
+                    hashed = map(_hash_task, batch)
+
+                new = []
+                for results in hashed:
+                    for source, hashes in results:
+                        self._process_hashed(source, hashes, checkpoint, seen, new)
+
+                # The new members of an archive are uploaded together, reading the archive once.
+                files = []
+                checks = [executor.submit(self._exists, hashes['sha256sum']) for _, hashes in new]
+                for (source, hashes), check in zip(new, checks):
+                    try:
+                        found = check.result()
+                    except Exception as e:
+                        # The file is not recorded in the checkpoint, so it is checked again on resumption.
+                        with lock:
+                            self.stats.failed += 1
+                        logger.warning('Failed to check whether %s exists: %s', source.key, e)
+                        continue
+                    if found:
+                        self.stats.existing += 1
+                        self._record(checkpoint, source, hashes, 'exists')
+                        continue
+                    if files and files[0][0].path != source.path:
+                        upload(files)
+                        files = []
+                    files.append((source, hashes))
+                if files:
+                    upload(files)
+        finally:
+            executor.shutdown(wait=True)
+            if pool is not None:
+                pool.shutdown(wait=True)
+            if checkpoint is not None:
+                checkpoint.close()
+
+        self.stats.finish()
+        return self.stats
+
+    def _batches(self, tasks, checkpoint):
+        batch = []
+        for path, archive in tasks:
+            if archive is None and checkpoint is not None and path in checkpoint:
+                self.stats.files += 1
+                self.stats.skipped += 1
+                continue
+            batch.append((path, archive))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def _process_hashed(self, source, hashes, checkpoint, seen, new):
+        self.stats.files += 1
+        if checkpoint is not None and source.key in checkpoint:
+            self.stats.skipped += 1
+            return
+
+        self.stats.bytes_hashed += hashes['file_size']
+        if hashes['sha256sum'] in seen:
+            self.stats.duplicates += 1
+            self._record(checkpoint, source, hashes, 'duplicate')
+            return
+        seen.add(hashes['sha256sum'])
+        new.append((source, hashes))
+
+    @staticmethod
+    def _exists(sha256sum):
+        from mass_api_client.resources import FileSample
+        return FileSample.query(sha256sum=sha256sum).only('sha256sum').exists()
+
+    def _upload(self, files, checkpoint, lock):
+        from mass_api_client.resources import FileSample
+
+        remaining = deque(files)
+        try:
+            for source, f in open_sources([source for source, _ in files]):
+                _, hashes = remaining.popleft()
+                try:
+                    FileSample.create(source.name, f, tlp_level=self.tlp_level, tags=self.tags)
+                except Exception as e:
+                    with lock:
+                        self.stats.failed += 1
+                    logger.warning('Failed to upload %s: %s', source.key, e)
+                    continue
+
+                with lock:
+                    self.stats.uploaded += 1
+                    self.stats.bytes_uploaded += hashes['file_size']
+                self._record(checkpoint, source, hashes, 'uploaded')
+        except Exception as e:
+            # The file or archive could not be read.
+            with lock:
+                self.stats.failed += len(remaining)
+            for source, _ in remaining:
+                logger.warning('Failed to upload %s: %s', source.key, e)
+
+    @staticmethod
+    def _record(checkpoint, source, hashes, status):
+        if checkpoint is not None:
+            checkpoint.record(source.key, sha256sum=hashes['sha256sum'], status=status)
+
+
+def main(argv=None):
+    from mass_api_client import ConnectionManager
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='Files and directories to ingest')
+    parser.add_argument('--base-url', required=True, help='The URL of the MASS API')
+    parser.add_argument('--api-key', default=os.environ.get('MASS_API_KEY'),
+                        help='The API key (default: $MASS_API_KEY)')
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--archives', action='store_true', help='Ingest the members of zip and tar archives')
+    parser.add_argument('--tag', dest='tags', action='append', default=[], help='Tag of the new samples')
+    parser.add_argument('--tlp-level', type=int, default=0)
+    parser.add_argument('--hash-workers', type=int, default=None, help='Number of hashing processes')
+    parser.add_argument('--upload-workers', type=int, default=DEFAULT_UPLOAD_WORKERS)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--checkpoint', help='Checkpoint file to resume from and record progress to')
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error('An API key is required, use --api-key or set MASS_API_KEY.')
+
+    logging.basicConfig(format='%(message)s')
+    ConnectionManager().register_connection('default', args.api_key, args.base_url, timeout=args.timeout)
+    ingestor = Ingestor(tlp_level=args.tlp_level, tags=args.tags, archives=args.archives,
+                        hash_workers=args.hash_workers, upload_workers=args.upload_workers,
+                        batch_size=args.batch_size, checkpoint=args.checkpoint)
+    stats = ingestor.run(args.paths)
+    print(stats.summary())
+    return 1 if stats.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Incremental parsing of large JSON documents.
+
+Only the selected values are held in memory. Everything else is skipped while it is read.
+A path consists of object keys and `item` for the elements of an array, separated by dots:
+
+- `item` selects the elements of a top-level array
+- `results.item` selects the elements of the array stored under the key `results` of a top-level object
+- `metadata` selects the value stored under the key `metadata` of a top-level object
+- an empty path selects the whole document
+"""
+import codecs
+import json
+import re
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_STRING_END = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[ \t\n\r,\]}]')
+
+
+class _Parser:
+    def __init__(self, chunks, encoding='utf-8'):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._json_decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        if self._eof:
+            return False
+
+        if self._pos > 65536 and self._pos > len(self._buffer) // 2:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer += self._decoder.decode(chunk)
+                return True
+
+        self._buffer += self._decoder.decode(b'', final=True)
+        self._eof = True
+        return True
+
+    def _error(self, message):
+        return ValueError('Invalid JSON document: {} at position {}'.format(message, self._pos))
+
+    def peek(self):
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return None
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise self._error("expected '{}'".format(char))
+        self._pos += 1
+
+    def read_value(self):
+        self.peek()
+        attempted = 0
+        while True:
+            if len(self._buffer) - self._pos > attempted or self._eof:
+                attempted = len(self._buffer) - self._pos
+                try:
+                    value, end = self._json_decoder.raw_decode(self._buffer, self._pos)
+                    # A number is only complete if it is followed by a delimiter, it may continue in the next chunk.
+                    if self._eof or not _is_number(value) or _SCALAR_END.match(self._buffer, end):
+                        self._pos = end
+                        return value
+                except ValueError:
+                    if self._eof:
+                        raise
+
+            # Parse again only after the buffer has doubled to avoid quadratic runtime for large values.
+            target = len(self._buffer) + max(attempted, 1)
+            while len(self._buffer) < target and self._fill():
+                pass
+
+    def skip_value(self):
+        char = self.peek()
+        if char is None:
+            raise self._error('unexpected end')
+        if char not in '[{"':
+            while True:
+                match = _SCALAR_END.search(self._buffer, self._pos)
+                if match:
+                    self._pos = match.start()
+                    return
+                self._pos = len(self._buffer)
+                if not self._fill():
+                    return
+
+        depth = 0
+        in_string = False
+        while True:
+            pattern = _STRING_END if in_string else _STRUCTURE
+            match = pattern.search(self._buffer, self._pos)
+            if match is None:
+                self._pos = len(self._buffer)
+                if not self._fill():
+                    raise self._error('unexpected end')
+                continue
+
+            char = match.group()
+            self._pos = match.end()
+            if in_string:
+                if char == '\\':
+                    while self._pos >= len(self._buffer):
+                        if not self._fill():
+                            raise self._error('unexpected end')
+                    self._pos += 1
+                else:
+                    in_string = False
+                    if depth == 0:
+                        return
+            elif char == '"':
+                in_string = True
+            elif char in '[{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def walk(self, path):
+        if not path:
+            yield self.read_value()
+            return
+
+        head, rest = path[0], path[1:]
+        char = self.peek()
+
+        if head == 'item':
+            if char != '[':
+                self.skip_value()
+                return
+            self._pos += 1
+            if self.peek() == ']':
+                self._pos += 1
+                return
+            while True:
+                for value in self.walk(rest):
+                    yield value
+                char = self.peek()
+                self._pos += 1
+                if char == ']':
+                    return
+                if char != ',':
+                    raise self._error("expected ',' or ']'")
+
+        if char != '{':
+            self.skip_value()
+            return
+        self._pos += 1
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise self._error('expected an object key')
+            key = self.read_value()
+            self.expect(':')
+            if key == head:
+                for value in self.walk(rest):
+                    yield value
+            else:
+                self.skip_value()
+            char = self.peek()
+            self._pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise self._error("expected ',' or '}'")
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def iter_items(chunks, path='item', encoding='utf-8'):
+    """
+    Incrementally parse a JSON document and yield the values at the given path.
+
+    :param chunks: An iterable of byte strings, e.g. `response.iter_content(65536)`.
+    :param path: The path of the values to yield, see the module documentation.
+    :param encoding: The encoding of the document.
+    :return: An iterator over the selected values.
+    """
+    components = [component for component in path.split('.') if component] if path else []
+    return _Parser(chunks, encoding).walk(components)
@@ -0,0 +1,136 @@
+"""A persistent local store of the file hashes known to be on a server.
+
+The store is a SQLite database in WAL mode, so it can be shared by multiple threads and processes.
+It holds about `max_entries` hashes and evicts the least recently used ones. To keep inserts cheap, the size is
+only checked every `max_entries // 100` inserts, so the store may briefly exceed its size by that many entries.
+The inserts are counted by the row ids of the database, so the size is also kept by many short-lived processes.
+Lookups do not write: the time a hash was used is kept in memory and written in batches.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 1000000
+DEFAULT_TIMEOUT = 30
+RECENCY_BATCH_SIZE = 256
+
+
+def default_path():
+    """
+    :return: The path of the default store, inside `$XDG_CACHE_HOME` or `~/.cache`.
+    """
+    cache = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache, 'mass_api_client', 'known_hashes.sqlite3')
+
+
+class KnownHashStore:
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, timeout=DEFAULT_TIMEOUT):
+        """
+        :param path: The path of the database file. Defaults to :func:`default_path`.
+        :param max_entries: The maximum number of stored hashes.
+        :param timeout: The time in seconds to wait for a lock held by another process.
+        """
+        self.path = path or default_path()
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._recently_used = {}
+        self._eviction_interval = max(1, max_entries // 100)
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as con:
+            con.execute('CREATE TABLE IF NOT EXISTS known_hashes ('
+                        'server TEXT NOT NULL, sha256sum TEXT NOT NULL, url TEXT NOT NULL, last_used REAL NOT NULL, '
+                        'PRIMARY KEY (server, sha256sum))')
+            con.execute('CREATE INDEX IF NOT EXISTS known_hashes_last_used ON known_hashes (last_used)')
+
+    def _connection(self):
+        # SQLite connections must not be shared between threads.
+        con = getattr(self._local, 'connection', None)
+        if con is None:
+            con = sqlite3.connect(self.path, timeout=self.timeout)
+            con.execute('PRAGMA journal_mode=WAL')
+            con.execute('PRAGMA synchronous=NORMAL')
+            con.execute('PRAGMA busy_timeout={}'.format(int(self.timeout * 1000)))
+            self._local.connection = con
+        return con
+
+    def get(self, server, sha256sum):
+        """
+        :param server: The base url of the server.
+        :param sha256sum: The SHA-256 of the file.
+        :return: The url of the sample or None if the hash is unknown.
+        """
+        row = self._connection().execute('SELECT url FROM known_hashes WHERE server = ? AND sha256sum = ?',
+                                         (server, sha256sum)).fetchone()
+        if row is None:
+            return None
+
+        with self._lock:
+            self._recently_used[(server, sha256sum)] = time.time()
+            flush = len(self._recently_used) >= RECENCY_BATCH_SIZE
+        if flush:
+            self.flush()
+        return row[0]
+
+    def flush(self):
+        """
+        Write the times at which hashes were looked up, which are used to evict the least recently used hashes.
+        """
+        with self._lock:
+            recently_used, self._recently_used = self._recently_used, {}
+        if recently_used:
+            with self._connection() as con:
+                con.executemany('UPDATE known_hashes SET last_used = MAX(last_used, ?) '
+                                'WHERE server = ? AND sha256sum = ?',
+                                [(last_used, server, sha256sum)
+                                 for (server, sha256sum), last_used in recently_used.items()])
+
+    def add(self, server, sha256sum, url):
+        with self._connection() as con:
+            # A new row gets the largest row id plus one, which counts the inserts of all stores using the database.
+            row_id = con.execute('INSERT OR REPLACE INTO known_hashes (server, sha256sum, url, last_used) '
+                                 'VALUES (?, ?, ?, ?)', (server, sha256sum, url, time.time())).lastrowid
+
+        if row_id % self._eviction_interval == 0:
+            self._evict()
+
+    def _evict(self):
+        self.flush()
+        with self._connection() as con:
+            excess = con.execute('SELECT COUNT(*) FROM known_hashes').fetchone()[0] - self.max_entries
+            if excess > 0:
+                con.execute('DELETE FROM known_hashes WHERE rowid IN '
+                            '(SELECT rowid FROM known_hashes ORDER BY last_used LIMIT ?)', (excess,))
+
+    def remove(self, server, sha256sum):
+        with self._connection() as con:
+            con.execute('DELETE FROM known_hashes WHERE server = ? AND sha256sum = ?', (server, sha256sum))
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM known_hashes').fetchone()[0]
+
+    def close(self):
+        self.flush()
+        con = getattr(self._local, 'connection', None)
+        if con is not None:
+            con.close()
+            self._local.connection = None
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store():
+    """
+    :return: The :class:`KnownHashStore` at :func:`default_path`, created on first use.
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = KnownHashStore()
+        return _default_store
@@ -0,0 +1,217 @@
+import abc
+import bisect
+import threading
+import time
+
+
+class RequestInfo:
+    __slots__ = ('method', 'url', 'resource', 'operation', 'start', 'duration', 'status_code',
+                 'bytes_sent', 'bytes_received', 'error')
+
+    def __init__(self, method, url, resource=None, operation=None):
+        """
+        Information about a single request, passed to the request hooks of a connection.
+
+        `duration`, `status_code`, `bytes_sent`, `bytes_received` and `error` are only set for the post request hooks.
+        """
+        self.method = method
+        self.url = url
+        self.resource = resource
+        self.operation = operation
+        self.start = time.monotonic()
+        self.duration = None
+        self.status_code = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.error = None
+
+    def finish(self):
+        self.duration = time.monotonic() - self.start
+
+    def attributes(self):
+        """
+        :return: The information as a dictionary of tracing span attributes.
+        """
+        attributes = {'mass.resource': self.resource or 'unknown',
+                      'mass.operation': self.operation or 'unknown',
+                      'http.request_content_length': self.bytes_sent,
+                      'http.response_content_length': self.bytes_received,
+                      'duration': self.duration}
+        if self.status_code is not None:
+            attributes['http.status_code'] = self.status_code
+        if self.error is not None:
+            attributes['error'] = repr(self.error)
+        return attributes
+
+
+class Histogram:
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        """
+        :return: A list of (upper bound, number of observations <= upper bound) tuples, ending with infinity.
+        """
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics:
+    def __init__(self, buckets=Histogram.DEFAULT_BUCKETS):
+        """
+        Request counters and latency histograms keyed by resource type and operation.
+
+        Install it with :func:`~mass_api_client.connection_manager.Connection.enable_metrics`.
+        """
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+        self._gauges = {}
+
+    def observe(self, info):
+        key = (info.resource or 'unknown', info.operation or 'unknown')
+
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(self._buckets)
+            series.requests += 1
+            series.errors += info.error is not None
+            series.bytes_sent += info.bytes_sent
+            series.bytes_received += info.bytes_received
+            series.latency.observe(info.duration)
+
+    def snapshot(self):
+        """
+        :return: A list of dictionaries with the current values for each resource type and operation.
+        """
+        with self._lock:
+            return [{'resource': resource,
+                     'operation': operation,
+                     'requests': series.requests,
+                     'errors': series.errors,
+                     'bytes_sent': series.bytes_sent,
+                     'bytes_received': series.bytes_received,
+                     'latency_sum': series.latency.sum,
+                     'latency_buckets': series.latency.cumulative_counts()}
+                    for (resource, operation), series in sorted(self._series.items())]
+
+    def set_gauge(self, name, value):
+        """
+        Set a gauge, e.g. the number of worker processes of a :class:`~mass_api_client.supervisor.Supervisor`.
+
+        :param name: The name of the gauge.
+        :param value: The current value.
+        """
+        with self._lock:
+            self._gauges[name] = value
+
+    def gauges(self):
+        """
+        :return: A dictionary of the current values of the gauges.
+        """
+        with self._lock:
+            return dict(self._gauges)
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+            self._gauges = {}
+
+
+class _Series:
+    def __init__(self, buckets):
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = Histogram(buckets)
+
+
+class Exporter(abc.ABC):
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    @abc.abstractmethod
+    def export(self):
+        """
+        Export the current values of the metrics.
+        """
+
+
+class PrometheusExporter(Exporter):
+    def __init__(self, metrics, prefix='mass_api_client'):
+        """
+        Render metrics in the Prometheus text exposition format.
+
+        :param metrics: The :class:`Metrics` to export.
+        :param prefix: The prefix of all metric names.
+        """
+        super(PrometheusExporter, self).__init__(metrics)
+        self.prefix = prefix
+
+    def export(self):
+        """
+        :return: The metrics as a string in the Prometheus text format.
+        """
+        snapshot = self.metrics.snapshot()
+        lines = []
+
+        for name, key, kind in [('requests_total', 'requests', 'counter'),
+                                ('request_errors_total', 'errors', 'counter'),
+                                ('bytes_sent_total', 'bytes_sent', 'counter'),
+                                ('bytes_received_total', 'bytes_received', 'counter')]:
+            name = '{}_{}'.format(self.prefix, name)
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for entry in snapshot:
+                lines.append('{}{{{}}} {}'.format(name, _labels(entry), entry[key]))
+
+        name = '{}_request_duration_seconds'.format(self.prefix)
+        lines.append('# TYPE {} histogram'.format(name))
+        for entry in snapshot:
+            labels = _labels(entry)
+            for bound, count in entry['latency_buckets']:
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, le, count))
+            lines.append('{}_sum{{{}}} {}'.format(name, labels, entry['latency_sum']))
+            lines.append('{}_count{{{}}} {}'.format(name, labels, entry['requests']))
+
+        for gauge, value in sorted(self.metrics.gauges().items()):
+            name = '{}_{}'.format(self.prefix, gauge)
+            lines.append('# TYPE {} gauge'.format(name))
+            lines.append('{} {}'.format(name, value))
+
+        return '\n'.join(lines) + '\n'
+
+
+class CallbackExporter(Exporter):
+    def __init__(self, metrics, callback):
+        """
+        Pass a snapshot of the metrics to a callback, e.g. to forward them to another monitoring system.
+
+        :param metrics: The :class:`Metrics` to export.
+        :param callback: A function taking the list returned by :func:`Metrics.snapshot`.
+        """
+        super(CallbackExporter, self).__init__(metrics)
+        self.callback = callback
+
+    def export(self):
+        return self.callback(self.metrics.snapshot())
+
+
+def _labels(entry):
+    return 'resource="{}",operation="{}"'.format(entry['resource'], entry['operation'])
@@ -0,0 +1,141 @@
+"""Fetching all pages of a paginated list endpoint.
+
+The server returns pages with `next`, `previous`, `results` and optionally `count`.
+If the first page contains the total count and the `next` link uses a `page` or `offset` parameter,
+the URLs of all remaining pages are known in advance and the pages are fetched concurrently.
+Otherwise the `next` links are followed one after another.
+"""
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from mass_api_client._lazy import get_requests
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def page_urls(response):
+    """
+    Compute the URLs of the pages following the given first page.
+
+    :param response: The deserialized JSON of the first page.
+    :return: A list of absolute URLs or None if they cannot be computed from the response.
+    """
+    next_url = response.get('next')
+    if not next_url:
+        return []
+
+    count = response.get('count')
+    page_size = len(response.get('results', []))
+    if count is None or page_size == 0:
+        return None
+
+    parts = urlsplit(next_url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    params = dict(query)
+
+    try:
+        if 'page' in params:
+            first_page = int(params['page'])
+            last_page = int(math.ceil(count / float(page_size)))
+            values = range(first_page, last_page + 1)
+            key = 'page'
+        elif 'offset' in params:
+            limit = int(params.get('limit', page_size))
+            values = range(int(params['offset']), count, limit)
+            key = 'offset'
+        else:
+            return None
+    except ValueError:
+        return None
+
+    return [urlunsplit(parts._replace(query=urlencode([(k, str(value) if k == key else v) for k, v in query])))
+            for value in values]
+
+
+def iter_pages(con, url, params=None, append_base_url=True, resource=None, operation='items',
+               max_workers=DEFAULT_MAX_WORKERS, ordered=True):
+    """
+    Fetch all pages of a list endpoint.
+
+    :param con: The :class:`~mass_api_client.connection_manager.Connection` to use.
+    :param url: The URL of the first page.
+    :param params: The query parameters of the first page.
+    :param max_workers: The maximum number of pages fetched at the same time. Use 1 to fetch them sequentially.
+    :param ordered: If False, pages are yielded as soon as they arrive instead of in server order.
+    :return: An iterator over the deserialized JSON of the pages.
+    """
+    def get(page_url):
+        # The next links already contain all query parameters.
+        return con.get_json(page_url, append_base_url=False, resource=resource, operation=operation)
+
+    first = con.get_json(url, params=params, append_base_url=append_base_url, resource=resource,
+                         operation=operation)
+    yield first
+
+    urls = page_urls(first) if max_workers > 1 else None
+    if urls is None:
+        next_url = first.get('next')
+        while next_url:
+            page = get(next_url)
+            yield page
+            next_url = page.get('next')
+        return
+
+    last = first
+    for page_url, page in _fetch_concurrently(urls, lambda page_url: (page_url, _get_page(get, page_url)),
+                                              max_workers, ordered):
+        if page_url == urls[-1]:
+            last = page
+        yield page
+
+    # Objects created while fetching may have added pages after the last known one.
+    next_url = last.get('next') if urls else None
+    while next_url:
+        page = get(next_url)
+        yield page
+        next_url = page.get('next')
+
+
+def _get_page(get, url):
+    try:
+        return get(url)
+    except get_requests().HTTPError as e:
+        # Objects deleted while fetching may have removed the last pages.
+        if e.response is not None and e.response.status_code == 404:
+            return {'next': None, 'results': []}
+        raise
+
+
+def _fetch_concurrently(urls, fetch, max_workers, ordered):
+    if not urls:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(urls)))
+    pending = deque()
+    remaining = iter(urls)
+    try:
+        # Limit the number of fetched but not yet consumed pages.
+        for url in remaining:
+            pending.append(executor.submit(fetch, url))
+            if len(pending) >= 2 * max_workers:
+                break
+
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(iter(done))
+                pending.remove(future)
+
+            page = future.result()
+            for url in remaining:
+                pending.append(executor.submit(fetch, url))
+                break
+            yield page
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,185 @@
+"""Prefetching of samples for analysis workers.
+
+While one scheduled analysis is analyzed, the samples of the next scheduled analyses are resolved and their files
+are downloaded in the background. The analysis method receives :class:`PrefetchedAnalysis` handles, which behave like
+the :class:`~mass_api_client.resources.ScheduledAnalysis` objects they wrap, except that `get_sample()` returns the
+already fetched sample, whose `temporary_file()` yields the already downloaded file.
+"""
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_LOOKAHEAD = 4
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class PrefetchedAnalysis:
+    def __init__(self, scheduled_analysis, sample=None, file=None, size=0, error=None, budget=None):
+        """
+        Handle of a scheduled analysis whose sample has been fetched in advance.
+
+        All attributes and methods of the scheduled analysis are available. Close the handle after the analysis
+        to remove the downloaded file. Its share of the prefetch budget is freed when the handle is closed or the
+        iteration moves on to the next handle, whichever comes first.
+
+        :param scheduled_analysis: The :class:`~mass_api_client.resources.ScheduledAnalysis`.
+        :param sample: The fetched sample.
+        :param file: The downloaded file of a file sample or None.
+        :param size: The number of bytes reserved for the file in the budget.
+        :param error: The exception raised while prefetching, it is raised again by :func:`get_sample`.
+        """
+        self.scheduled_analysis = scheduled_analysis
+        self.file = file
+        self._sample = sample
+        self._size = size
+        self._error = error
+        self._budget = budget
+
+    def __getattr__(self, name):
+        return getattr(self.scheduled_analysis, name)
+
+    def __repr__(self):
+        return '[PrefetchedAnalysis] {}'.format(self.scheduled_analysis)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_sample(self):
+        """
+        :return: The prefetched :class:`~mass_api_client.resources.Sample`.
+        :raises: The exception raised while prefetching the sample or its file.
+        """
+        if self._error is not None:
+            raise self._error
+        return self._sample
+
+    def close(self):
+        if self.file is not None:
+            if self._sample is not None:
+                self._sample._local_file = None
+            self.file.close()
+            self.file = None
+        self._release_budget()
+
+    def _release_budget(self):
+        if self._budget is not None:
+            self._budget.release(self._size)
+            self._budget = None
+
+
+class _Budget:
+    def __init__(self, max_bytes):
+        # Reservations are granted in the order of the tickets, so a later prefetch can never
+        # take the budget needed by an earlier one, which would deadlock the in-order consumer.
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._closed = False
+
+    def acquire(self, ticket, size):
+        with self._condition:
+            while not self._closed and (ticket != self._next_ticket or
+                                        (self.used and self.used + size > self.max_bytes)):
+                self._condition.wait()
+            self.used += size
+            self._next_ticket += 1
+            self._condition.notify_all()
+            return not self._closed
+
+    def skip(self, ticket):
+        self.acquire(ticket, 0)
+
+    def release(self, size):
+        with self._condition:
+            self.used -= size
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class Prefetcher:
+    def __init__(self, scheduled_analyses, lookahead=DEFAULT_LOOKAHEAD, max_bytes=DEFAULT_MAX_BYTES, workers=2):
+        """
+        Iterate over scheduled analyses, fetching the samples of the next ones in the background.
+
+        :param scheduled_analyses: An iterable of :class:`~mass_api_client.resources.ScheduledAnalysis` objects.
+        :param lookahead: The number of scheduled analyses prefetched ahead of the current one.
+        :param max_bytes: The maximum total size of the downloaded files of the current and the next scheduled
+                          analyses. A file no longer counts once its handle is closed or the iteration moves past
+                          it, so handles which are kept open cannot stall the iteration. A single larger file is
+                          downloaded once no other file counts.
+        :param workers: The number of concurrent downloads.
+        """
+        self._scheduled_analyses = iter(scheduled_analyses)
+        self.lookahead = lookahead
+        self._budget = _Budget(max_bytes)
+        self._workers = workers
+
+    @property
+    def bytes_in_use(self):
+        return self._budget.used
+
+    def __iter__(self):
+        executor = ThreadPoolExecutor(self._workers)
+        pending = deque()
+        ticket = 0
+        current = None
+        try:
+            while True:
+                if current is not None:
+                    current._release_budget()
+                while len(pending) <= self.lookahead:
+                    scheduled_analysis = next(self._scheduled_analyses, None)
+                    if scheduled_analysis is None:
+                        break
+                    pending.append(executor.submit(self._prefetch, scheduled_analysis, ticket))
+                    ticket += 1
+
+                if not pending:
+                    return
+                current = pending.popleft().result()
+                yield current
+        finally:
+            if current is not None:
+                current._release_budget()
+            self._budget.close()
+            for future in pending:
+                if not future.cancel():
+                    future.result().close()
+            executor.shutdown(wait=True)
+
+    def _prefetch(self, scheduled_analysis, ticket):
+        try:
+            sample = scheduled_analysis.get_sample()
+        except Exception as e:
+            self._budget.skip(ticket)
+            return PrefetchedAnalysis(scheduled_analysis, error=e)
+
+        if not hasattr(sample, 'download_to_file'):
+            self._budget.skip(ticket)
+            return PrefetchedAnalysis(scheduled_analysis, sample)
+
+        size = getattr(sample, 'file_size', 0) or 0
+        acquired = self._budget.acquire(ticket, size)
+        handle = PrefetchedAnalysis(scheduled_analysis, sample, size=size, budget=self._budget)
+        if not acquired:
+            # The iteration has been stopped.
+            return handle
+
+        try:
+            handle.file = tempfile.NamedTemporaryFile()
+            sample.download_to_file(handle.file)
+            handle.file.flush()
+            sample._local_file = handle.file
+        except Exception as e:
+            handle.close()
+            handle._error = e
+        return handle
@@ -0,0 +1,215 @@
+"""Creation of large numbers of sample relations.
+
+Relations are passed as `(sample_url, other_url, type, extra)` tuples, without fetching the samples. Relations
+submitted earlier in the same run are dropped at once. The relations already known to the server are loaded from
+the relation graph of each sample the first time the sample is seen, and are not submitted again. The remaining
+relations are created by a fixed number of threads. The queue in front of them is bounded, so a producer emitting
+relations faster than the server accepts them is slowed down instead of filling the memory.
+
+with RelationWriter(max_workers=8) as writer:
+    for sample_url, other_url, match in clusters:
+        writer.write(sample_url, other_url, 'ssdeep', {'match': match})
+print(writer.stats.summary())
+"""
+import logging
+import queue
+import threading
+import time
+
+from mass_api_client import batch
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_QUEUE_SIZE = 1000
+MAX_ERRORS = 100
+
+RELATION_TYPES = {
+    'dropped_by': 'DroppedBySampleRelation',
+    'resolved_by': 'ResolvedBySampleRelation',
+    'contacted_by': 'ContactedBySampleRelation',
+    'retrieved_by': 'RetrievedBySampleRelation',
+    'ssdeep': 'SsdeepSampleRelation',
+}
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+def relation_class(relation_type):
+    """
+    :param relation_type: A key of :data:`RELATION_TYPES`, the name of a relation class, e.g.
+                          'SsdeepSampleRelation', or the class itself.
+    :return: The :class:`~mass_api_client.resources.SampleRelation` subclass.
+    """
+    from mass_api_client import resources
+
+    if isinstance(relation_type, type):
+        return relation_type
+    name = RELATION_TYPES.get(relation_type, relation_type)
+    cls = getattr(resources, name, None) if isinstance(name, str) else None
+    if cls is None or not issubclass(cls, resources.SampleRelation) or cls is resources.SampleRelation:
+        raise ValueError('Unknown relation type {}, expected one of {}.'.format(
+            relation_type, ', '.join(sorted(RELATION_TYPES))))
+    return cls
+
+
+class RelationWriterStats:
+    def __init__(self):
+        self.submitted = 0
+        self.duplicates = 0
+        self.existing = 0
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+
+    def summary(self):
+        duration = self.duration if self.duration is not None else time.perf_counter() - self.start
+        duration = max(duration, 1e-9)
+        return ('{} relations in {:.1f} s ({:.1f} relations/s): {} created ({:.1f}/s), {} already on the server, '
+                '{} duplicates, {} failed').format(
+            self.submitted, duration, self.submitted / duration, self.created, self.created / duration,
+            self.existing, self.duplicates, self.failed)
+
+
+class RelationWriter:
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, queue_size=DEFAULT_QUEUE_SIZE, skip_existing=True,
+                 retries=batch.DEFAULT_RETRIES):
+        """
+        :param max_workers: The number of concurrent requests.
+        :param queue_size: The maximum number of relations waiting to be submitted. :func:`write` blocks while
+                           the queue is full.
+        :param skip_existing: If True, the relations of each sample already known to the server are skipped.
+                              This costs one request per sample.
+        :param retries: The number of retries of requests failing because the server is overloaded.
+        """
+        self.max_workers = max_workers
+        self.skip_existing = skip_existing
+        self.retries = retries
+        self.stats = RelationWriterStats()
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._existing = set()
+        self._loaded_samples = {}
+        self._closed = False
+        self._threads = [threading.Thread(target=self._work, name='relation-writer-{}'.format(i), daemon=True)
+                         for i in range(max_workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, sample_url, other_url, relation_type, extra=None):
+        """
+        Queue a relation. Blocks while the queue is full.
+
+        :param sample_url: The url of the sample.
+        :param other_url: The url of the other sample.
+        :param relation_type: The type of the relation, see :func:`relation_class`.
+        :param extra: A dictionary of additional fields, e.g. `{'match': 80}` for ssdeep relations.
+        :return: False if the relation has already been written in this run, otherwise True.
+        """
+        if self._closed:
+            raise ValueError('The writer is closed.')
+        cls = relation_class(relation_type)
+        key = (cls._class_identifier, sample_url, other_url)
+        with self._lock:
+            self.stats.submitted += 1
+            if key in self._seen:
+                self.stats.duplicates += 1
+                return False
+            self._seen.add(key)
+        self._queue.put((cls, key, extra or {}))
+        return True
+
+    def write_many(self, relations):
+        """
+        Queue `(sample_url, other_url, type, extra)` tuples. `extra` may be omitted.
+        """
+        for relation in relations:
+            self.write(*relation)
+
+    def close(self):
+        """
+        Wait until all queued relations are submitted.
+
+        :return: The :class:`RelationWriterStats`.
+        """
+        if not self._closed:
+            self._closed = True
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+            self.stats.finish()
+        return self.stats
+
+    def _work(self):
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                return
+            cls, key, extra = entry
+            try:
+                self._submit(cls, key, extra)
+            except Exception as e:
+                with self._lock:
+                    self.stats.failed += 1
+                    if len(self.stats.errors) < MAX_ERRORS:
+                        self.stats.errors.append((key, e))
+                logger.warning('Failed to create %s %s -> %s: %s', cls.__name__, key[1], key[2], e)
+
+    def _submit(self, cls, key, extra):
+        if self.skip_existing:
+            self._load_existing(key[1])
+            with self._lock:
+                if key in self._existing:
+                    self.stats.existing += 1
+                    return
+
+        for attempt in range(self.retries + 1):
+            try:
+                cls._create(sample=key[1], other=key[2], **extra)
+                break
+            except Exception as e:
+                if attempt == self.retries or not batch.is_overload(e):
+                    raise
+                time.sleep(0.1 * 2 ** attempt)
+
+        with self._lock:
+            self.stats.created += 1
+
+    def _load_existing(self, sample_url):
+        # Each sample's relation graph is fetched once, even if several threads need it at the same time.
+        with self._lock:
+            loaded = self._loaded_samples.get(sample_url)
+            if loaded is None:
+                loaded = self._loaded_samples[sample_url] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        if not owner:
+            loaded.wait()
+            return
+
+        from mass_api_client.resources import SampleRelation
+        try:
+            url = '{}relation_graph/'.format(sample_url)
+            existing = [(relation._class_identifier, relation.sample, relation.other)
+                        for relation in SampleRelation._get_iter_from_url(url, params={'depth': 1},
+                                                                          append_base_url=False)]
+        except Exception as e:
+            logger.warning('Failed to load the relations of %s: %s', sample_url, e)
+            existing = []
+        with self._lock:
+            self._existing.update(existing)
+        loaded.set()
@@ -1,9 +1,19 @@
-from .analysis_request import AnalysisRequest
-from .analysis_system import AnalysisSystem
-from .analysis_system_instance import AnalysisSystemInstance
-from .base import BaseResource
-from .base_with_subclasses import BaseWithSubclasses
-from .report import Report
-from .sample import Sample, DomainSample, IPSample, URISample, FileSample, ExecutableBinarySample
-from .sample_relation import SampleRelation, DroppedBySampleRelation, ResolvedBySampleRelation, RetrievedBySampleRelation, ContactedBySampleRelation, SsdeepSampleRelation
-from .scheduled_analysis import ScheduledAnalysis
+from mass_api_client._lazy import lazy_attributes
+
+_modules = {
+    '.analysis_request': ['AnalysisRequest'],
+    '.analysis_system': ['AnalysisSystem'],
+    '.analysis_system_instance': ['AnalysisSystemInstance'],
+    '.base': ['BaseResource', 'FieldNotLoadedError'],
+    '.base_with_subclasses': ['BaseWithSubclasses'],
+    '.query_set': ['QuerySet'],
+    '.report': ['Report'],
+    '.sample': ['Sample', 'DomainSample', 'IPSample', 'URISample', 'FileSample', 'ExecutableBinarySample'],
+    '.sample_relation': ['SampleRelation', 'DroppedBySampleRelation', 'ResolvedBySampleRelation',
+                         'RetrievedBySampleRelation', 'ContactedBySampleRelation', 'SsdeepSampleRelation'],
+    '.scheduled_analysis': ['ScheduledAnalysis'],
+}
+
+__all__ = [name for names in _modules.values() for name in names]
+
+__getattr__, __dir__ = lazy_attributes(__name__, {name: module for module, names in _modules.items() for name in names})
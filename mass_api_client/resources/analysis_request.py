@@ -1,9 +1,9 @@
-from mass_api_client.resources.base import BaseResource
-from mass_api_client.schemas import AnalysisRequestSchema
+from mass_api_client import batch
+from mass_api_client.resources.base import BaseResource, DeferredSchema
 
 
 class AnalysisRequest(BaseResource):
-    schema = AnalysisRequestSchema()
+    schema = DeferredSchema('AnalysisRequestSchema')
     _endpoint = 'analysis_request'
     _creation_point = _endpoint
 
@@ -17,3 +17,25 @@ class AnalysisRequest(BaseResource):
         :return: The created :class:`AnalysisRequest` object.
         """
         return cls._create(sample=sample.url, analysis_system=analysis_system.url)
+
+    @classmethod
+    def create_many(cls, samples, analysis_system, max_workers=batch.DEFAULT_MAX_WORKERS, adaptive=False,
+                    checkpoint=None, bulk=None):
+        """
+        Create an :class:`.AnalysisRequest` for each of the given samples.
+
+        The requests are created concurrently, or in chunks if the server offers a bulk endpoint.
+        Errors are collected per sample instead of being raised.
+
+        :param samples: An iterable of `Sample` objects.
+        :param analysis_system: The :class:`AnalysisSystem` that should be used for the analyses.
+        :param max_workers: The maximum number of concurrent requests.
+        :param adaptive: If True, the number of concurrent requests adapts to the load of the server.
+        :param checkpoint: The path of a checkpoint file to resume from and to record progress to.
+        :param bulk: Whether to use the bulk endpoint. By default it is used if the server offers it.
+        :return: A :class:`~mass_api_client.batch.BatchResult` keyed by the sample urls.
+        """
+        samples = list(samples)
+        objects = [dict(sample=sample.url, analysis_system=analysis_system.url) for sample in samples]
+        return batch.create_many(cls, objects, keys=[sample.url for sample in samples], max_workers=max_workers,
+                                 adaptive=adaptive, checkpoint=checkpoint, bulk=bulk)
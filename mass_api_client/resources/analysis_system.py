@@ -1,10 +1,10 @@
-from mass_api_client.schemas import AnalysisSystemSchema
+from mass_api_client.tracing import traced
 from .analysis_system_instance import AnalysisSystemInstance
-from .base import BaseResource
+from .base import BaseResource, DeferredSchema
 
 
 class AnalysisSystem(BaseResource):
-    schema = AnalysisSystemSchema()
+    schema = DeferredSchema('AnalysisSystemSchema')
     _endpoint = 'analysis_system'
     _creation_point = _endpoint
 
@@ -20,6 +20,7 @@ class AnalysisSystem(BaseResource):
         """
         return cls._create(identifier_name=identifier_name, verbose_name=verbose_name, tag_filter_expression=tag_filter_expression)
 
+    @traced
     def create_analysis_system_instance(self):
         """
         Create an instance of this AnalysisSystem on the server.
@@ -1,10 +1,11 @@
-from mass_api_client.schemas import AnalysisSystemInstanceSchema
-from .base import BaseResource
+from mass_api_client import batch
+from mass_api_client.tracing import traced
+from .base import BaseResource, DeferredSchema
 from .scheduled_analysis import ScheduledAnalysis
 
 
 class AnalysisSystemInstance(BaseResource):
-    schema = AnalysisSystemInstanceSchema()
+    schema = DeferredSchema('AnalysisSystemInstanceSchema')
     _endpoint = 'analysis_system_instance'
     _creation_point = _endpoint
 
@@ -22,6 +23,7 @@ class AnalysisSystemInstance(BaseResource):
         """
         return cls._create(analysis_system=analysis_system.url)
 
+    @traced
     def schedule_analysis(self, sample):
         """
         Schedule the given sample for this instance on the server.
@@ -31,6 +33,27 @@ class AnalysisSystemInstance(BaseResource):
         """
         return ScheduledAnalysis.create(self, sample)
 
+    @traced
+    def schedule_many(self, samples, max_workers=batch.DEFAULT_MAX_WORKERS, adaptive=False, checkpoint=None,
+                      bulk=None):
+        """
+        Schedule the given samples for this instance on the server.
+
+        The samples are scheduled concurrently, or in chunks if the server offers a bulk endpoint.
+        Errors are collected per sample instead of being raised.
+
+        :param samples: An iterable of sample objects.
+        :param max_workers: The maximum number of concurrent requests.
+        :param adaptive: If True, the number of concurrent requests adapts to the load of the server.
+        :param checkpoint: The path of a checkpoint file to resume from and to record progress to.
+        :param bulk: Whether to use the bulk endpoint. By default it is used if the server offers it.
+        :return: A :class:`~mass_api_client.batch.BatchResult` with the created :class:`.ScheduledAnalysis`
+                 objects, keyed by the sample urls.
+        """
+        return ScheduledAnalysis.create_many(self, samples, max_workers=max_workers, adaptive=adaptive,
+                                             checkpoint=checkpoint, bulk=bulk)
+
+    @traced
     def get_scheduled_analyses(self):
         """
         Retrieve all scheduled analyses for this instance.
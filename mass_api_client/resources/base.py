@@ -1,14 +1,30 @@
-from datetime import datetime
-
+from mass_api_client import pagination
 from mass_api_client.connection_manager import ConnectionManager
+from mass_api_client.tracing import traced
+from .query_set import QuerySet
+
+
+class DeferredSchema:
+    def __init__(self, name):
+        """
+        Class attribute creating the schema of a resource on first access.
+
+        Defers importing marshmallow and the schema modules until a resource is (de)serialized.
+
+        :param name: The name of the schema class in :mod:`mass_api_client.schemas`.
+        """
+        self.name = name
+        self._schema = None
 
+    def __get__(self, obj, owner=None):
+        if self._schema is None:
+            from mass_api_client import schemas
+            self._schema = getattr(schemas, self.name)()
+        return self._schema
 
-class Ref:
-    def __init__(self, key):
-        self.key = key
 
-    def resolve(self, obj):
-        return getattr(obj, self.key, None)
+class FieldNotLoadedError(AttributeError):
+    pass
 
 
 class BaseResource:
@@ -18,20 +34,24 @@ class BaseResource:
     _filter_parameters = []
     _default_filters = {}
     _connection_alias = 'default'
+    _fields_parameter = 'fields'
+    _required_fields = ('id', 'url')
 
     def __init__(self, connection_alias, **kwargs):
         # Store current connection, in case the connection gets switched later on.
         self._connection_alias = connection_alias
         self.__dict__.update(kwargs)
 
-    @classmethod
-    @property
-    def schema(cls):
-        return Ref('schema').resolve(cls)
+    def __getattr__(self, name):
+        loaded_fields = self.__dict__.get('_loaded_fields')
+        if loaded_fields is not None and name not in loaded_fields and name in self.schema.fields:
+            raise FieldNotLoadedError("Field '{}' of {} was not loaded. Include it in the requested fields "
+                                      "or fetch the object without field projection.".format(name, type(self).__name__))
+        raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
 
     @classmethod
-    def _deserialize(cls, data, many=False):
-        deserialized, errors = cls.schema.load(data, many=many)
+    def _deserialize(cls, data, many=False, partial=False):
+        deserialized, errors = cls.schema.load(data, many=many, partial=partial)
         
         if errors:
             raise ValueError('An error occurred during object deserialization: {}'.format(errors))
@@ -43,43 +63,79 @@ class BaseResource:
         return cls(cls._connection_alias, **data)
 
     @classmethod
-    def _get_detail_from_url(cls, url, append_base_url=True):
-        con = ConnectionManager().get_connection(cls._connection_alias)
+    def _available_fields(cls):
+        fields = set()
+        classes = [cls]
+        while classes:
+            current = classes.pop()
+            schema = current.schema
+            if schema is not None:
+                fields.update(schema.fields)
+            classes.extend(current.__subclasses__())
+        return fields
 
-        deserialized = cls._deserialize(con.get_json(url, append_base_url=append_base_url))
-        return cls._create_instance_from_data(deserialized)
+    @classmethod
+    def _projection(cls, fields):
+        """
+        :param fields: The names of the fields to load or None to load all fields.
+        :return: The set of field names to request, including the fields required to identify the object.
+        :raises: A `ValueError` if a field does not exist.
+        """
+        if fields is None:
+            return None
+        if isinstance(fields, str):
+            fields = [fields]
+
+        unknown = set(fields) - cls._available_fields()
+        if unknown:
+            raise ValueError('{} are no fields of class \'{}\''.format(sorted(unknown), cls.__name__))
+        return frozenset(fields).union(cls._required_fields)
 
     @classmethod
-    def _get_iter_from_url(cls, url, params=None, append_base_url=True):
-        if params is None:
-            params = {}
+    def _projection_params(cls, params, projection):
+        params = dict(params or {})
+        if projection is not None:
+            params[cls._fields_parameter] = ','.join(sorted(projection))
+        return params
 
-        con = ConnectionManager().get_connection(cls._connection_alias)
-        next_url = url
-
-        while next_url is not None:
-            res = con.get_json(next_url, params=params, append_base_url=append_base_url)
-            deserialized = cls._deserialize(res['results'], many=True)
-            for data in deserialized:
-                yield cls._create_instance_from_data(data)
-            try:
-                next_url = res['next']
-            except KeyError:
-                raise StopIteration
-            append_base_url = False
+    @classmethod
+    def _create_instances(cls, results, projection=None):
+        deserialized = cls._deserialize(results, many=True, partial=projection is not None)
+        for data in deserialized:
+            obj = cls._create_instance_from_data(data)
+            if projection is not None:
+                obj._loaded_fields = projection
+            yield obj
 
     @classmethod
-    def _get_list_from_url(cls, url, params=None, append_base_url=True):
-        if params is None:
-            params = {}
+    def _get_detail_from_url(cls, url, append_base_url=True, fields=None):
+        con = ConnectionManager().get_connection(cls._connection_alias)
+        projection = cls._projection(fields)
+
+        res = con.get_json(url, append_base_url=append_base_url, params=cls._projection_params(None, projection),
+                           resource=cls.__name__)
+        return next(cls._create_instances([res], projection))
 
+    @classmethod
+    def _get_iter_from_url(cls, url, params=None, append_base_url=True, operation='items',
+                           max_workers=pagination.DEFAULT_MAX_WORKERS, ordered=True, fields=None):
         con = ConnectionManager().get_connection(cls._connection_alias)
-        deserialized = cls._deserialize(con.get_json(url, params=params, append_base_url=append_base_url)['results'], many=True)
-        objects = [cls._create_instance_from_data(detail) for detail in deserialized]
+        projection = cls._projection(fields)
+        pages = pagination.iter_pages(con, url, params=cls._projection_params(params, projection),
+                                      append_base_url=append_base_url, resource=cls.__name__, operation=operation,
+                                      max_workers=max_workers, ordered=ordered)
+
+        for res in pages:
+            for obj in cls._create_instances(res['results'], projection):
+                yield obj
 
-        return objects
+    @classmethod
+    def _get_list_from_url(cls, url, params=None, append_base_url=True, max_workers=pagination.DEFAULT_MAX_WORKERS):
+        return list(cls._get_iter_from_url(url, params=params, append_base_url=append_base_url, operation='list',
+                                           max_workers=max_workers))
 
     @classmethod
+    @traced
     def _create(cls, additional_json_files=None, additional_binary_files=None, url=None, force_multipart=False, **kwargs):
         con = ConnectionManager().get_connection(cls._connection_alias)
         if not url:
@@ -87,31 +143,55 @@ class BaseResource:
         serialized, errors = cls.schema.dump(kwargs)
 
         if additional_binary_files or additional_json_files or force_multipart:
-            response_data = con.post_multipart(url, serialized, json_files=additional_json_files, binary_files=additional_binary_files)
+            response_data = con.post_multipart(url, serialized, json_files=additional_json_files, binary_files=additional_binary_files,
+                                               resource=cls.__name__)
         else:
-            response_data = con.post_json(url, serialized)
+            response_data = con.post_json(url, serialized, resource=cls.__name__)
 
         deserialized = cls._deserialize(response_data)
 
         return cls._create_instance_from_data(deserialized)
 
     @classmethod
-    def get(cls, identifier):
+    @traced
+    def get(cls, identifier, fields=None):
         """
         Fetch a single object.
 
         :param identifier: The unique identifier of the object
+        :param fields: The names of the fields to load. Reading any other field raises a :class:`FieldNotLoadedError`.
+                       All fields are loaded if None.
         :return: The retrieved object
         """
-        return cls._get_detail_from_url('{}/{}/'.format(cls._endpoint, identifier))
+        return cls._get_detail_from_url('{}/{}/'.format(cls._endpoint, identifier), fields=fields)
 
     @classmethod
-    def items(cls):
-        return cls._get_iter_from_url('{}/'.format(cls._endpoint), params=cls._default_filters)
+    def items(cls, max_workers=pagination.DEFAULT_MAX_WORKERS, ordered=True, fields=None):
+        """
+        Iterate over all objects.
+
+        If the server reports the total number of objects, the remaining pages are fetched concurrently.
+
+        :param max_workers: The maximum number of pages fetched at the same time.
+        :param ordered: If False, objects are yielded in the order their pages arrive.
+        :param fields: The names of the fields to load. Reading any other field raises a :class:`FieldNotLoadedError`.
+                       All fields are loaded if None.
+        :return: An iterator over all objects
+        """
+        return cls._get_iter_from_url('{}/'.format(cls._endpoint), params=cls._default_filters,
+                                      max_workers=max_workers, ordered=ordered, fields=fields)
 
     @classmethod
-    def all(cls):
-        return cls._get_list_from_url('{}/'.format(cls._endpoint), params=cls._default_filters)
+    @traced
+    def all(cls, max_workers=pagination.DEFAULT_MAX_WORKERS):
+        """
+        Fetch all objects from all pages.
+
+        :param max_workers: The maximum number of pages fetched at the same time.
+        :return: The list of all objects
+        """
+        return cls._get_list_from_url('{}/'.format(cls._endpoint), params=cls._default_filters,
+                                      max_workers=max_workers)
 
     @classmethod
     def query(cls, **kwargs):
@@ -119,21 +199,10 @@ class BaseResource:
         Query multiple objects.
 
         :param kwargs: The query parameters. The key is the filter parameter and the value is the value to search for.
-        :return: The list of matching objects
+        :return: A lazy :class:`~mass_api_client.resources.query_set.QuerySet` of the matching objects
         :raises: A `ValueError` if at least one of the supplied parameters is not in the list of allowed parameters.
         """
-        params = dict(cls._default_filters)
-
-        for key, value in kwargs.items():
-            if key in cls._filter_parameters:
-                if isinstance(value, datetime):
-                    params[key] = value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
-                else:
-                    params[key] = value
-            else:
-                raise ValueError('\'{}\' is not a filter parameter for class \'{}\''.format(key, cls.__name__))
-
-        return cls._get_iter_from_url('{}/'.format(cls._endpoint), params=params)
+        return QuerySet(cls, '{}/'.format(cls._endpoint), params=cls._default_filters).filter(**kwargs)
 
     def _to_json(self):
         serialized, errors = self.schema.dump(self)
@@ -3,6 +3,7 @@ from .base import BaseResource
 
 class BaseWithSubclasses(BaseResource):
     _class_identifier = None
+    _required_fields = ('id', 'url', '_cls')
 
     @classmethod
     def _get_subclass_by_identifier(cls, identifier):
@@ -31,10 +32,10 @@ class BaseWithSubclasses(BaseResource):
         return subcls(subcls._connection_alias, **data)
 
     @classmethod
-    def _deserialize(cls, data, many=False):
+    def _deserialize(cls, data, many=False, partial=False):
         if many:
-            return [cls._deserialize(item) for item in data]
+            return [cls._deserialize(item, partial=partial) for item in data]
 
         subcls = cls._search_subclass(data['_cls'])
 
-        return super(BaseWithSubclasses, subcls)._deserialize(data, many)
\ No newline at end of file
+        return super(BaseWithSubclasses, subcls)._deserialize(data, many, partial)
\ No newline at end of file
@@ -0,0 +1,199 @@
+from datetime import datetime
+
+from mass_api_client import pagination
+from mass_api_client.connection_manager import ConnectionManager
+
+
+class QuerySet:
+    page_parameter = 'page'
+    page_size_parameter = 'per_page'
+    default_page_size = 100
+
+    def __init__(self, resource, url, params=None, append_base_url=True, offset=0, limit=None, fields=None):
+        """
+        Lazy query of multiple objects.
+
+        No request is sent until the query set is iterated or one of :func:`count`, :func:`first`
+        or :func:`exists` is called. Filtering, slicing and :func:`limit` return new query sets.
+        Slices are sent to the server as page and page size, so `query(...)[:10]` fetches only ten objects.
+
+        :param resource: The resource class of the objects.
+        :param url: The URL of the list endpoint.
+        :param params: The query parameters.
+        :param fields: The names of the fields to load or None to load all fields.
+        """
+        self.resource = resource
+        self._url = url
+        self._params = dict(params or {})
+        self._append_base_url = append_base_url
+        self._offset = offset
+        self._limit = limit
+        self._fields = fields
+
+    def __repr__(self):
+        return '[QuerySet] {} {}'.format(self.resource.__name__, self._params)
+
+    def _clone(self, **kwargs):
+        values = {'params': self._params, 'append_base_url': self._append_base_url, 'offset': self._offset,
+                  'limit': self._limit, 'fields': self._fields}
+        values.update(kwargs)
+        return QuerySet(self.resource, self._url, **values)
+
+    def filter(self, **kwargs):
+        """
+        :param kwargs: The query parameters. The key is the filter parameter and the value is the value to search for.
+        :return: A new query set with the additional filters
+        :raises: A `ValueError` if at least one of the supplied parameters is not in the list of allowed parameters.
+        """
+        if self._offset or self._limit is not None:
+            raise ValueError('Cannot filter a query set once a slice or limit has been applied.')
+
+        params = dict(self._params)
+        for key, value in kwargs.items():
+            if key not in self.resource._filter_parameters:
+                raise ValueError('\'{}\' is not a filter parameter for class \'{}\''.format(key, self.resource.__name__))
+            if isinstance(value, datetime):
+                params[key] = value.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+            else:
+                params[key] = value
+
+        return self._clone(params=params)
+
+    def only(self, *fields):
+        """
+        Load only the given fields of the objects.
+
+        The field names are sent to the server, which may omit all other fields from its responses.
+        Reading a field that was not loaded raises a :class:`~mass_api_client.resources.base.FieldNotLoadedError`.
+
+        :param fields: The names of the fields to load.
+        :return: A new query set loading only the given fields
+        :raises: A `ValueError` if a field does not exist.
+        """
+        self.resource._projection(fields)
+        return self._clone(fields=fields)
+
+    def limit(self, count):
+        """
+        :param count: The maximum number of objects.
+        :return: A new query set returning at most `count` objects
+        """
+        return self[:count]
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            if key < 0:
+                raise ValueError('Negative indexing is not supported.')
+            result = list(self[key:key + 1])
+            if not result:
+                raise IndexError('QuerySet index out of range')
+            return result[0]
+
+        if not isinstance(key, slice):
+            raise TypeError('QuerySet indices must be integers or slices.')
+        if key.step not in (None, 1):
+            raise ValueError('Slicing with a step is not supported.')
+
+        start = key.start or 0
+        if start < 0 or (key.stop is not None and key.stop < 0):
+            raise ValueError('Negative indexing is not supported.')
+
+        offset = self._offset + start
+        limit = self._limit
+        if limit is not None:
+            limit = max(limit - start, 0)
+        if key.stop is not None:
+            stop = max(key.stop - start, 0)
+            limit = stop if limit is None else min(limit, stop)
+
+        return self._clone(offset=offset, limit=limit)
+
+    def __iter__(self):
+        return self.iterator()
+
+    def iterator(self, chunk_size=None, max_workers=pagination.DEFAULT_MAX_WORKERS):
+        """
+        Iterate over the matching objects without caching them.
+
+        :param chunk_size: The number of objects fetched per request. If None, the server's page size is used or,
+                           for slices, the size of the slice and `default_page_size` if the slice has no end.
+        :param max_workers: The maximum number of pages fetched at the same time.
+        :return: An iterator over the matching objects
+        """
+        if self._limit is None and not self._offset:
+            params = dict(self._params)
+            if chunk_size is not None:
+                params[self.page_size_parameter] = chunk_size
+            return self.resource._get_iter_from_url(self._url, params=params, append_base_url=self._append_base_url,
+                                                    max_workers=max_workers, fields=self._fields)
+        return self._iter_slice(chunk_size)
+
+    def _iter_slice(self, chunk_size):
+        if self._limit == 0:
+            return
+
+        page_size = chunk_size or self._limit or self.default_page_size
+
+        projection = self.resource._projection(self._fields)
+        params = self.resource._projection_params(self._params, projection)
+        params[self.page_size_parameter] = page_size
+        params[self.page_parameter] = self._offset // page_size + 1
+        skip = self._offset % page_size
+        remaining = self._limit
+
+        con = ConnectionManager().get_connection(self.resource._connection_alias)
+        pages = pagination.iter_pages(con, self._url, params=params, append_base_url=self._append_base_url,
+                                      resource=self.resource.__name__, operation='items', max_workers=1)
+        try:
+            for res in pages:
+                results = res['results'][skip:]
+                skip = 0
+                if remaining is not None:
+                    results = results[:remaining]
+                    remaining -= len(results)
+                for obj in self.resource._create_instances(results, projection):
+                    yield obj
+                if remaining == 0:
+                    return
+        finally:
+            pages.close()
+
+    def _first_page(self, page_size):
+        projection = self.resource._projection(self._fields)
+        params = self.resource._projection_params(self._params, projection)
+        params[self.page_size_parameter] = page_size
+        con = ConnectionManager().get_connection(self.resource._connection_alias)
+        return con.get_json(self._url, params=params, append_base_url=self._append_base_url,
+                            resource=self.resource.__name__, operation='count')
+
+    def count(self):
+        """
+        Count the matching objects.
+
+        The count is read from the pagination metadata of a single page with one object.
+        If the server does not report it, all matching objects are fetched and counted.
+
+        :return: The number of matching objects
+        """
+        res = self._first_page(1)
+        if 'count' not in res:
+            return sum(1 for _ in self)
+
+        count = max(res['count'] - self._offset, 0)
+        return count if self._limit is None else min(count, self._limit)
+
+    def first(self):
+        """
+        :return: The first matching object or None
+        """
+        for obj in self[:1]:
+            return obj
+        return None
+
+    def exists(self):
+        """
+        :return: True if at least one object matches
+        """
+        if self._offset or self._limit is not None:
+            return self.first() is not None
+        return bool(self._first_page(1)['results'])
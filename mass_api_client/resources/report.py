@@ -1,8 +1,88 @@
 import datetime
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 
 from mass_api_client.connection_manager import ConnectionManager
-from mass_api_client.schemas import ReportSchema
-from .base import BaseResource
+from mass_api_client.tracing import traced
+from .base import BaseResource, DeferredSchema
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class JSONReports(Mapping):
+    def __init__(self, report):
+        """
+        Lazy mapping of the JSON report objects of a report.
+
+        Each report object is fetched on first access and cached afterwards.
+        Iterating over the values or items fetches all missing report objects concurrently.
+
+        :param report: The :class:`Report` the report objects belong to.
+        """
+        self._report = report
+        self._cache = {}
+
+    def __getitem__(self, key):
+        if key not in self._cache:
+            if key not in self._report.json_report_objects:
+                raise KeyError(key)
+            self._cache[key] = self._report.get_json_report_object(key)
+        return self._cache[key]
+
+    def __iter__(self):
+        return iter(self._report.json_report_objects)
+
+    def __len__(self):
+        return len(self._report.json_report_objects)
+
+    def __repr__(self):
+        return '[JSONReports] {} of {} loaded'.format(len(self._cache), len(self))
+
+    def is_loaded(self, key):
+        return key in self._cache
+
+    def _missing(self, keys=None):
+        if keys is None:
+            keys = self._report.json_report_objects.keys()
+        for key in keys:
+            if key not in self._report.json_report_objects:
+                raise KeyError(key)
+        return [key for key in keys if key not in self._cache]
+
+    def prefetch(self, keys=None, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Fetch report objects concurrently.
+
+        :param keys: The keys of the report objects to fetch. All report objects are fetched if None.
+        :param max_workers: The maximum number of concurrent requests.
+        :return: The mapping itself.
+        """
+        _fetch_concurrently([(self, key) for key in self._missing(keys)], max_workers)
+        return self
+
+    def items(self):
+        self.prefetch()
+        return super(JSONReports, self).items()
+
+    def values(self):
+        self.prefetch()
+        return super(JSONReports, self).values()
+
+
+def _fetch_concurrently(jobs, max_workers):
+    if not jobs:
+        return
+
+    if len(jobs) == 1 or max_workers <= 1:
+        for reports, key in jobs:
+            reports[key]
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        futures = [(reports, key, executor.submit(reports._report.get_json_report_object, key))
+                   for reports, key in jobs]
+        for reports, key, future in futures:
+            reports._cache[key] = future.result()
 
 
 class Report(BaseResource):
@@ -11,13 +91,13 @@ class Report(BaseResource):
 
     REPORT_STATUS_CODES = [REPORT_STATUS_CODE_OK, REPORT_STATUS_CODE_FAILURE]
 
-    schema = ReportSchema()
+    schema = DeferredSchema('ReportSchema')
     _endpoint = 'report'
     _creation_point = 'scheduled_analysis/{scheduled_analysis}/submit_report/'
 
     def __init__(self, connection_alias, **kwargs):
         super(Report, self).__init__(connection_alias, **kwargs)
-        self._json_reports_cache = None
+        self._json_reports = None
 
     def __repr__(self):
         return '[Report] {} on {}'.format(self.sample, self.analysis_system)
@@ -56,14 +136,45 @@ class Report(BaseResource):
 
     @property
     def json_reports(self):
-        if self._json_reports_cache:
-            return self._json_reports_cache
+        """
+        A lazy mapping of the JSON report objects of the report. Each report object is only fetched when accessed.
 
-        self._json_reports_cache = {}
-        for key in self.json_report_objects.keys():
-            self._json_reports_cache[key] = self.get_json_report_object(key)
-        return self._json_reports_cache
+        :return: A :class:`JSONReports` mapping.
+        """
+        if self._json_reports is None:
+            self._json_reports = JSONReports(self)
+        return self._json_reports
+
+    def fetch_json_reports(self, keys=None, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Concurrently fetch the JSON report objects of the report.
+
+        :param keys: The keys of the report objects to fetch. All report objects are fetched if None.
+        :param max_workers: The maximum number of concurrent requests.
+        :return: A :class:`JSONReports` mapping.
+        """
+        return self.json_reports.prefetch(keys, max_workers)
+
+    @classmethod
+    def preload_json_reports(cls, reports, keys=None, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Concurrently fetch the JSON report objects of several reports, e.g. a page of reports, in a single batch.
 
+        :param reports: A list of :class:`Report` objects.
+        :param keys: The keys of the report objects to fetch. All report objects are fetched if None.
+                     Reports without the respective key are skipped.
+        :param max_workers: The maximum number of concurrent requests.
+        :return: The list of reports.
+        """
+        jobs = []
+        for report in reports:
+            report_keys = None if keys is None else [key for key in keys if key in report.json_report_objects]
+            jobs.extend((report.json_reports, key) for key in report.json_reports._missing(report_keys))
+
+        _fetch_concurrently(jobs, max_workers)
+        return reports
+
+    @traced
     def get_json_report_object(self, key):
         """
         Retrieve a JSON report object of the report.
@@ -72,8 +183,28 @@ class Report(BaseResource):
         :return: The deserialized JSON report object.
         """
         con = ConnectionManager().get_connection(self._connection_alias)
-        return con.get_json(self.json_report_objects[key], append_base_url=False)
+        return con.get_json(self.json_report_objects[key], append_base_url=False, resource=self.__class__.__name__,
+                            operation='json_report_object')
+
+    def iter_json_report_object(self, key, path='item', chunk_size=65536):
+        """
+        Incrementally retrieve a large JSON report object.
+
+        The report object is parsed while it is downloaded and only the current value is held in memory.
+        Stopping the iteration early closes the connection without downloading the rest.
+
+        :param key: The key of the report object
+        :param path: The path of the values to yield, see :mod:`mass_api_client.json_stream`.
+                     By default the elements of a top-level array are yielded,
+                     e.g. use `'calls.item'` for the elements of the array stored under the key `calls`.
+        :param chunk_size: The number of bytes read at once.
+        :return: An iterator over the values.
+        """
+        con = ConnectionManager().get_connection(self._connection_alias)
+        return con.iter_json(self.json_report_objects[key], path=path, append_base_url=False, chunk_size=chunk_size,
+                             resource=self.__class__.__name__, operation='json_report_object')
 
+    @traced
     def download_raw_report_object_to_file(self, key, file):
         """
         Download a raw report object and store it in a file.
@@ -82,4 +213,5 @@ class Report(BaseResource):
         :param file: A file-like object to store the report object.
         """
         con = ConnectionManager().get_connection(self._connection_alias)
-        return con.download_to_file(self.raw_report_objects[key], file, append_base_url=False)
+        return con.download_to_file(self.raw_report_objects[key], file, append_base_url=False,
+                                    resource=self.__class__.__name__)
@@ -1,11 +1,19 @@
+import io
+import mmap
+import os
 import tempfile
-from contextlib import contextmanager
+from contextlib import contextmanager, ExitStack
 
+from mass_api_client._lazy import get_requests
 from mass_api_client.connection_manager import ConnectionManager
+from mass_api_client.hashing import hash_file
 from mass_api_client.resources.report import Report
-from mass_api_client.schemas import DomainSampleSchema, IPSampleSchema, URISampleSchema, FileSampleSchema, ExecutableBinarySampleSchema
+from mass_api_client.tracing import traced
+from .base import DeferredSchema
 from .base_with_subclasses import BaseWithSubclasses
 
+DEFAULT_SPOOL_THRESHOLD = 8 * 1024 * 1024
+
 
 class Sample(BaseWithSubclasses):
     _endpoint = 'sample'
@@ -19,6 +27,7 @@ class Sample(BaseWithSubclasses):
         'tags__all'
     ]
 
+    @traced
     def get_reports(self):
         """
         Retrieve all reports submitted for this Sample.
@@ -52,7 +61,7 @@ class Sample(BaseWithSubclasses):
 
 
 class DomainSample(Sample):
-    schema = DomainSampleSchema()
+    schema = DeferredSchema('DomainSampleSchema')
     _class_identifier = 'Sample.DomainSample'
     _creation_point = 'sample/submit_domain'
     _default_filters = {'_cls': _class_identifier}
@@ -78,7 +87,7 @@ class DomainSample(Sample):
 
 
 class URISample(Sample):
-    schema = URISampleSchema()
+    schema = DeferredSchema('URISampleSchema')
     _class_identifier = 'Sample.URISample'
     _creation_point = 'sample/submit_uri'
     _default_filters = {'_cls': _class_identifier}
@@ -104,7 +113,7 @@ class URISample(Sample):
       
 
 class IPSample(Sample):
-    schema = IPSampleSchema()
+    schema = DeferredSchema('IPSampleSchema')
     _class_identifier = 'Sample.IPSample'
     _creation_point = 'sample/submit_ip'
     _default_filters = {'_cls': _class_identifier}
@@ -128,10 +137,12 @@ class IPSample(Sample):
 
 
 class FileSample(Sample):
-    schema = FileSampleSchema()
+    schema = DeferredSchema('FileSampleSchema')
     _class_identifier = 'Sample.FileSample'
     _creation_point = 'sample/submit_file'
     _default_filters = {'_cls__startswith': _class_identifier}
+    _local_file = None
+    spool_threshold = DEFAULT_SPOOL_THRESHOLD
 
     _filter_parameters = Sample._filter_parameters + [
         'md5sum',
@@ -159,6 +170,62 @@ class FileSample(Sample):
         """
         return cls._create(additional_binary_files={'file': (filename, file)}, tlp_level=tlp_level, tags=tags)
 
+    @classmethod
+    @traced
+    def get_or_create(cls, file, filename=None, tlp_level=0, tags=None, store=None):
+        """
+        Fetch the sample of a file or create it, if the server does not know the file yet.
+
+        The file is hashed locally in a single pass. Its SHA-256 is looked up in the local store of known hashes
+        and then on the server, so the file is only uploaded if it is new.
+
+        :param file: A path or a binary file-like object, which is read from its current position.
+        :param filename: The filename of a new sample. Defaults to the name of the file.
+        :param tlp_level: The TLP-Level of a new sample
+        :param tags: Tags to add to a new sample.
+        :param store: The :class:`~mass_api_client.known_hashes.KnownHashStore` to use. By default the store in
+                      the user's cache directory is used. Use False to disable the local store.
+        :return: A tuple of the sample and whether it was created.
+        """
+        if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+            with open(file, 'rb') as f:
+                return cls.get_or_create(f, filename or os.path.basename(file), tlp_level, tags, store)
+
+        if tags is None:
+            tags = []
+
+        position = file.tell()
+        hashes = hash_file(file)
+        file.seek(position)
+        sha256sum = hashes['sha256sum']
+        if not filename:
+            filename = os.path.basename(str(getattr(file, 'name', ''))) or sha256sum
+
+        if store is None:
+            from mass_api_client.known_hashes import get_default_store
+            store = get_default_store()
+        server = ConnectionManager().get_connection(cls._connection_alias).base_url
+
+        if store is not False:
+            url = store.get(server, sha256sum)
+            if url is not None:
+                try:
+                    return Sample._get_detail_from_url(url, append_base_url=False), False
+                except get_requests().HTTPError as e:
+                    if e.response is None or e.response.status_code != 404:
+                        raise
+                    store.remove(server, sha256sum)
+
+        sample = cls.query(sha256sum=sha256sum).first()
+        created = sample is None
+        if created:
+            sample = cls.create(filename, file, tlp_level=tlp_level, tags=tags)
+
+        if store is not False:
+            store.add(server, sha256sum, sample.url)
+        return sample, created
+
+    @traced
     def download_to_file(self, file):
         """
         Download and store the file of the sample.
@@ -166,7 +233,7 @@ class FileSample(Sample):
         :param file: A file-like object to store the file.
         """
         con = ConnectionManager().get_connection(self._connection_alias)
-        return con.download_to_file(self.file, file, append_base_url=False)
+        return con.download_to_file(self.file, file, append_base_url=False, resource=self.__class__.__name__)
 
     @contextmanager
     def temporary_file(self):
@@ -177,12 +244,91 @@ class FileSample(Sample):
 
         :return: A file-like object.
         """
+        if self._local_file is not None:
+            # The file has already been downloaded, e.g. by a :class:`~mass_api_client.prefetch.Prefetcher`.
+            self._local_file.seek(0)
+            yield self._local_file
+            return
+
         with tempfile.NamedTemporaryFile() as tmp:
             self.download_to_file(tmp)
             yield tmp
 
+    def open(self, threshold=None):
+        """
+        Download the file of the sample into a spooled buffer.
+
+        The file is kept in memory up to the threshold and written to a temporary file on disk above it.
+        The returned object must be closed after use, e.g. by using it as a context manager.
+
+        :param threshold: The maximum number of bytes kept in memory. Defaults to :attr:`spool_threshold`.
+        :return: A binary file-like object positioned at the start of the file.
+        """
+        if self._local_file is not None:
+            return io.open(self._local_file.name, 'rb')
+
+        if threshold is None:
+            threshold = self.spool_threshold
+        buffer = tempfile.SpooledTemporaryFile(max_size=threshold)
+        try:
+            self.download_to_file(buffer)
+        except BaseException:
+            buffer.close()
+            raise
+        buffer.seek(0)
+        return buffer
+
+    def read_bytes(self):
+        """
+        Download the file of the sample into memory, regardless of its size.
+
+        :return: The content of the file as bytes.
+        """
+        if self._local_file is not None:
+            with io.open(self._local_file.name, 'rb') as f:
+                return f.read()
+
+        buffer = io.BytesIO()
+        self.download_to_file(buffer)
+        return buffer.getvalue()
+
+    @contextmanager
+    def view(self, threshold=None):
+        """
+        Contextmanager to access the file of the sample without copying it.
+
+        Files up to the threshold are downloaded into memory, larger files into a temporary file, which is
+        memory-mapped. The memoryview must not be used after the context has been left.
+
+        :param threshold: The maximum number of bytes kept in memory. Defaults to :attr:`spool_threshold`.
+        :return: A read-only :class:`memoryview` of the file.
+        """
+        if threshold is None:
+            threshold = self.spool_threshold
+        file_size = self.__dict__.get('file_size')
+
+        if self._local_file is None and file_size is not None and file_size <= threshold:
+            buffer = io.BytesIO()
+            self.download_to_file(buffer)
+            with buffer.getbuffer() as view:
+                with view.toreadonly() as readonly:
+                    yield readonly
+            return
+
+        with ExitStack() as stack:
+            f = self._local_file
+            if f is None:
+                f = stack.enter_context(tempfile.TemporaryFile())
+                self.download_to_file(f)
+            if not os.fstat(f.fileno()).st_size:
+                yield memoryview(b'')
+                return
+            mapped = stack.enter_context(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            with memoryview(mapped) as view:
+                yield view
+
 
 class ExecutableBinarySample(FileSample):
-    schema = ExecutableBinarySampleSchema()
+    schema = DeferredSchema('ExecutableBinarySampleSchema')
     _class_identifier = 'Sample.FileSample.ExecutableBinarySample'
     _default_filters = {'_cls': _class_identifier}
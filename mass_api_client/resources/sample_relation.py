@@ -1,5 +1,5 @@
-from mass_api_client.schemas import DroppedBySampleRelationSchema, ResolvedBySampleRelationSchema, \
-    RetrievedBySampleRelationSchema, ContactedBySampleRelationSchema, SsdeepSampleRelationSchema
+from mass_api_client.tracing import traced
+from .base import DeferredSchema
 from .base_with_subclasses import BaseWithSubclasses
 from .sample import Sample
 
@@ -21,6 +21,7 @@ class SampleRelation(BaseWithSubclasses):
     def __str__(self):
         return self.__repr__()
 
+    @traced
     def get_sample(self):
         """
         Retrieves the first :class:`Sample` object of the sample relation from the server.
@@ -29,6 +30,7 @@ class SampleRelation(BaseWithSubclasses):
         """
         return Sample._get_detail_from_url(self.sample, append_base_url=False)
 
+    @traced
     def get_other(self):
         """
         Retrieves the other :class:`Sample` object of the sample relation from the server.
@@ -39,30 +41,30 @@ class SampleRelation(BaseWithSubclasses):
 
 
 class DroppedBySampleRelation(SampleRelation):
-    schema = DroppedBySampleRelationSchema()
+    schema = DeferredSchema('DroppedBySampleRelationSchema')
     _class_identifier = 'SampleRelation.DroppedBySampleRelation'
     _creation_point = 'sample_relation/submit_dropped_by'
 
 
 class ResolvedBySampleRelation(SampleRelation):
-    schema = ResolvedBySampleRelationSchema()
+    schema = DeferredSchema('ResolvedBySampleRelationSchema')
     _class_identifier = 'SampleRelation.ResolvedBySampleRelation'
     _creation_point = 'sample_relation/submit_resolved_by'
 
 
 class ContactedBySampleRelation(SampleRelation):
-    schema = ContactedBySampleRelationSchema()
+    schema = DeferredSchema('ContactedBySampleRelationSchema')
     _class_identifier = 'SampleRelation.ContactedBySampleRelation'
     _creation_point = 'sample_relation/submit_contacted_by'
 
 
 class RetrievedBySampleRelation(SampleRelation):
-    schema = RetrievedBySampleRelationSchema()
+    schema = DeferredSchema('RetrievedBySampleRelationSchema')
     _class_identifier = 'SampleRelation.RetrievedBySampleRelation'
     _creation_point = 'sample_relation/submit_retrieved_by'
 
 
 class SsdeepSampleRelation(SampleRelation):
-    schema = SsdeepSampleRelationSchema()
+    schema = DeferredSchema('SsdeepSampleRelationSchema')
     _class_identifier = 'SampleRelation.SsdeepSampleRelation'
     _creation_point = 'sample_relation/submit_ssdeep'
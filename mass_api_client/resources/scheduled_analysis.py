@@ -1,11 +1,12 @@
-from mass_api_client.schemas import ScheduledAnalysisSchema
-from .base import BaseResource
+from mass_api_client import batch
+from mass_api_client.tracing import traced
+from .base import BaseResource, DeferredSchema
 from .report import Report
 from .sample import Sample
 
 
 class ScheduledAnalysis(BaseResource):
-    schema = ScheduledAnalysisSchema()
+    schema = DeferredSchema('ScheduledAnalysisSchema')
     _endpoint = 'scheduled_analysis'
     _creation_point = _endpoint
 
@@ -24,6 +25,30 @@ class ScheduledAnalysis(BaseResource):
         """
         return cls._create(analysis_system_instance=analysis_system_instance.url, sample=sample.url)
 
+    @classmethod
+    def create_many(cls, analysis_system_instance, samples, max_workers=batch.DEFAULT_MAX_WORKERS, adaptive=False,
+                    checkpoint=None, bulk=None):
+        """
+        Create a :class:`ScheduledAnalysis` for each of the given samples.
+
+        For convenience
+        :func:`~mass_api_client.resources.analysis_system_instance.AnalysisSystemInstance.schedule_many`
+        can be used instead.
+
+        :param analysis_system_instance: The :class:`.AnalysisSystemInstance` for which the samples should be scheduled.
+        :param samples: An iterable of :class:`.Sample` objects.
+        :param max_workers: The maximum number of concurrent requests.
+        :param adaptive: If True, the number of concurrent requests adapts to the load of the server.
+        :param checkpoint: The path of a checkpoint file to resume from and to record progress to.
+        :param bulk: Whether to use the bulk endpoint. By default it is used if the server offers it.
+        :return: A :class:`~mass_api_client.batch.BatchResult` keyed by the sample urls.
+        """
+        samples = list(samples)
+        objects = [dict(analysis_system_instance=analysis_system_instance.url, sample=sample.url) for sample in samples]
+        return batch.create_many(cls, objects, keys=[sample.url for sample in samples], max_workers=max_workers,
+                                 adaptive=adaptive, checkpoint=checkpoint, bulk=bulk)
+
+    @traced
     def create_report(self, additional_metadata=None, json_report_objects=None, raw_report_objects=None, tags=None, analysis_date=None):
         """
         Create a :class:`.Report` and remove the :class:`ScheduledAnalysis` from the server.
@@ -37,6 +62,7 @@ class ScheduledAnalysis(BaseResource):
         """
         return Report.create(self, json_report_objects=json_report_objects, raw_report_objects=raw_report_objects, additional_metadata=additional_metadata, tags=tags, analysis_date=analysis_date)
 
+    @traced
     def get_sample(self):
         """
         Retrieve the scheduled :class:`.Sample`.
@@ -1,7 +1,18 @@
-from .analysis_request import AnalysisRequestSchema
-from .analysis_system import AnalysisSystemSchema
-from .analysis_system_instance import AnalysisSystemInstanceSchema
-from .report import ReportSchema
-from .sample import DomainSampleSchema, IPSampleSchema, URISampleSchema, FileSampleSchema, ExecutableBinarySampleSchema
-from .sample_relation import DroppedBySampleRelationSchema, ContactedBySampleRelationSchema, ResolvedBySampleRelationSchema, RetrievedBySampleRelationSchema, SsdeepSampleRelationSchema
-from .scheduled_analysis import ScheduledAnalysisSchema
+from mass_api_client._lazy import lazy_attributes
+
+_modules = {
+    '.analysis_request': ['AnalysisRequestSchema'],
+    '.analysis_system': ['AnalysisSystemSchema'],
+    '.analysis_system_instance': ['AnalysisSystemInstanceSchema'],
+    '.report': ['ReportSchema'],
+    '.sample': ['DomainSampleSchema', 'IPSampleSchema', 'URISampleSchema', 'FileSampleSchema',
+                'ExecutableBinarySampleSchema'],
+    '.sample_relation': ['DroppedBySampleRelationSchema', 'ContactedBySampleRelationSchema',
+                         'ResolvedBySampleRelationSchema', 'RetrievedBySampleRelationSchema',
+                         'SsdeepSampleRelationSchema'],
+    '.scheduled_analysis': ['ScheduledAnalysisSchema'],
+}
+
+__all__ = [name for names in _modules.values() for name in names]
+
+__getattr__, __dir__ = lazy_attributes(__name__, {name: module for module, names in _modules.items() for name in names})
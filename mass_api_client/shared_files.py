@@ -0,0 +1,299 @@
+"""Hand-off of sample files to analyzers running in a process pool.
+
+The parent process downloads the file of each sample once into a shared memory block
+(:class:`multiprocessing.shared_memory.SharedMemory`) or into a memory-mapped file. The analysis function runs in a
+child process and receives the sample and a read-only :class:`memoryview` of the file, without copying or re-reading
+it. The parent removes each block as soon as its analysis has finished or failed, and all remaining blocks when the
+analyzer stops.
+
+def entropy_analysis(sample, data):
+    return {'json_report_objects': {'entropy': ('entropy', {'entropy': shannon_entropy(data)})}}
+
+analyzer = SharedFileAnalyzer(entropy_analysis, processes=8)
+analyzer.run(analysis_system_instance.get_scheduled_analyses())
+"""
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+SHARED_MEMORY = 'shared_memory'
+MMAP = 'mmap'
+BACKENDS = (SHARED_MEMORY, MMAP)
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class SharedFile:
+    def __init__(self, backend, name, size):
+        """
+        Picklable reference to a sample file in shared memory, which is passed to the child processes.
+
+        :param backend: :data:`SHARED_MEMORY` or :data:`MMAP`.
+        :param name: The name of the shared memory block or the path of the memory-mapped file.
+        :param size: The size of the file in bytes.
+        """
+        self.backend = backend
+        self.name = name
+        self.size = size
+
+    def __repr__(self):
+        return '[SharedFile] {} {} ({} bytes)'.format(self.backend, self.name, self.size)
+
+    @contextmanager
+    def open(self):
+        """
+        Contextmanager to map the file into the current process.
+
+        The memoryview must not be used after the context has been left.
+
+        :return: A read-only :class:`memoryview` of the file.
+        """
+        if self.size == 0:
+            yield memoryview(b'')
+            return
+
+        if self.backend == SHARED_MEMORY:
+            from multiprocessing.shared_memory import SharedMemory
+            segment = SharedMemory(self.name)
+            view = segment.buf[:self.size].toreadonly()
+        else:
+            with open(self.name, 'rb') as f:
+                segment = mmap.mmap(f.fileno(), self.size, access=mmap.ACCESS_READ)
+            view = memoryview(segment)
+
+        try:
+            yield view
+        finally:
+            view.release()
+            segment.close()
+
+
+class _BufferWriter:
+    def __init__(self, buffer):
+        self._buffer = buffer
+        self.position = 0
+
+    def write(self, data):
+        end = self.position + len(data)
+        if end > len(self._buffer):
+            raise ValueError('The downloaded file is larger than the file size of the sample.')
+        self._buffer[self.position:end] = data
+        self.position = end
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class SharedFileSegment:
+    def __init__(self, shared_file, segment=None):
+        """
+        Owner of a shared file in the parent process. The file is removed by :func:`unlink`.
+
+        :param shared_file: The :class:`SharedFile` passed to the children.
+        :param segment: The shared memory block, if any.
+        """
+        self.shared_file = shared_file
+        self._segment = segment
+        self._lock = threading.Lock()
+
+    def unlink(self):
+        with self._lock:
+            if self.shared_file is None:
+                return
+            if self._segment is not None:
+                self._segment.close()
+                self._segment.unlink()
+            elif self.shared_file.size:
+                os.unlink(self.shared_file.name)
+            self.shared_file = None
+            self._segment = None
+
+
+def share_sample(sample, backend=SHARED_MEMORY, directory=None):
+    """
+    Download the file of a sample into shared memory.
+
+    :param sample: A :class:`~mass_api_client.resources.FileSample`.
+    :param backend: :data:`SHARED_MEMORY` or :data:`MMAP`.
+    :param directory: The directory of memory-mapped files. Defaults to `/dev/shm` if available.
+    :return: A :class:`SharedFileSegment`.
+    """
+    if backend not in BACKENDS:
+        raise ValueError('Unknown backend {}, expected one of {}.'.format(backend, ', '.join(BACKENDS)))
+
+    if backend == SHARED_MEMORY:
+        from multiprocessing.shared_memory import SharedMemory
+        size = sample.file_size
+        if not size:
+            return SharedFileSegment(SharedFile(backend, None, 0))
+        segment = SharedMemory(create=True, size=size)
+        try:
+            writer = _BufferWriter(segment.buf)
+            sample.download_to_file(writer)
+            if writer.position != size:
+                raise ValueError('The downloaded file is smaller than the file size of the sample.')
+        except BaseException:
+            segment.close()
+            segment.unlink()
+            raise
+        return SharedFileSegment(SharedFile(backend, segment.name, size), segment)
+
+    if directory is None and os.path.isdir('/dev/shm'):
+        directory = '/dev/shm'
+    fd, path = tempfile.mkstemp(prefix='mass_sample_', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            sample.download_to_file(f)
+            size = f.tell()
+    except BaseException:
+        os.unlink(path)
+        raise
+    if not size:
+        os.unlink(path)
+    return SharedFileSegment(SharedFile(backend, path, size))
+
+
+def _analyze(analysis_function, sample, shared_file):
+    with shared_file.open() as data:
+        return analysis_function(sample, data)
+
+
+class SharedFileAnalyzer:
+    def __init__(self, analysis_function, processes=None, backend=SHARED_MEMORY, max_in_flight=None, directory=None):
+        """
+        Run an analysis function in a process pool on files handed over in shared memory.
+
+        The analysis function is called in a child process with the :class:`~mass_api_client.resources.Sample` and
+        a read-only :class:`memoryview` of its file. It must be picklable, i.e. defined at module level. It returns
+        a dictionary of keyword arguments for
+        :func:`~mass_api_client.resources.ScheduledAnalysis.create_report`, with which the parent creates the
+        report, or None if no report should be created.
+
+        :param analysis_function: The analysis function.
+        :param processes: The number of child processes. Defaults to the number of CPUs.
+        :param backend: :data:`SHARED_MEMORY` or :data:`MMAP`.
+        :param max_in_flight: The maximum number of files in shared memory at once. Defaults to twice the number
+                              of processes.
+        :param directory: The directory of memory-mapped files, see :func:`share_sample`.
+        """
+        if backend not in BACKENDS:
+            raise ValueError('Unknown backend {}, expected one of {}.'.format(backend, ', '.join(BACKENDS)))
+        self.analysis_function = analysis_function
+        self.processes = processes or os.cpu_count() or 1
+        self.backend = backend
+        self.max_in_flight = max_in_flight or 2 * self.processes
+        self.directory = directory
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def run(self, scheduled_analyses):
+        """
+        Analyze scheduled analyses and create their reports.
+
+        A failed analysis or report is logged and its scheduled analysis is left on the server. If a child process crashes,
+        the remaining analyses are not submitted and the pool is restarted on the next call.
+
+        :param scheduled_analyses: An iterable of :class:`~mass_api_client.resources.ScheduledAnalysis` objects.
+        :return: A tuple of the number of created reports and the number of failed analyses.
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.processes)
+
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        # The segments are released by the done callbacks of the futures in the threads of the pool.
+        lock = threading.Lock()
+        segments = set()
+        pending = deque()
+        counts = [0, 0]
+        try:
+            for scheduled_analysis in scheduled_analyses:
+                in_flight.acquire()
+                try:
+                    sample = scheduled_analysis.get_sample()
+                    segment = share_sample(sample, self.backend, self.directory)
+                except Exception:
+                    in_flight.release()
+                    logger.exception('Failed to share the sample of %s.', scheduled_analysis)
+                    counts[1] += 1
+                    continue
+
+                with lock:
+                    segments.add(segment)
+                try:
+                    future = self._pool.submit(_analyze, self.analysis_function, sample, segment.shared_file)
+                except BrokenProcessPool:
+                    self._release(segment, segments, lock, in_flight)
+                    counts[1] += 1
+                    break
+                future.add_done_callback(
+                    lambda f, segment=segment: self._release(segment, segments, lock, in_flight))
+                pending.append((scheduled_analysis, future))
+
+                while pending and pending[0][1].done():
+                    self._report(*pending.popleft(), counts=counts)
+
+            while pending:
+                self._report(*pending.popleft(), counts=counts)
+        finally:
+            for _, future in pending:
+                future.cancel()
+            with lock:
+                remaining = list(segments)
+            for segment in remaining:
+                segment.unlink()
+            if self._broken():
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+        return tuple(counts)
+
+    def _broken(self):
+        # There is no public API to check whether a process pool is broken.
+        return self._pool is not None and getattr(self._pool, '_broken', False)
+
+    @staticmethod
+    def _release(segment, segments, lock, in_flight):
+        segment.unlink()
+        with lock:
+            segments.discard(segment)
+        in_flight.release()
+
+    @staticmethod
+    def _report(scheduled_analysis, future, counts):
+        try:
+            result = future.result()
+        except BrokenProcessPool:
+            counts[1] += 1
+            logger.error('A child process crashed while analyzing %s.', scheduled_analysis)
+            return
+        except Exception:
+            counts[1] += 1
+            logger.exception('Failed to analyze %s.', scheduled_analysis)
+            return
+
+        if result is not None:
+            try:
+                scheduled_analysis.create_report(**result)
+            except Exception:
+                counts[1] += 1
+                logger.exception('Failed to create the report of %s.', scheduled_analysis)
+                return
+            counts[0] += 1
@@ -0,0 +1,285 @@
+"""Similarity search of ssdeep hashes.
+
+Two ssdeep hashes can only be similar if their block sizes are equal or differ by a factor of two, and if the
+compared digests have a common substring of :data:`ROLLING_WINDOW` characters. :class:`SsdeepIndex` therefore
+indexes every 7-gram of both digests of a hash together with the block size it belongs to. A new hash is only
+compared with the hashes sharing at least one such gram, instead of with all hashes. The scores are the same as
+those of `ssdeep -d`.
+
+The index grows incrementally, so new samples can be added as they arrive. The relations found for a sample are
+returned as `(sample_url, other_url, 'ssdeep', {'match': score})` tuples, which can be passed to
+:class:`~mass_api_client.relation_writer.RelationWriter`:
+
+index = SsdeepIndex(threshold=60)
+with RelationWriter() as writer:
+    writer.write_many(index.add_samples(FileSample.items()))
+"""
+import re
+from array import array
+
+SPAMSUM_LENGTH = 64
+ROLLING_WINDOW = 7
+MIN_BLOCKSIZE = 3
+DEFAULT_THRESHOLD = 50
+
+# Index entries are packed as (tag << 32 | id), where the tag is the upper half of the mixed gram key.
+_MASK32 = (1 << 32) - 1
+_MASK64 = (1 << 64) - 1
+_MIX = 0x9E3779B97F4A7C15
+_BLOCKSIZE_SEED = 0xC2B2AE3D27D4EB4F
+_MIN_BUCKET_BITS = 10
+_MAX_BUCKET_BITS = 32
+_MAX_LOAD = 8
+
+
+def parse_hash(ssdeep_hash):
+    """
+    :param ssdeep_hash: An ssdeep hash like `3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C`. A file name appended by
+                        `ssdeep` after a comma is ignored.
+    :return: A tuple of the block size and both digests, with runs of more than three identical characters
+             shortened to three, as done by ssdeep before comparing.
+    :raises: A `ValueError` if the hash is malformed.
+    """
+    try:
+        blocksize, digest1, digest2 = ssdeep_hash.split(':', 2)
+        blocksize = int(blocksize)
+    except (AttributeError, ValueError):
+        raise ValueError('Malformed ssdeep hash: {!r}'.format(ssdeep_hash))
+    digest2 = digest2.split(',', 1)[0]
+    if blocksize < MIN_BLOCKSIZE or len(digest1) > SPAMSUM_LENGTH or len(digest2) > SPAMSUM_LENGTH:
+        raise ValueError('Malformed ssdeep hash: {!r}'.format(ssdeep_hash))
+    return blocksize, _eliminate_sequences(digest1), _eliminate_sequences(digest2)
+
+
+_SEQUENCE = re.compile(r'(.)\1{3,}')
+
+
+def _eliminate_sequences(digest):
+    return _SEQUENCE.sub(r'\1\1\1', digest)
+
+
+def _grams(digest):
+    return {digest[i:i + ROLLING_WINDOW] for i in range(len(digest) - ROLLING_WINDOW + 1)}
+
+
+def _lcs_length(s1, s2):
+    # Bit-parallel longest common subsequence (Hyyrö), one big integer operation per character of s2.
+    masks = {}
+    for i, c in enumerate(s1):
+        masks[c] = masks.get(c, 0) | 1 << i
+    full = (1 << len(s1)) - 1
+    v = full
+    for c in s2:
+        u = v & masks.get(c, 0)
+        v = ((v + u) | (v - u)) & full
+    return len(s1) - bin(v).count('1')
+
+
+def _edit_distance(s1, s2):
+    # ssdeep weighs insertions and deletions with 1 and substitutions with 2, so the distance follows
+    # from the longest common subsequence.
+    return len(s1) + len(s2) - 2 * _lcs_length(s1, s2)
+
+
+def _score_strings(s1, s2, blocksize):
+    if len(s1) > SPAMSUM_LENGTH or len(s2) > SPAMSUM_LENGTH:
+        return 0
+    if _grams(s1).isdisjoint(_grams(s2)):
+        return 0
+
+    score = _edit_distance(s1, s2) * SPAMSUM_LENGTH // (len(s1) + len(s2))
+    score = 100 * score // SPAMSUM_LENGTH
+    if score >= 100:
+        return 0
+    score = 100 - score
+
+    # Small block sizes cannot produce matches as reliable as larger ones.
+    if blocksize >= (99 + ROLLING_WINDOW) // ROLLING_WINDOW * MIN_BLOCKSIZE:
+        return score
+    return min(score, blocksize // MIN_BLOCKSIZE * min(len(s1), len(s2)))
+
+
+def _compare_parsed(hash1, hash2):
+    blocksize1, digest11, digest12 = hash1
+    blocksize2, digest21, digest22 = hash2
+    if blocksize1 == blocksize2:
+        # Like ssdeep, only identical hashes score 100 regardless of the block size. Equal first digests alone are
+        # scored as usual, which caps the score for small block sizes.
+        if digest11 == digest21 and digest12 == digest22:
+            return 100
+        return max(_score_strings(digest11, digest21, blocksize1),
+                   _score_strings(digest12, digest22, blocksize1 * 2))
+    if blocksize1 * 2 == blocksize2:
+        return _score_strings(digest21, digest12, blocksize2)
+    if blocksize2 * 2 == blocksize1:
+        return _score_strings(digest11, digest22, blocksize1)
+    return 0
+
+
+def compare(hash1, hash2):
+    """
+    Compare two ssdeep hashes like `ssdeep -d`.
+
+    :param hash1: An ssdeep hash.
+    :param hash2: An ssdeep hash.
+    :return: The match score between 0 and 100.
+    :raises: A `ValueError` if a hash is malformed.
+    """
+    return _compare_parsed(parse_hash(hash1), parse_hash(hash2))
+
+
+def _gram_keys(digest, blocksize):
+    seed = blocksize * _BLOCKSIZE_SEED
+    data = digest.encode('ascii', 'replace')
+    if len(data) < ROLLING_WINDOW:
+        # Short digests have no grams, but are still matched if they are identical.
+        return {((int.from_bytes(data, 'big') ^ seed ^ _MASK64) * _MIX) & _MASK64}
+    return {((int.from_bytes(data[i:i + ROLLING_WINDOW], 'big') ^ seed) * _MIX) & _MASK64
+            for i in range(len(data) - ROLLING_WINDOW + 1)}
+
+
+class SsdeepIndex:
+    def __init__(self, threshold=DEFAULT_THRESHOLD, capacity=0):
+        """
+        :param threshold: The minimum score of a match.
+        :param capacity: The expected number of hashes. The index grows beyond it, but sizing it in advance
+                         saves rebuilding it while it grows.
+        """
+        if not 0 < threshold <= 100:
+            raise ValueError('The threshold must be between 1 and 100.')
+        self.threshold = threshold
+        self._keys = []
+        self._hashes = []
+        self._ids = {}
+        self._entries = 0
+        # Roughly 60 grams per hash
+        bits = _MIN_BUCKET_BITS
+        while bits < _MAX_BUCKET_BITS and capacity * 60 > _MAX_LOAD << bits:
+            bits += 1
+        self._bucket_bits = bits
+        self._buckets = [None] * (1 << bits)
+        # The number of candidates compared so far, a measure of the selectivity of the index.
+        self.comparisons = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def match(self, ssdeep_hash, threshold=None):
+        """
+        Find the indexed hashes similar to a hash.
+
+        :param ssdeep_hash: An ssdeep hash.
+        :param threshold: The minimum score. Defaults to the threshold of the index.
+        :return: A list of (key, score) tuples, the best matches first.
+        :raises: A `ValueError` if the hash is malformed.
+        """
+        parsed = parse_hash(ssdeep_hash)
+        return self._match(parsed, self._index_keys(parsed), threshold or self.threshold)
+
+    def add(self, key, ssdeep_hash, threshold=None):
+        """
+        Add a hash to the index and find the hashes added before which are similar to it.
+
+        A key which is already indexed is not added again and has no matches.
+
+        :param key: The key identifying the hash, e.g. the url of a sample.
+        :param ssdeep_hash: An ssdeep hash.
+        :param threshold: The minimum score. Defaults to the threshold of the index.
+        :return: A list of (key, score) tuples, the best matches first.
+        :raises: A `ValueError` if the hash is malformed.
+        """
+        if key in self._ids:
+            return []
+        parsed = parse_hash(ssdeep_hash)
+        index_keys = self._index_keys(parsed)
+        matches = self._match(parsed, index_keys, threshold or self.threshold)
+
+        hash_id = len(self._keys)
+        self._ids[key] = hash_id
+        self._keys.append(key)
+        # Stored as a single string to keep a million hashes in memory.
+        self._hashes.append('{}:{}:{}'.format(*parsed))
+        shift = 32 - self._bucket_bits
+        buckets = self._buckets
+        for index_key in index_keys:
+            tag = index_key >> 32
+            bucket = buckets[tag >> shift]
+            if bucket is None:
+                bucket = buckets[tag >> shift] = array('Q')
+            bucket.append(tag << 32 | hash_id)
+        self._entries += len(index_keys)
+        if self._entries > _MAX_LOAD << self._bucket_bits and self._bucket_bits < _MAX_BUCKET_BITS:
+            self._grow()
+        return matches
+
+    def add_sample(self, sample, threshold=None):
+        """
+        Add the ssdeep hash of a sample.
+
+        :param sample: A :class:`~mass_api_client.resources.FileSample`. Other samples and samples without
+                       an ssdeep hash are ignored.
+        :param threshold: The minimum score. Defaults to the threshold of the index.
+        :return: A list of `(sample_url, other_url, 'ssdeep', {'match': score})` tuples.
+        """
+        ssdeep_hash = getattr(sample, 'ssdeep_hash', None)
+        if not ssdeep_hash:
+            return []
+        return [(sample.url, other_url, 'ssdeep', {'match': score})
+                for other_url, score in self.add(sample.url, ssdeep_hash, threshold)]
+
+    def add_samples(self, samples, threshold=None):
+        """
+        Add the ssdeep hashes of samples, see :func:`add_sample`.
+
+        :return: A generator of `(sample_url, other_url, 'ssdeep', {'match': score})` tuples.
+        """
+        for sample in samples:
+            yield from self.add_sample(sample, threshold)
+
+    @staticmethod
+    def _index_keys(parsed):
+        blocksize, digest1, digest2 = parsed
+        return _gram_keys(digest1, blocksize) | _gram_keys(digest2, blocksize * 2)
+
+    def _candidates(self, index_keys):
+        candidates = set()
+        shift = 32 - self._bucket_bits
+        buckets = self._buckets
+        for index_key in index_keys:
+            tag = index_key >> 32
+            bucket = buckets[tag >> shift]
+            if bucket is None:
+                continue
+            for entry in bucket:
+                if entry >> 32 == tag:
+                    candidates.add(entry & _MASK32)
+        return candidates
+
+    def _match(self, parsed, index_keys, threshold):
+        matches = []
+        for hash_id in self._candidates(index_keys):
+            self.comparisons += 1
+            blocksize, digest1, digest2 = self._hashes[hash_id].split(':')
+            score = _compare_parsed(parsed, (int(blocksize), digest1, digest2))
+            if score >= threshold:
+                matches.append((self._keys[hash_id], score))
+        matches.sort(key=lambda match: -match[1])
+        return matches
+
+    def _grow(self):
+        # The bucket of an entry is the top bits of its tag, so the entries can be redistributed.
+        self._bucket_bits += 1
+        shift = 64 - self._bucket_bits
+        buckets = [None] * (1 << self._bucket_bits)
+        for bucket in self._buckets:
+            if bucket is None:
+                continue
+            for entry in bucket:
+                index = entry >> shift
+                if buckets[index] is None:
+                    buckets[index] = array('Q')
+                buckets[index].append(entry)
+        self._buckets = buckets
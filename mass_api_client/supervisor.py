@@ -0,0 +1,364 @@
+"""A pre-forking supervisor scaling the number of analysis worker processes with the backlog.
+
+Each worker process runs :func:`~mass_api_client.utils.process_analyses` for the same analysis system instance.
+The scheduled analyses are partitioned between the workers by a hash of their url, so every analysis is processed
+by one worker only. The supervisor periodically reads `scheduled_analyses_count` of the instance and the rate at
+which the workers complete analyses, and scales the workers so the backlog is drained within the configured time,
+as long as the load and the available memory of the host allow it. Crashed workers are restarted. On SIGTERM or
+SIGINT, the workers finish their current analysis and exit.
+
+supervisor = Supervisor(analysis_system_instance, size_analysis, sleep_time=7,
+                        policy=ScalingPolicy(min_workers=1, max_workers=8))
+supervisor.run()
+"""
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import zlib
+
+DEFAULT_INTERVAL = 10
+DEFAULT_DRAIN_TIME = 300
+DEFAULT_MAX_LOAD = 1.0
+DEFAULT_MIN_AVAILABLE_MEMORY = 0.1
+DEFAULT_SHUTDOWN_TIMEOUT = 60
+# Per worker: the analysis being processed and a ring of the recently finished ones.
+_RECENT_CLAIMS = 63
+_CLAIM_STRIDE = 1 + _RECENT_CLAIMS
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+def host_load():
+    """
+    :return: The one minute load average per CPU or None if it is not available.
+    """
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
+
+
+def available_memory(meminfo='/proc/meminfo'):
+    """
+    :return: The fraction of the memory available for new processes or None if it is not available.
+    """
+    values = {}
+    try:
+        with open(meminfo) as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                values[key] = int(value.split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    if not values.get('MemTotal') or 'MemAvailable' not in values:
+        return None
+    return values['MemAvailable'] / values['MemTotal']
+
+
+class ScalingPolicy:
+    def __init__(self, min_workers=1, max_workers=None, drain_time=DEFAULT_DRAIN_TIME, max_load=DEFAULT_MAX_LOAD,
+                 min_available_memory=DEFAULT_MIN_AVAILABLE_MEMORY):
+        """
+        :param min_workers: The minimum number of worker processes.
+        :param max_workers: The maximum number of worker processes. Defaults to the number of CPUs.
+        :param drain_time: The time in seconds in which the backlog should be processed.
+        :param max_load: No workers are added while the load average per CPU is above this value.
+        :param min_available_memory: No workers are added while the fraction of available memory is below this
+                                     value, and one worker is removed per decision.
+        """
+        self.min_workers = min_workers
+        self.max_workers = max_workers or os.cpu_count() or 1
+        if not 0 <= self.min_workers <= self.max_workers:
+            raise ValueError('Expected 0 <= min_workers <= max_workers.')
+        self.drain_time = drain_time
+        self.max_load = max_load
+        self.min_available_memory = min_available_memory
+
+    def desired_workers(self, workers, backlog, rate=None, load=None, memory=None):
+        """
+        Decide the number of worker processes.
+
+        Workers are added at once, but removed one per decision to avoid oscillation.
+
+        :param workers: The current number of workers.
+        :param backlog: The number of scheduled analyses.
+        :param rate: The number of analyses a worker completes per second or None if it is not known yet.
+        :param load: The load average per CPU, see :func:`host_load`.
+        :param memory: The fraction of available memory, see :func:`available_memory`.
+        :return: A tuple of the number of workers and the reason of the decision.
+        """
+        if memory is not None and memory < self.min_available_memory:
+            return max(self.min_workers, workers - 1), 'memory'
+
+        if not backlog:
+            target, reason = self.min_workers, 'idle'
+        elif rate:
+            target, reason = math.ceil(backlog / (rate * self.drain_time)), 'backlog'
+        else:
+            # The throughput of the workers is not known yet.
+            target, reason = workers + 1, 'backlog'
+        target = min(self.max_workers, max(self.min_workers, target, 1 if backlog else 0))
+
+        if target > workers and load is not None and load > self.max_load:
+            return max(self.min_workers, workers), 'load'
+        if target < workers:
+            return workers - 1, reason
+        return target, reason
+
+
+class _WorkerState:
+    busy = False
+    stopping = False
+
+
+def _claim_key(url):
+    return (zlib.crc32(url.encode()) << 32 | zlib.adler32(url.encode())) or 1
+
+
+class _Claims:
+    def __init__(self, array, slot):
+        # While the workers are re-partitioned, another worker may still iterate over an older poll which contains
+        # the analysis. Workers therefore claim an analysis before processing it and remember the finished ones.
+        self._array = array
+        self._offset = slot * _CLAIM_STRIDE
+        self._recent = 0
+
+    @staticmethod
+    def clear(array, slot):
+        # The analysis of a crashed worker is no longer processed. Its finished analyses stay claimed.
+        with array.get_lock():
+            array[slot * _CLAIM_STRIDE] = 0
+
+    def claim(self, key):
+        with self._array.get_lock():
+            if key in self._array[:]:
+                return False
+            self._array[self._offset] = key
+            return True
+
+    def release(self, key):
+        with self._array.get_lock():
+            self._array[self._offset] = 0
+            self._array[self._offset + 1 + self._recent] = key
+        self._recent = (self._recent + 1) % _RECENT_CLAIMS
+
+
+def _worker_main(partition, claim_slot, partitions, completed, claims, analysis_system_instance, analysis_method,
+                 sleep_time):
+    from mass_api_client.utils import process_analyses
+
+    state = _WorkerState()
+    claims = _Claims(claims, claim_slot)
+
+    def stop(signum, frame):
+        state.stopping = True
+        if not state.busy:
+            raise KeyboardInterrupt()
+
+    def partitioned_analysis_method(scheduled_analysis):
+        if zlib.crc32(scheduled_analysis.url.encode()) % partitions.value != partition:
+            return
+        key = _claim_key(scheduled_analysis.url)
+        # Busy before claiming, so SIGTERM cannot interrupt the worker between claiming and releasing.
+        state.busy = True
+        claimed = False
+        try:
+            claimed = claims.claim(key)
+            if claimed:
+                analysis_method(scheduled_analysis)
+        finally:
+            state.busy = False
+            if claimed:
+                claims.release(key)
+                with completed.get_lock():
+                    completed.value += 1
+        if state.stopping:
+            raise KeyboardInterrupt()
+
+    # Ctrl+C is handled by the supervisor, which stops the workers gracefully.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, stop)
+    process_analyses(analysis_system_instance, partitioned_analysis_method, sleep_time)
+
+
+class Supervisor:
+    def __init__(self, analysis_system_instance, analysis_method, sleep_time, policy=None, interval=DEFAULT_INTERVAL,
+                 metrics=None, shutdown_timeout=DEFAULT_SHUTDOWN_TIMEOUT):
+        """
+        :param analysis_system_instance: The analysis system instance for which the analyses are scheduled.
+        :param analysis_method: A function which analyses a scheduled analysis, see
+                                :func:`~mass_api_client.utils.process_analyses`.
+        :param sleep_time: Time the workers wait between polls to the MASS server.
+        :param policy: The :class:`ScalingPolicy`.
+        :param interval: Time in seconds between scaling decisions.
+        :param metrics: A :class:`~mass_api_client.metrics.Metrics` object to which the scaling decisions are
+                        reported as gauges.
+        :param shutdown_timeout: Time in seconds the workers may take to finish their analysis on shutdown,
+                                 before they are killed.
+        """
+        self.analysis_system_instance = analysis_system_instance
+        self.analysis_method = analysis_method
+        self.sleep_time = sleep_time
+        self.policy = policy or ScalingPolicy()
+        self.interval = interval
+        self.metrics = metrics
+        self.shutdown_timeout = shutdown_timeout
+        self.restarts = 0
+
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        self._partitions = self._context.Value('i', 1)
+        self._completed = self._context.Value('l', 0)
+        # Retiring workers keep their claim slot until they have exited, so there are twice as many slots as workers.
+        self._claim_slots = 2 * self.policy.max_workers
+        self._claims = self._context.Array('Q', self._claim_slots * _CLAIM_STRIDE)
+        self._workers = []
+        self._retiring = []
+        self._claim_slot_of = {}
+        self._stopped = threading.Event()
+
+    @property
+    def workers(self):
+        """The number of worker processes."""
+        return len(self._workers)
+
+    def stop(self):
+        """
+        Stop :func:`run`. The workers finish their current analysis.
+        """
+        self._stopped.set()
+
+    def run(self):
+        """
+        Supervise the workers until :func:`stop` is called or SIGTERM or SIGINT is received.
+        """
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+            signal.signal(signal.SIGINT, lambda signum, frame: self.stop())
+
+        rate = None
+        last_completed = 0
+        last_time = time.monotonic()
+        try:
+            self._scale(self.policy.min_workers)
+            while not self._stopped.is_set():
+                self._restart_crashed()
+
+                now = time.monotonic()
+                completed = self._completed.value
+                if self._workers and completed > last_completed:
+                    observed = (completed - last_completed) / (now - last_time) / len(self._workers)
+                    rate = observed if rate is None else 0.5 * rate + 0.5 * observed
+                last_completed, last_time = completed, now
+
+                self.step(rate)
+                self._stopped.wait(self.interval)
+        finally:
+            self.shutdown()
+
+    def step(self, rate=None):
+        """
+        Make one scaling decision.
+
+        :param rate: The number of analyses a worker completes per second or None if it is not known.
+        :return: The reason of the decision, see :func:`ScalingPolicy.desired_workers`.
+        """
+        try:
+            instance = type(self.analysis_system_instance).get(self.analysis_system_instance.uuid)
+            backlog = instance.scheduled_analyses_count
+        except Exception:
+            logger.exception('Failed to read the backlog of %s.', self.analysis_system_instance)
+            return None
+
+        load = host_load()
+        memory = available_memory()
+        desired, reason = self.policy.desired_workers(len(self._workers), backlog, rate, load, memory)
+        if desired != len(self._workers):
+            logger.info('Scaling from %d to %d workers (%s, backlog %d).', len(self._workers), desired, reason,
+                        backlog)
+            self._scale(desired)
+
+        if self.metrics is not None:
+            gauges = {'supervisor_workers': len(self._workers),
+                      'supervisor_backlog': backlog,
+                      'supervisor_worker_rate': rate or 0,
+                      'supervisor_restarts': self.restarts,
+                      'supervisor_completed': self._completed.value}
+            if load is not None:
+                gauges['supervisor_host_load'] = load
+            if memory is not None:
+                gauges['supervisor_host_available_memory'] = memory
+            for name, value in gauges.items():
+                self.metrics.set_gauge(name, value)
+        return reason
+
+    def _start(self, partition, claim_slot):
+        process = self._context.Process(target=_worker_main, name='mass-worker-{}'.format(partition), daemon=True,
+                                        args=(partition, claim_slot, self._partitions, self._completed, self._claims,
+                                              self.analysis_system_instance,
+                                              self.analysis_method, self.sleep_time))
+        process.start()
+        self._claim_slot_of[process] = claim_slot
+        return process
+
+    def _free_claim_slot(self):
+        # A retiring worker may still release its claim, so its slot is only reused after it has exited.
+        used = {self._claim_slot_of[process] for process in self._workers + self._retiring}
+        return next((slot for slot in range(self._claim_slots) if slot not in used), None)
+
+    def _scale(self, workers):
+        retiring = []
+        for process in self._retiring:
+            if process.is_alive():
+                retiring.append(process)
+            else:
+                del self._claim_slot_of[process]
+        self._retiring = retiring
+
+        if workers > len(self._workers):
+            for partition in range(len(self._workers), workers):
+                claim_slot = self._free_claim_slot()
+                if claim_slot is None:
+                    logger.info('Waiting for retiring workers to exit before starting more workers.')
+                    break
+                self._workers.append(self._start(partition, claim_slot))
+            self._partitions.value = max(1, len(self._workers))
+        else:
+            self._partitions.value = max(1, workers)
+            while len(self._workers) > workers:
+                process = self._workers.pop()
+                process.terminate()
+                self._retiring.append(process)
+
+    def _restart_crashed(self):
+        for partition, process in enumerate(self._workers):
+            if not process.is_alive():
+                logger.warning('Worker %d exited with code %s, restarting it.', partition, process.exitcode)
+                claim_slot = self._claim_slot_of.pop(process)
+                _Claims.clear(self._claims, claim_slot)
+                self._workers[partition] = self._start(partition, claim_slot)
+                self.restarts += 1
+
+    def shutdown(self):
+        """
+        Stop all workers, killing those which do not finish their analysis within the shutdown timeout.
+        """
+        processes = self._workers + self._retiring
+        self._workers, self._retiring = [], []
+        self._claim_slot_of = {}
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.monotonic() + self.shutdown_timeout
+        for process in processes:
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning('Killing worker %s.', process.name)
+                process.kill()
+                process.join()
@@ -37,13 +37,13 @@ class SwitchConnection:
                 return subcls(cls._connection_alias, **data)
 
             @classmethod
-            def _deserialize(cls, data, many=False):
+            def _deserialize(cls, data, many=False, partial=False):
                 if many:
-                    return [cls._deserialize(item) for item in data]
+                    return [cls._deserialize(item, partial=partial) for item in data]
 
                 subcls = cls._unmodified_cls._search_subclass(data['_cls'])
 
-                return subcls._deserialize(data, many)
+                return subcls._deserialize(data, many, partial)
 
         return ModifiedResource
 
@@ -0,0 +1,296 @@
+"""Local evaluation of the tag filter expressions of analysis systems.
+
+A tag filter expression like `sample-type:filesample and not (tag:packed or tag:signed)` selects the samples an
+analysis system receives. Tags are compared as exact strings. `not` binds stronger than `and`, which binds
+stronger than `or`, and parentheses group subexpressions. An empty expression selects no samples.
+
+Expressions are compiled into Python functions over a set of tags. :class:`TagFilterIndex` avoids evaluating all
+expressions for every sample: each expression is indexed by trigger tags, at least one of which must be present
+for the expression to match. Only the expressions triggered by a tag of the sample are evaluated, together with
+those which can match without any particular tag, like `not tag:benign`.
+
+index = TagFilterIndex()
+index.add_analysis_systems(AnalysisSystem.all())
+for sample in Sample.items():
+    print(sample, index.match_sample(sample))
+"""
+import itertools
+import re
+from collections import Counter
+
+OPERATORS = ('and', 'or', 'not')
+MAX_TRIGGER_OPTIONS = 16
+
+_TOKEN = re.compile(r'\s*(?:([()])|([^\s()]+))')
+
+# Nodes of the syntax tree
+_TAG = 'tag'
+_NOT = 'not'
+_AND = 'and'
+_OR = 'or'
+
+
+def _tokenize(expression):
+    tokens = []
+    position = 0
+    while True:
+        match = _TOKEN.match(expression, position)
+        if match is None or not match.group(0).strip():
+            break
+        parenthesis, word = match.groups()
+        tokens.append((match.start(1) if parenthesis else match.start(2), parenthesis or word))
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.index = 0
+
+    def error(self, message):
+        position = self.tokens[self.index][0] if self.index < len(self.tokens) else len(self.expression)
+        return ValueError('Invalid tag filter expression {!r} at position {}: {}.'.format(
+            self.expression, position, message))
+
+    def peek(self):
+        if self.index < len(self.tokens):
+            token = self.tokens[self.index][1]
+            return token.lower() if token.lower() in OPERATORS else token
+        return None
+
+    def parse(self):
+        node = self.parse_or()
+        if self.index < len(self.tokens):
+            raise self.error('expected an operator, found {!r}'.format(self.tokens[self.index][1]))
+        return node
+
+    def parse_or(self):
+        operands = [self.parse_and()]
+        while self.peek() == 'or':
+            self.index += 1
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else (_OR, operands)
+
+    def parse_and(self):
+        operands = [self.parse_not()]
+        while self.peek() == 'and':
+            self.index += 1
+            operands.append(self.parse_not())
+        return operands[0] if len(operands) == 1 else (_AND, operands)
+
+    def parse_not(self):
+        if self.peek() == 'not':
+            self.index += 1
+            return _NOT, self.parse_not()
+        return self.parse_atom()
+
+    def parse_atom(self):
+        token = self.peek()
+        if token is None:
+            raise self.error('unexpected end of the expression')
+        if token == '(':
+            self.index += 1
+            node = self.parse_or()
+            if self.peek() != ')':
+                raise self.error('expected )')
+            self.index += 1
+            return node
+        if token == ')' or token in OPERATORS:
+            raise self.error('expected a tag, found {!r}'.format(self.tokens[self.index][1]))
+        self.index += 1
+        return _TAG, token
+
+
+def _flatten(node):
+    # Merges nested operators of the same kind, e.g. `a and (b and c)`, and removes double negations.
+    kind = node[0]
+    if kind == _TAG:
+        return node
+    if kind == _NOT:
+        operand = _flatten(node[1])
+        return operand[1] if operand[0] == _NOT else (_NOT, operand)
+    operands = []
+    for operand in node[1]:
+        operand = _flatten(operand)
+        operands.extend(operand[1] if operand[0] == kind else [operand])
+    return kind, operands
+
+
+def _source(node):
+    kind = node[0]
+    if kind == _TAG:
+        return '{!r} in tags'.format(node[1])
+    if kind == _NOT:
+        operand = _source(node[1])
+        return 'not ({})'.format(operand) if node[1][0] in (_AND, _OR) else 'not {}'.format(operand)
+    return ' {} '.format(kind).join('({})'.format(_source(operand)) if operand[0] == _OR else _source(operand)
+                                   for operand in node[1])
+
+
+def _tags(node):
+    if node[0] == _TAG:
+        return {node[1]}
+    if node[0] == _NOT:
+        return _tags(node[1])
+    return set().union(*(_tags(operand) for operand in node[1]))
+
+
+def _trigger_options(node):
+    # Alternative sets of tags of which every matching tag set contains at least one. An empty list means that
+    # the expression can match without any particular tag.
+    kind = node[0]
+    if kind == _TAG:
+        return [frozenset([node[1]])]
+    if kind == _NOT:
+        return []
+    options = [_trigger_options(operand) for operand in node[1]]
+    if kind == _AND:
+        # Each operand must be true, so the triggers of any of them will do.
+        return [option for operand_options in options for option in operand_options]
+    if not all(options):
+        return []
+    return [frozenset().union(*combination)
+            for combination in itertools.islice(itertools.product(*options), MAX_TRIGGER_OPTIONS)]
+
+
+class TagFilter:
+    def __init__(self, expression):
+        """
+        A compiled tag filter expression.
+
+        :param expression: The tag filter expression.
+        :raises: A `ValueError` if the expression is invalid.
+        """
+        self.expression = expression
+        if not expression.strip():
+            self.tags = frozenset()
+            self.trigger_options = [frozenset()]
+            self._predicate = lambda tags: False
+            return
+
+        tree = _flatten(_Parser(expression).parse())
+        self.tags = frozenset(_tags(tree))
+        self.trigger_options = _trigger_options(tree)
+        code = compile('lambda tags: {}'.format(_source(tree)), '<tag filter {!r}>'.format(expression), 'eval')
+        self._predicate = eval(code, {'__builtins__': {}})
+
+    def __repr__(self):
+        return '[TagFilter] {}'.format(self.expression)
+
+    @property
+    def trigger_tags(self):
+        """
+        The smallest set of tags of which every matching tag set contains at least one, or None if the expression
+        can match without any particular tag.
+        """
+        return min(self.trigger_options, key=len) if self.trigger_options else None
+
+    def __call__(self, tags):
+        return self.matches(tags)
+
+    def matches(self, tags):
+        """
+        :param tags: The tags of a sample.
+        :return: Whether the expression selects a sample with these tags.
+        """
+        if not isinstance(tags, (set, frozenset)):
+            tags = frozenset(tags)
+        return self._predicate(tags)
+
+
+class TagFilterIndex:
+    def __init__(self):
+        """
+        Find the tag filters which match a set of tags without evaluating all of them.
+
+        Of the alternative trigger tags of a filter, the index uses those referenced by the fewest filters, as
+        tags used by many filters, like the sample types, are usually common among the samples as well.
+        """
+        self._entries = []
+        self._by_tag = None
+        self._always = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, key, expression):
+        """
+        :param key: The object returned for matches of the expression.
+        :param expression: A tag filter expression or a :class:`TagFilter`.
+        :raises: A `ValueError` if the expression is invalid.
+        """
+        tag_filter = expression if isinstance(expression, TagFilter) else TagFilter(expression)
+        self._entries.append((key, tag_filter))
+        self._by_tag = None
+
+    def add_analysis_system(self, analysis_system):
+        """
+        :param analysis_system: An :class:`~mass_api_client.resources.AnalysisSystem`, which is returned for
+                                matching tags.
+        """
+        self.add(analysis_system, analysis_system.tag_filter_expression or '')
+
+    def add_analysis_systems(self, analysis_systems):
+        for analysis_system in analysis_systems:
+            self.add_analysis_system(analysis_system)
+
+    def _build(self):
+        frequency = Counter(tag for _, tag_filter in self._entries for tag in tag_filter.tags)
+        by_tag = {}
+        always = []
+        for position, (_, tag_filter) in enumerate(self._entries):
+            if not tag_filter.trigger_options:
+                always.append(position)
+                continue
+            # An empty set of trigger tags never matches and is not indexed at all.
+            triggers = min(tag_filter.trigger_options,
+                           key=lambda option: (sum(frequency[tag] for tag in option), len(option)))
+            for tag in triggers:
+                by_tag.setdefault(tag, []).append(position)
+        self._by_tag, self._always = by_tag, always
+
+    def candidates(self, tags):
+        """
+        :return: The number of filters which must be evaluated for these tags.
+        """
+        return len(self._candidates(tags))
+
+    def _candidates(self, tags):
+        if self._by_tag is None:
+            self._build()
+        positions = set(self._always)
+        by_tag = self._by_tag
+        for tag in tags:
+            triggered = by_tag.get(tag)
+            if triggered is not None:
+                positions.update(triggered)
+        return positions
+
+    def match(self, tags):
+        """
+        :param tags: The tags of a sample.
+        :return: The keys of all matching filters, in the order they were added.
+        """
+        if not isinstance(tags, (set, frozenset)):
+            tags = frozenset(tags)
+        entries = self._entries
+        return [entries[position][0] for position in sorted(self._candidates(tags))
+                if entries[position][1]._predicate(tags)]
+
+    def match_sample(self, sample):
+        """
+        :param sample: A :class:`~mass_api_client.resources.Sample`.
+        :return: The keys of all filters matching the tags of the sample, e.g. the analysis systems it is
+                 dispatched to.
+        """
+        return self.match(sample.tags or ())
+
+    def route(self, samples):
+        """
+        :param samples: An iterable of samples.
+        :return: A generator of (sample, keys) tuples, see :func:`match_sample`.
+        """
+        for sample in samples:
+            yield sample, self.match_sample(sample)
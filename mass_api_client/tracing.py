@@ -0,0 +1,245 @@
+"""Pluggable tracing of high-level operations and their HTTP requests.
+
+By default a no-op tracer is installed. Use :func:`set_tracer` to record spans, e.g. with
+:class:`OpenTelemetryTracer` to export them to an OpenTelemetry backend:
+
+from mass_api_client import tracing
+
+tracing.set_tracer(tracing.OpenTelemetryTracer())
+"""
+import abc
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+
+class NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def end(self):
+        pass
+
+
+class Tracer(abc.ABC):
+    enabled = True
+
+    @abc.abstractmethod
+    def start_span(self, name, attributes=None):
+        """
+        Open a span as a child of the currently active span.
+
+        :param name: The name of the span.
+        :param attributes: A dictionary of initial attributes.
+        :return: A context manager returning an object with `set_attribute`, `set_attributes` and `record_exception`.
+        """
+
+    def start_detached_span(self, name, attributes=None):
+        """
+        Open a span as a child of the currently active span, without making it the active span. It is used for
+        spans which are ended in another frame, e.g. when a generator is closed, and must not be the parent of the
+        spans opened in the meantime.
+
+        The default implementation opens and closes a span with :func:`start_span` when the span is ended, with
+        its duration as the `duration` attribute.
+
+        :param name: The name of the span.
+        :param attributes: A dictionary of initial attributes.
+        :return: An object with `set_attribute`, `set_attributes`, `record_exception` and `end`.
+        """
+        return _DeferredSpan(self, name, attributes)
+
+
+class NoopTracer(Tracer):
+    enabled = False
+    _span = NoopSpan()
+
+    @contextmanager
+    def start_span(self, name, attributes=None):
+        yield self._span
+
+    def start_detached_span(self, name, attributes=None):
+        return self._span
+
+
+class _DeferredSpan:
+    def __init__(self, tracer, name, attributes):
+        self._tracer = tracer
+        self._name = name
+        self._attributes = dict(attributes or {})
+        self._exception = None
+        self._start = time.monotonic()
+
+    def set_attribute(self, key, value):
+        self._attributes[key] = value
+
+    def set_attributes(self, attributes):
+        self._attributes.update(attributes)
+
+    def record_exception(self, exception):
+        self._exception = exception
+
+    def end(self):
+        self._attributes['duration'] = time.monotonic() - self._start
+        with self._tracer.start_span(self._name, self._attributes) as span:
+            if self._exception is not None:
+                span.record_exception(self._exception)
+
+
+class RecordedSpan:
+    def __init__(self, name, parent, attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = dict(attributes or {})
+        self.start = time.monotonic()
+        self.end = None
+        self.exception = None
+
+    @property
+    def duration(self):
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes):
+        self.attributes.update(attributes)
+
+    def record_exception(self, exception):
+        self.exception = exception
+
+    def __repr__(self):
+        return '[RecordedSpan] {}'.format(self.name)
+
+
+class RecordingTracer(Tracer):
+    def __init__(self):
+        """
+        A tracer which keeps all finished spans in memory, e.g. for tests or ad-hoc profiling.
+        """
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def start_span(self, name, attributes=None):
+        stack = self._local.__dict__.setdefault('stack', [])
+        span = RecordedSpan(name, stack[-1] if stack else None, attributes)
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            stack.pop()
+            self._finish(span)
+
+    def start_detached_span(self, name, attributes=None):
+        stack = self._local.__dict__.setdefault('stack', [])
+        return _DetachedRecordedSpan(self, RecordedSpan(name, stack[-1] if stack else None, attributes))
+
+    def _finish(self, span):
+        span.end = time.monotonic()
+        with self._lock:
+            self.spans.append(span)
+
+    def children(self, span):
+        return [s for s in self.spans if s.parent is span]
+
+
+class _DetachedRecordedSpan:
+    def __init__(self, tracer, span):
+        self._tracer = tracer
+        self.span = span
+
+    def set_attribute(self, key, value):
+        self.span.set_attribute(key, value)
+
+    def set_attributes(self, attributes):
+        self.span.set_attributes(attributes)
+
+    def record_exception(self, exception):
+        self.span.record_exception(exception)
+
+    def end(self):
+        self._tracer._finish(self.span)
+
+
+class OpenTelemetryTracer(Tracer):
+    def __init__(self, tracer=None):
+        """
+        Adapter forwarding spans to OpenTelemetry. Requires the `opentelemetry-api` package.
+
+        :param tracer: An OpenTelemetry tracer. Defaults to the tracer of the global tracer provider.
+        """
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer('mass_api_client')
+
+        self._tracer = tracer
+
+    @contextmanager
+    def start_span(self, name, attributes=None):
+        with self._tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield span
+
+    def start_detached_span(self, name, attributes=None):
+        # Unlike start_as_current_span, the span is not attached to the context.
+        return self._tracer.start_span(name, attributes=attributes)
+
+
+_noop_tracer = NoopTracer()
+_tracer = _noop_tracer
+
+
+def set_tracer(tracer):
+    """
+    Install a tracer for all connections and resources.
+
+    :param tracer: A :class:`Tracer` object or None to disable tracing.
+    """
+    global _tracer
+    _tracer = tracer if tracer is not None else _noop_tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+def traced(func=None, name=None):
+    """
+    Decorator opening a span around each call of the decorated function.
+
+    Without a name, the span is named after the class of the first argument and the function,
+    e.g. `FileSample.download_to_file`.
+    """
+    if func is None:
+        return functools.partial(traced, name=name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _tracer.enabled:
+            return func(*args, **kwargs)
+
+        with _tracer.start_span(name or _span_name(func, args)):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _span_name(func, args):
+    if not args:
+        return func.__name__
+
+    owner = args[0] if isinstance(args[0], type) else type(args[0])
+    return '{}.{}'.format(owner.__name__, func.__name__)
@@ -28,12 +28,16 @@ if __name__ == "__main__":
 """
 import requests
 from mass_api_client import resources
+from mass_api_client import tracing
+from mass_api_client.prefetch import Prefetcher, DEFAULT_MAX_BYTES
+from mass_api_client.shared_files import SharedFileAnalyzer, SHARED_MEMORY
 import logging
 import time
 
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
 
+@tracing.traced(name='get_or_create_analysis_system_instance')
 def get_or_create_analysis_system_instance(instance_uuid='', identifier='', verbose_name='', tag_filter_exp='', uuid_file='uuid.txt'):
     """Get or create an analysis system instance for the analysis system with the respective identifier.
 
@@ -72,7 +76,8 @@ def get_or_create_analysis_system_instance(instance_uuid='', identifier='', verb
     return analysis_system_instance
 
 
-def process_analyses(analysis_system_instance, analysis_method, sleep_time):
+def process_analyses(analysis_system_instance, analysis_method, sleep_time, prefetch=0,
+                     prefetch_bytes=DEFAULT_MAX_BYTES):
     """Process all analyses which are scheduled for the analysis system instance.
 
     This function does not terminate on its own, give it a SIGINT or Ctrl+C to stop.
@@ -80,12 +85,50 @@ def process_analyses(analysis_system_instance, analysis_method, sleep_time):
     :param analysis_system_instance: The analysis system instance for which the analyses are scheduled.
     :param analysis_method: A function or method which analyses a scheduled analysis. The function must not take further arguments.
     :param sleep_time: Time to wait between polls to the MASS server
+    :param prefetch: The number of scheduled analyses whose samples and files are fetched in the background while
+                     the current one is analyzed. The analysis method then receives
+                     :class:`~mass_api_client.prefetch.PrefetchedAnalysis` handles. Disabled if 0.
+    :param prefetch_bytes: The maximum total size of prefetched files.
     """
     try:
         while True:
-            for analysis_request in analysis_system_instance.get_scheduled_analyses():
-                analysis_method(analysis_request)
+            with tracing.get_tracer().start_span('process_analyses.iteration'):
+                scheduled_analyses = analysis_system_instance.get_scheduled_analyses()
+                if prefetch:
+                    scheduled_analyses = Prefetcher(scheduled_analyses, lookahead=prefetch, max_bytes=prefetch_bytes)
+                for analysis_request in scheduled_analyses:
+                    with tracing.get_tracer().start_span('process_analyses.analysis'):
+                        try:
+                            analysis_method(analysis_request)
+                        finally:
+                            if prefetch:
+                                analysis_request.close()
             time.sleep(sleep_time)
     except KeyboardInterrupt:
         logging.debug('Shutting down.')
         return
+
+
+def process_analyses_in_pool(analysis_system_instance, analysis_function, sleep_time, processes=None,
+                             backend=SHARED_MEMORY):
+    """Process all analyses which are scheduled for the analysis system instance in a process pool.
+
+    The file of each sample is downloaded once into shared memory and handed to the child processes without copying,
+    see :class:`~mass_api_client.shared_files.SharedFileAnalyzer`.
+    This function does not terminate on its own, give it a SIGINT or Ctrl+C to stop.
+
+    :param analysis_system_instance: The analysis system instance for which the analyses are scheduled.
+    :param analysis_function: A module level function taking the sample and a memoryview of its file and returning
+                              the keyword arguments of the report or None.
+    :param sleep_time: Time to wait between polls to the MASS server
+    :param processes: The number of child processes. Defaults to the number of CPUs.
+    :param backend: 'shared_memory' or 'mmap'.
+    """
+    with SharedFileAnalyzer(analysis_function, processes=processes, backend=backend) as analyzer:
+        try:
+            while True:
+                with tracing.get_tracer().start_span('process_analyses.iteration'):
+                    analyzer.run(analysis_system_instance.get_scheduled_analyses())
+                time.sleep(sleep_time)
+        except KeyboardInterrupt:
+            logging.debug('Shutting down.')
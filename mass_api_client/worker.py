@@ -0,0 +1,239 @@
+"""A worker serving the scheduled analyses of several analysis system instances from one thread pool.
+
+All instances are polled together. Their scheduled analyses are ordered by priority, by a per-instance round
+number and by the time they were scheduled. The round number interleaves the instances, so an instance with a
+long backlog cannot starve the others at the same priority. Each instance may run at most a configured number of
+analyses at once, and an analysis which is queued, running or has just finished is never started again when it
+is returned by the next poll.
+
+Each instance queues its analyses in its own heap. The next analysis is taken from a heap of the first analyses
+of the instances which may start another one, so instances at their limit cost nothing while dispatching.
+
+worker = MultiInstanceWorker(threads=8, sleep_time=10)
+worker.add_instance(strings_instance, strings_analysis, max_concurrency=2)
+worker.add_instance(size_instance, size_analysis)
+worker.run()
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_THREADS = 4
+DEFAULT_SLEEP_TIME = 10
+
+logger = logging.getLogger(__name__)
+logger.addHandler(logging.NullHandler())
+
+
+class _Instance:
+    def __init__(self, analysis_system_instance, analysis_method, max_concurrency):
+        self.analysis_system_instance = analysis_system_instance
+        self.analysis_method = analysis_method
+        self.max_concurrency = max_concurrency
+        self.next_round = 0
+        self.running = 0
+        self.queue = []
+
+    @property
+    def available(self):
+        return self.running < self.max_concurrency
+
+
+class MultiInstanceWorker:
+    def __init__(self, threads=DEFAULT_THREADS, sleep_time=DEFAULT_SLEEP_TIME):
+        """
+        :param threads: The maximum number of analyses running at once over all instances.
+        :param sleep_time: Time to wait between polls to the MASS server.
+        """
+        self.threads = threads
+        self.sleep_time = sleep_time
+        self._instances = []
+        self._ready = []
+        self._queued = 0
+        self._sequence = itertools.count()
+        self._round = 0
+        self._known = set()
+        self._finished = {}
+        self._generation = 0
+        self._running = 0
+        self._finished_since_dispatch = False
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._executor = None
+
+    def add_instance(self, analysis_system_instance, analysis_method, max_concurrency=1):
+        """
+        Serve the scheduled analyses of an analysis system instance.
+
+        :param analysis_system_instance: The :class:`~mass_api_client.resources.AnalysisSystemInstance`.
+        :param analysis_method: A function or method which analyses a scheduled analysis,
+                                like the one passed to :func:`~mass_api_client.utils.process_analyses`.
+        :param max_concurrency: The maximum number of analyses of this instance running at once.
+        """
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency must be at least 1.')
+        with self._condition:
+            self._instances.append(_Instance(analysis_system_instance, analysis_method, max_concurrency))
+
+    @property
+    def queued(self):
+        """The number of scheduled analyses waiting to be started."""
+        return self._queued
+
+    @property
+    def running(self):
+        """The number of running analyses."""
+        return self._running
+
+    def poll(self):
+        """
+        Fetch the scheduled analyses of all instances and queue the new ones.
+
+        :return: The number of newly queued scheduled analyses.
+        """
+        with self._condition:
+            self._generation += 1
+            generation = self._generation
+            instances = list(self._instances)
+
+        queued = 0
+        for instance in instances:
+            try:
+                scheduled_analyses = instance.analysis_system_instance.get_scheduled_analyses()
+            except Exception:
+                logger.exception('Failed to poll %s.', instance.analysis_system_instance)
+                continue
+            scheduled_analyses = sorted(scheduled_analyses, key=lambda s: (-s.priority, s.analysis_scheduled))
+            with self._condition:
+                for scheduled_analysis in scheduled_analyses:
+                    if self._push(instance, scheduled_analysis):
+                        queued += 1
+
+        with self._condition:
+            # Analyses finished before this poll started are no longer returned by the server.
+            self._finished = {url: finished for url, finished in self._finished.items() if finished >= generation}
+        return queued
+
+    def _push(self, instance, scheduled_analysis):
+        url = scheduled_analysis.url
+        if url in self._known or url in self._finished:
+            return False
+        self._known.add(url)
+
+        # An instance which was idle joins at the current round instead of catching up with its earlier rounds.
+        round_number = max(instance.next_round, self._round)
+        instance.next_round = round_number + 1
+        key = (-scheduled_analysis.priority, round_number, scheduled_analysis.analysis_scheduled, next(self._sequence))
+        heapq.heappush(instance.queue, (key, scheduled_analysis))
+        self._queued += 1
+        if instance.queue[0][0] is key:
+            self._make_ready(instance)
+        return True
+
+    def _make_ready(self, instance):
+        # Offers the first queued analysis of an instance which may start another one. Entries of the ready heap
+        # become stale when the first analysis of the instance changes or it reaches its limit, and are skipped.
+        if instance.queue and instance.available:
+            heapq.heappush(self._ready, (instance.queue[0][0], next(self._sequence), instance))
+
+    def _pop(self):
+        # Must be called with the condition held.
+        while self._ready:
+            key, _, instance = heapq.heappop(self._ready)
+            if instance.available and instance.queue and instance.queue[0][0] is key:
+                _, scheduled_analysis = heapq.heappop(instance.queue)
+                self._queued -= 1
+                return key, instance, scheduled_analysis
+        return None
+
+    def dispatch(self):
+        """
+        Start queued analyses while threads are available.
+
+        :return: The number of started analyses.
+        """
+        started = 0
+        with self._condition:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.threads)
+            self._finished_since_dispatch = False
+            while self._running < self.threads:
+                entry = self._pop()
+                if entry is None:
+                    break
+                key, instance, scheduled_analysis = entry
+                self._round = max(self._round, key[1])
+                instance.running += 1
+                self._running += 1
+                self._make_ready(instance)
+                self._executor.submit(self._analyze, instance, scheduled_analysis)
+                started += 1
+        return started
+
+    def _analyze(self, instance, scheduled_analysis):
+        finished = False
+        try:
+            instance.analysis_method(scheduled_analysis)
+            finished = True
+        except Exception:
+            logger.exception('Failed to analyze %s.', scheduled_analysis)
+        finally:
+            with self._condition:
+                instance.running -= 1
+                self._running -= 1
+                if instance.running == instance.max_concurrency - 1:
+                    self._make_ready(instance)
+                self._known.discard(scheduled_analysis.url)
+                if finished:
+                    self._finished[scheduled_analysis.url] = self._generation
+                self._finished_since_dispatch = True
+                self._condition.notify_all()
+
+    def run_once(self):
+        """
+        Poll all instances once and wait until all queued analyses have finished.
+        """
+        self.poll()
+        while True:
+            self.dispatch()
+            with self._condition:
+                if not self._queued and not self._running:
+                    return
+                self._condition.wait_for(lambda: self._finished_since_dispatch)
+
+    def run(self):
+        """
+        Poll and analyze until :func:`stop` is called or a SIGINT or Ctrl+C is received.
+        """
+        next_poll = 0
+        try:
+            while not self._stopped.is_set():
+                if time.monotonic() >= next_poll:
+                    self.poll()
+                    next_poll = time.monotonic() + self.sleep_time
+                self.dispatch()
+                with self._condition:
+                    # Woken up early when an analysis finishes and a thread becomes available.
+                    self._condition.wait_for(lambda: self._finished_since_dispatch or self._stopped.is_set(),
+                                             max(0, next_poll - time.monotonic()))
+        except KeyboardInterrupt:
+            logger.debug('Shutting down.')
+        finally:
+            self.close()
+
+    def stop(self):
+        """
+        Stop :func:`run` after the running analyses have finished. Queued analyses are not started.
+        """
+        self._stopped.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
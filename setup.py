@@ -23,6 +23,17 @@ setup(name='mass_api_client',
       version=version,
       license='MIT',
       url='https://github.com/mass-project/mass_api_client',
+      python_requires='>=3.8',
       install_requires=['requests==2.19.1', 'marshmallow==2.15.4'],
+      extras_require={
+          'opentelemetry': ['opentelemetry-api'],
+          'zstd': ['zstandard'],
+          'orjson': ['orjson'],
+          'numpy': ['numpy'],
+          'ssdeep': ['ssdeep'],
+      },
       packages=find_packages(),
+      entry_points={
+          'console_scripts': ['mass-ingest = mass_api_client.ingest:main'],
+      },
       )
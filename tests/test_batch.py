@@ -0,0 +1,196 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import requests
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager, batch
+from mass_api_client.batch import AdaptiveConcurrency, run_batch
+from mass_api_client.resources import AnalysisRequest, AnalysisSystem, AnalysisSystemInstance, FileSample, \
+    ScheduledAnalysis
+
+
+class RunBatchTestCase(unittest.TestCase):
+    def test_results_and_errors_are_collected(self):
+        def function(item):
+            if item % 3 == 0:
+                raise ValueError(item)
+            return item * 2
+
+        result = run_batch(function, range(10), keys='abcdefghij', max_workers=3)
+        self.assertEqual(list('abcdefghij'), [item.key for item in result])
+        self.assertEqual([2, 4, 8, 10, 14, 16], result.results)
+        self.assertEqual(['a', 'd', 'g', 'j'], [key for key, _ in result.errors])
+        self.assertEqual((6, 4, 0), (result.succeeded, result.failed, result.skipped))
+
+    def test_concurrency_is_bounded(self):
+        running = [0, 0]
+        lock = threading.Lock()
+
+        def function(item):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            threading.Event().wait(0.005)
+            with lock:
+                running[0] -= 1
+
+        run_batch(function, range(40), max_workers=4)
+        self.assertLessEqual(running[1], 4)
+
+    def test_overload_is_retried(self):
+        response = requests.Response()
+        response.status_code = 503
+        attempts = []
+
+        def function(item):
+            attempts.append(item)
+            if len(attempts) < 3:
+                raise requests.HTTPError(response=response)
+            return item
+
+        adaptive = AdaptiveConcurrency(8, initial=4)
+        result = run_batch(function, [1], adaptive=adaptive)
+        self.assertEqual([1], result.results)
+        self.assertEqual([1, 1, 1], attempts)
+        # Halved twice, then increased by the success.
+        self.assertEqual(2, adaptive.limit)
+
+    def test_posts_which_may_have_been_processed_are_not_retried(self):
+        errors = [requests.ConnectionError('Connection reset by peer'), requests.ReadTimeout()]
+        for status_code in (500, 502, 504):
+            response = requests.Response()
+            response.status_code = status_code
+            errors.append(requests.HTTPError(response=response))
+        attempts = []
+
+        def function(error):
+            attempts.append(error)
+            raise error
+
+        result = run_batch(function, errors)
+        self.assertEqual(len(errors), result.failed)
+        self.assertEqual(len(errors), len(attempts))
+
+    def test_unreachable_server_is_retried(self):
+        attempts = []
+
+        def function(item):
+            attempts.append(item)
+            if len(attempts) < 2:
+                requests.post('http://127.0.0.1:1/')
+            return item
+
+        result = run_batch(function, [1])
+        self.assertEqual([1], result.results)
+        self.assertEqual([1, 1], attempts)
+
+    def test_adaptive_concurrency(self):
+        adaptive = AdaptiveConcurrency(4)
+        self.assertEqual(1, adaptive.limit)
+        for _ in range(1 + 2 + 3 + 4 + 4):
+            adaptive.on_success()
+        self.assertEqual(4, adaptive.limit)
+        adaptive.on_overload()
+        self.assertEqual(2, adaptive.limit)
+        adaptive.on_overload()
+        adaptive.on_overload()
+        self.assertEqual(1, adaptive.limit)
+
+
+class CreateManyTestCase(unittest.TestCase):
+    def setUp(self):
+        batch._bulk_endpoints.clear()
+        self.addCleanup(batch._bulk_endpoints.clear)
+
+    def start_server(self, **kwargs):
+        self.server = MassStandInServer(sample_count=20, report_count=0, **kwargs)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+        self.samples = list(FileSample.items())
+        self.instance = AnalysisSystemInstance.get('instance')
+
+    def test_schedule_many(self):
+        self.start_server()
+        result = self.instance.schedule_many(self.samples, max_workers=4)
+
+        self.assertEqual(20, result.succeeded)
+        self.assertTrue(all(isinstance(s, ScheduledAnalysis) for s in result.results))
+        self.assertEqual([s.url for s in self.samples], [s.sample for s in result.results])
+        self.assertEqual(20, len(self.server.scheduled_analyses))
+        self.assertEqual({(self.server.base_url, 'scheduled_analysis'): False}, batch._bulk_endpoints)
+
+    def test_errors_are_collected_per_sample(self):
+        self.start_server()
+        missing = FileSample._create_instance_from_data(dict(self.samples[0].__dict__))
+        missing.url = self.server.base_url + 'sample/missing/'
+
+        result = self.instance.schedule_many(self.samples[:3] + [missing], max_workers=2)
+        self.assertEqual(3, result.succeeded)
+        self.assertEqual([missing.url], [key for key, _ in result.errors])
+        self.assertIsInstance(result.errors[0][1], requests.HTTPError)
+
+    def test_bulk_endpoint(self):
+        self.start_server(bulk_endpoints=True)
+        analysis_system = AnalysisSystem._create_instance_from_data({
+            'url': self.server.base_url + 'analysis_system/benchmark/', 'identifier_name': 'benchmark',
+            'verbose_name': 'Benchmark', 'tag_filter_expression': '', 'information_text': ''})
+        requests_before = self.server.request_count
+
+        result = AnalysisRequest.create_many(self.samples, analysis_system, max_workers=2)
+        self.assertEqual(20, result.succeeded)
+        self.assertTrue(all(isinstance(r, AnalysisRequest) for r in result.results))
+        self.assertEqual(20, len(self.server.analysis_requests))
+        self.assertEqual(1, self.server.request_count - requests_before)
+        self.assertTrue(batch._bulk_endpoints[(self.server.base_url, 'analysis_request')])
+
+    def test_adaptive_concurrency_against_overloaded_server(self):
+        self.start_server(max_concurrent_posts=2)
+        result = self.instance.schedule_many(self.samples, max_workers=8, adaptive=True)
+
+        self.assertEqual(20, result.succeeded)
+        self.assertEqual(20, len(self.server.scheduled_analyses))
+
+    def test_checkpoint(self):
+        self.start_server()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'schedule.ckpt')
+            first = self.instance.schedule_many(self.samples[:5], checkpoint=path)
+            second = self.instance.schedule_many(self.samples, checkpoint=path)
+
+        self.assertEqual(5, first.succeeded)
+        self.assertEqual((15, 5), (second.succeeded, second.skipped))
+        self.assertEqual([s.url for s in first.results], [item.result for item in second.items[:5]])
+        self.assertEqual(20, len(self.server.scheduled_analyses))
+
+    def test_bulk_chunks_are_checkpointed_when_done(self):
+        self.start_server(bulk_endpoints=True)
+        analysis_system = AnalysisSystem._create_instance_from_data({
+            'url': self.server.base_url + 'analysis_system/benchmark/', 'identifier_name': 'benchmark',
+            'verbose_name': 'Benchmark', 'tag_filter_expression': '', 'information_text': ''})
+        post_bulk = batch._post_bulk
+        recorded = []
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'request.ckpt')
+
+            def counting_post_bulk(resource, con, chunk):
+                with open(path) as fp:
+                    recorded.append(len(fp.readlines()))
+                return post_bulk(resource, con, chunk)
+
+            with mock.patch('mass_api_client.batch._post_bulk', counting_post_bulk):
+                objects = [dict(sample=sample.url, analysis_system=analysis_system.url) for sample in self.samples]
+                result = batch.create_many(AnalysisRequest, objects, max_workers=1, checkpoint=path, bulk_size=5)
+
+        self.assertEqual(20, result.succeeded)
+        self.assertEqual([0, 5, 10, 15], recorded)
+
+    def test_keys_must_be_unique(self):
+        self.start_server()
+        with self.assertRaises(ValueError):
+            self.instance.schedule_many(self.samples[:1] * 2)
@@ -0,0 +1,92 @@
+import json
+import os
+import tempfile
+import unittest
+
+from benchmarks import import_time, run, serialization, ssdeep_index
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager
+from mass_api_client.resources import Sample, FileSample
+
+
+class MassStandInServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MassStandInServer(sample_count=5, page_size=2, file_size=1000)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+
+    def test_paginated_list(self):
+        self.assertEqual(5, len(list(Sample.items())))
+
+    def test_download(self):
+        sample = Sample.get(next(iter(self.server.samples)))
+        with sample.temporary_file() as f:
+            f.seek(0)
+            self.assertEqual(self.server.files[sample.id], f.read())
+
+    def test_upload(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(b'new content')
+            f.seek(0)
+            sample = FileSample.create('new.bin', f)
+
+        self.assertEqual(11, sample.file_size)
+        self.assertEqual(6, len(self.server.samples))
+
+
+class BenchmarkRunTestCase(unittest.TestCase):
+    def test_results_are_written_as_json(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+
+        run.main(['--samples', '10', '--lookups', '2', '--file-size', '1000', '--repeat', '1', '--output', path])
+
+        with open(path) as fp:
+            results = json.load(fp)
+        self.assertEqual(sorted(run.BENCHMARKS), sorted(results['benchmarks']))
+        self.assertEqual(10, results['benchmarks']['pagination']['objects'])
+        self.assertEqual([], run.compare(results, {'benchmarks': {}}))
+
+
+class SerializationBenchmarkTestCase(unittest.TestCase):
+    def test_payloads_are_valid(self):
+        for name, (resource, payload) in serialization.generate_payloads(strings=10, events=10).items():
+            for i in range(1, 6):
+                resource._deserialize(payload(i))
+
+    def test_all_paths_are_measured(self):
+        names = ['ExecutableBinarySample', 'SampleRelation (mixed page)']
+        results = serialization.run(count=4, page_size=2, strings=10, events=10, names=names)
+
+        self.assertEqual(names, sorted(results))
+        for result in results.values():
+            self.assertEqual({'deserialize', 'deserialize_page', 'create_instance', 'to_json', 'dump'},
+                             set(result['paths']))
+
+
+class SsdeepIndexBenchmarkTestCase(unittest.TestCase):
+    def test_index_finds_all_matches(self):
+        result = ssdeep_index.run(count=300, verify_count=200)
+        self.assertEqual(300, result['hashes'])
+        self.assertGreater(result['verified_matches'], 0)
+        self.assertEqual(result['verified_matches'], result['verified_matches_found'])
+
+
+class ImportTimeTestCase(unittest.TestCase):
+    def test_parsing_importtime_output(self):
+        output = '\n'.join([
+            'import time: self [us] | cumulative | imported package',
+            'import time:       100 |        100 |   encodings',
+            'import time:      1000 |       2000 | site',
+            'import time:       200 |        200 |   mass_api_client._lazy',
+            'import time:       300 |        500 | mass_api_client',
+            'import time:        50 |         50 | json',
+        ])
+        self.assertEqual((550, ['mass_api_client._lazy', 'mass_api_client', 'json']),
+                         import_time.parse_importtime(output))
+
+    def test_heavy_dependencies_are_not_imported(self):
+        # The time budgets are checked by `python -m benchmarks.import_time`, as timings are unreliable on CI.
+        self.assertEqual([], import_time.check(import_time.run(repeat=1), timing=False))
@@ -0,0 +1,70 @@
+import datetime
+import json
+import unittest
+
+from httmock import urlmatch, HTTMock
+
+from mass_api_client import ConnectionManager
+from mass_api_client import codec
+from tests.httmock_test_case import HTTMockTestCase
+
+
+class CodecTestCase(unittest.TestCase):
+    def codecs(self):
+        result = [codec.StdlibJSONCodec()]
+        if codec.orjson is not None:
+            result.append(codec.OrjsonCodec())
+        return result
+
+    def test_round_trip(self):
+        data = {'string': 'äöü', 'list': [1, 2.5, None, True], 'nested': {'key': 'value'}}
+        for json_codec in self.codecs():
+            encoded = json_codec.dumps(data)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(data, json_codec.loads(encoded))
+            self.assertEqual(data, json_codec.loads(encoded.decode('utf-8')))
+            self.assertEqual(data, json_codec.loads(bytearray(encoded)))
+            self.assertEqual(data, json_codec.loads(memoryview(encoded)))
+
+    def test_datetime_serialization(self):
+        data = {'date': datetime.datetime(2016, 11, 8, 17, 3, 46, tzinfo=datetime.timezone.utc),
+                'day': datetime.date(2016, 11, 8)}
+        for json_codec in self.codecs():
+            self.assertEqual({'date': '2016-11-08T17:03:46+00:00', 'day': '2016-11-08'},
+                             json.loads(json_codec.dumps(data).decode('utf-8')))
+
+    def test_unserializable_object(self):
+        for json_codec in self.codecs():
+            with self.assertRaises(TypeError):
+                json_codec.dumps({'object': object()})
+
+    def test_get_codec(self):
+        self.assertIsInstance(codec.get_codec('json'), codec.StdlibJSONCodec)
+        json_codec = codec.StdlibJSONCodec()
+        self.assertIs(json_codec, codec.get_codec(json_codec))
+        self.assertEqual('orjson' if codec.orjson is not None else 'json', codec.get_codec().name)
+        with self.assertRaises(ValueError):
+            codec.get_codec('yaml')
+
+    def test_codec_must_implement_dumps_and_loads(self):
+        class IncompleteCodec(codec.JSONCodec):
+            def dumps(self, obj):
+                return b''
+
+        with self.assertRaises(TypeError):
+            IncompleteCodec()
+
+
+class ConnectionCodecTestCase(HTTMockTestCase):
+    def test_posting_json_with_each_codec(self):
+        data = {'date': datetime.datetime(2016, 11, 8, 17, 3, 46), 'value': 1}
+
+        @urlmatch(netloc=r'localhost', path=r'/api/json')
+        def mass_mock(url, request):
+            return request.body
+
+        for name in ['json', 'orjson'] if codec.orjson is not None else ['json']:
+            ConnectionManager().register_connection(name, self.api_key, self.base_url, codec=name)
+            with HTTMock(mass_mock):
+                response = ConnectionManager().get_connection(name).post_json('json', data)
+            self.assertEqual({'date': '2016-11-08T17:03:46', 'value': 1}, response)
@@ -0,0 +1,100 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from httmock import urlmatch, HTTMock
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager, compression
+from mass_api_client.resources import Sample, FileSample
+from tests.httmock_test_case import HTTMockTestCase
+
+
+class CompressionTestCase(unittest.TestCase):
+    def test_round_trip(self):
+        data = b'compressible ' * 1000
+        for encoding in compression.available_encodings():
+            if encoding == 'deflate':
+                continue
+            with compression.compress_file(io.BytesIO(data), encoding, chunk_size=1000, spool_size=10) as f:
+                compressed_file = f.read()
+            for compressed in [compression.compress(data, encoding), compressed_file]:
+                decompressor = compression.decompressor(encoding)
+                self.assertEqual(data, decompressor.decompress(compressed) + decompressor.flush())
+
+    def test_compression_is_only_used_when_worth_it(self):
+        self.assertFalse(compression.is_worth_compressing(b'a' * 100, 'gzip', threshold=1024))
+        self.assertFalse(compression.is_worth_compressing(os.urandom(4096), 'gzip', threshold=1024))
+        self.assertTrue(compression.is_worth_compressing(b'a' * 4096, 'gzip', threshold=1024))
+
+    def test_unavailable_encoding(self):
+        with self.assertRaises(ValueError):
+            compression.resolve_encoding('brotli')
+        self.assertEqual(compression.available_encodings()[0], compression.resolve_encoding('auto'))
+
+
+class RequestCompressionTestCase(HTTMockTestCase):
+    def setUp(self):
+        super(RequestCompressionTestCase, self).setUp()
+        ConnectionManager().register_connection('compressed', self.api_key, self.base_url, encoding='gzip',
+                                                compression_threshold=100)
+        self.connection = ConnectionManager().get_connection('compressed')
+
+    def test_posting_compressed_json(self):
+        large = {'strings': ['string {}'.format(i) for i in range(100)]}
+
+        @urlmatch(netloc=r'localhost', path=r'/api/json')
+        def mass_mock(url, request):
+            if request.headers.get('Content-Encoding') == 'gzip':
+                return gzip.decompress(request.body)
+            return request.body
+
+        with HTTMock(mass_mock):
+            self.assertEqual(large, self.connection.post_json('json', large))
+            self.assertEqual(self.example_data, self.connection.post_json('json', self.example_data))
+
+    def test_compressing_multipart_parts(self):
+        large = {'strings': ['string {}'.format(i) for i in range(100)]}
+        random_data = os.urandom(4096)
+
+        @urlmatch(netloc=r'localhost', path=r'/api/json')
+        def mass_mock(url, request):
+            files = request.original.files
+            self.assertEqual(3, len(files['metadata']))
+            self.assertEqual({'Content-Encoding': 'gzip'}, files['report'][3])
+            self.assertEqual(large, json.loads(gzip.decompress(files['report'][1]).decode()))
+            self.assertEqual({'Content-Encoding': 'gzip'}, files['text'][3])
+            files['text'][1].seek(0)
+            self.assertEqual(b'text ' * 1000, gzip.decompress(files['text'][1].read()))
+            self.assertEqual(3, len(files['random']))
+            return json.dumps(self.example_data)
+
+        with HTTMock(mass_mock):
+            self.connection.post_multipart('json', self.example_data, json_files={'report': ('report', large)},
+                                           binary_files={'text': ('text', io.BytesIO(b'text ' * 1000)),
+                                                         'random': ('random', io.BytesIO(random_data))})
+
+
+class DownloadCompressionTestCase(unittest.TestCase):
+    def test_downloading_compressed_file(self):
+        for encoding in compression.available_encodings():
+            if encoding == 'deflate':
+                continue
+            with MassStandInServer(sample_count=1, file_size=100000, download_encoding=encoding) as server:
+                ConnectionManager().register_connection('default', 'key', server.base_url)
+                sample = Sample.get(next(iter(server.samples)))
+                with tempfile.TemporaryFile() as f:
+                    sample.download_to_file(f)
+                    f.seek(0)
+                    self.assertEqual(server.files[sample.id], f.read())
+
+    def test_uploading_compressed_file(self):
+        with MassStandInServer(sample_count=0) as server:
+            ConnectionManager().register_connection('default', 'key', server.base_url, encoding='gzip')
+            sample = FileSample.create('text.txt', io.BytesIO(b'text ' * 10000))
+
+        self.assertEqual(50000, sample.file_size)
+        self.assertLess(server.received_bytes, 10000)
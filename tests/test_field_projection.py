@@ -0,0 +1,75 @@
+import json
+import unittest
+
+from httmock import all_requests, HTTMock
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager
+from mass_api_client.resources import Sample, FileSample, AnalysisSystem, FieldNotLoadedError
+from tests.httmock_test_case import HTTMockTestCase
+
+
+class FieldProjectionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MassStandInServer(sample_count=12, page_size=5)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+        self.ids = list(self.server.samples)
+
+    def test_items_load_only_requested_fields(self):
+        samples = list(Sample.items(fields=['md5sum', 'sha256sum']))
+
+        self.assertEqual(self.ids, [sample.id for sample in samples])
+        sample = samples[0]
+        self.assertIsInstance(sample, FileSample)
+        self.assertEqual(self.server.samples[sample.id]['md5sum'], sample.md5sum)
+        self.assertTrue(sample.url.endswith('/sample/{}/'.format(sample.id)))
+        with self.assertRaises(FieldNotLoadedError):
+            sample.file_names
+        self.assertFalse(hasattr(sample, 'tlp_level'))
+        with self.assertRaises(AttributeError) as context:
+            sample.no_field
+        self.assertNotIsInstance(context.exception, FieldNotLoadedError)
+
+    def test_get_and_query(self):
+        sample = Sample.get(self.ids[3], fields=['file_size'])
+        self.assertEqual(self.server.samples[self.ids[3]]['file_size'], sample.file_size)
+        with self.assertRaises(FieldNotLoadedError):
+            sample.md5sum
+
+        samples = list(FileSample.query().only('sha1sum')[:3])
+        self.assertEqual(self.ids[:3], [s.id for s in samples])
+        with self.assertRaises(FieldNotLoadedError):
+            samples[0].tags
+
+    def test_unknown_fields_are_rejected(self):
+        with self.assertRaises(ValueError):
+            list(Sample.items(fields=['no_field']))
+        with self.assertRaises(ValueError):
+            FileSample.query().only('domain', 'no_field')
+
+    def test_projection_shrinks_responses(self):
+        metrics = ConnectionManager().get_connection('default').enable_metrics()
+        list(Sample.items())
+        full = metrics.snapshot()[0]['bytes_received']
+        metrics.reset()
+        list(Sample.items(fields=['md5sum']))
+        self.assertLess(metrics.snapshot()[0]['bytes_received'] * 2, full)
+
+
+class FieldParameterTestCase(HTTMockTestCase):
+    def test_fields_are_sent_as_parameter(self):
+        with open('tests/data/analysis_system.json') as data_file:
+            data = json.load(data_file)
+
+        @all_requests
+        def mass_mock(url, request):
+            self.assertEqual({'fields': 'id,identifier_name,url'}, request.original.params)
+            return json.dumps(data)
+
+        with HTTMock(mass_mock):
+            analysis_system = AnalysisSystem.get('test', fields=['identifier_name'])
+
+        # Fields sent by a server without projection support are available anyway.
+        self.assertEqual(data['verbose_name'], analysis_system.verbose_name)
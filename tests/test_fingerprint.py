@@ -0,0 +1,114 @@
+import hashlib
+import io
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+
+from mass_api_client import fingerprint as fingerprint_module
+from mass_api_client.fingerprint import ByteHistogram, fingerprint, fingerprint_files, shannon_entropy
+from mass_api_client.schemas import FileSampleSchema
+
+
+def _entropy(data):
+    return -sum(count / len(data) * math.log2(count / len(data)) for count in Counter(data).values())
+
+
+class _FakeSsdeepHash:
+    def __init__(self):
+        self.data = b''
+
+    def update(self, data):
+        if not isinstance(data, bytes):
+            raise TypeError('bytes expected')
+        self.data += data
+
+    def digest(self):
+        return '3:{}:{}'.format(len(self.data), hashlib.md5(self.data).hexdigest())
+
+
+class _FakeSsdeep:
+    Hash = _FakeSsdeepHash
+
+
+class FingerprintTestCase(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(5000) + b'\x00' * 3001
+
+    def use_modules(self, numpy=None, ssdeep=None):
+        self.addCleanup(setattr, fingerprint_module, '_numpy', fingerprint_module._numpy)
+        self.addCleanup(setattr, fingerprint_module, '_ssdeep', fingerprint_module._ssdeep)
+        if numpy is not None:
+            fingerprint_module._numpy = numpy
+        if ssdeep is not None:
+            fingerprint_module._ssdeep = ssdeep
+
+    def test_single_pass_matches_separate_computations(self):
+        result = fingerprint(io.BytesIO(self.data), ssdeep=False, chunk_size=1024)
+
+        for algorithm in ('md5', 'sha1', 'sha256', 'sha512'):
+            self.assertEqual(hashlib.new(algorithm, self.data).hexdigest(), result['{}sum'.format(algorithm)])
+        self.assertEqual(len(self.data), result['file_size'])
+        self.assertAlmostEqual(_entropy(self.data), result['shannon_entropy'], places=9)
+        self.assertNotIn('ssdeep_hash', result)
+
+    def test_result_is_valid_for_file_samples(self):
+        self.use_modules(ssdeep=_FakeSsdeep)
+        result = fingerprint(io.BytesIO(self.data))
+
+        self.assertLessEqual(set(result), set(FileSampleSchema().fields))
+        self.assertEqual({}, FileSampleSchema().validate(result, partial=True))
+
+    def test_pure_python_histogram(self):
+        with_numpy = ByteHistogram()
+        with_numpy.update(memoryview(self.data)[:4001])
+        with_numpy.update(self.data[4001:])
+
+        self.use_modules(numpy=False)
+        without_numpy = ByteHistogram()
+        without_numpy.update(memoryview(self.data)[:4001])
+        without_numpy.update(self.data[4001:])
+
+        counts = Counter(self.data)
+        self.assertEqual([counts[value] for value in range(256)], with_numpy.counts())
+        self.assertEqual(with_numpy.counts(), without_numpy.counts())
+        self.assertAlmostEqual(with_numpy.entropy(), without_numpy.entropy(), places=9)
+
+    def test_entropy_bounds(self):
+        self.assertEqual(0.0, shannon_entropy(b''))
+        self.assertEqual(0.0, shannon_entropy(b'aaaa'))
+        self.assertAlmostEqual(8.0, shannon_entropy(bytes(range(256)) * 4))
+
+    def test_ssdeep_is_computed_in_the_same_pass(self):
+        self.use_modules(ssdeep=_FakeSsdeep)
+        result = fingerprint(io.BytesIO(self.data), chunk_size=1000)
+        self.assertEqual('3:{}:{}'.format(len(self.data), hashlib.md5(self.data).hexdigest()), result['ssdeep_hash'])
+        self.assertNotIn('ssdeep_hash', fingerprint(io.BytesIO(self.data), ssdeep=False))
+
+    def test_ssdeep_requires_the_package(self):
+        self.use_modules(ssdeep=False)
+        self.assertNotIn('ssdeep_hash', fingerprint(io.BytesIO(self.data)))
+        with self.assertRaises(ValueError):
+            fingerprint(io.BytesIO(self.data), ssdeep=True)
+
+
+class FingerprintFilesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.paths = []
+        for i in range(6):
+            path = os.path.join(self.directory, 'file{}.bin'.format(i))
+            with open(path, 'wb') as f:
+                f.write(os.urandom(100 * i))
+            self.paths.append(path)
+
+    def test_process_pool(self):
+        in_process = list(fingerprint_files(self.paths, processes=1, ssdeep=False))
+        pooled = list(fingerprint_files(iter(self.paths), processes=2, ssdeep=False))
+
+        self.assertEqual(in_process, pooled)
+        self.assertEqual(self.paths, [path for path, _ in pooled])
+        self.assertEqual([100 * i for i in range(6)], [result['file_size'] for _, result in pooled])
@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+
+from httmock import urlmatch, HTTMock
+
+from mass_api_client import ConnectionManager, HedgingPolicy
+from tests.httmock_test_case import HTTMockTestCase
+
+
+class HedgingTestCase(HTTMockTestCase):
+    def register_hedged_connection(self, policy):
+        cm = ConnectionManager()
+        cm.register_connection('hedged', self.api_key, self.base_url, hedging=policy)
+        self.addCleanup(policy.shutdown)
+        return cm.get_connection('hedged')
+
+    def slow_first_request_mock(self, netloc=r'localhost', release=None):
+        calls = []
+        lock = threading.Lock()
+
+        @urlmatch(netloc=netloc, path=r'/api/json')
+        def mass_mock(url, request):
+            with lock:
+                calls.append(url.netloc)
+                first = len(calls) == 1
+            if first:
+                release.wait(2)
+                return json.dumps({'answer': 'primary'})
+            return json.dumps({'answer': 'hedge'})
+
+        return mass_mock, calls
+
+    def test_hedged_request_answers_first(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        policy = HedgingPolicy(delay=0.01)
+        con = self.register_hedged_connection(policy)
+        mass_mock, calls = self.slow_first_request_mock(release=release)
+
+        with HTTMock(mass_mock):
+            response = con.get_json('json')
+            release.set()
+
+        self.assertEqual({'answer': 'hedge'}, response)
+        self.assertEqual(1, policy.hedges_sent)
+        self.assertEqual(1, policy.hedges_won)
+        self.assertEqual(2, len(calls))
+
+    def test_no_hedge_for_fast_requests(self):
+        policy = HedgingPolicy(delay=1)
+        con = self.register_hedged_connection(policy)
+
+        @urlmatch(netloc=r'localhost', path=r'/api/json')
+        def mass_mock(url, request):
+            self.assertAuthorized(request)
+            return json.dumps(self.example_data)
+
+        with HTTMock(mass_mock):
+            response = con.get_json('json')
+
+        self.assertEqual(self.example_data, response)
+        self.assertEqual(0, policy.hedges_sent)
+
+    def test_budget_caps_hedged_requests(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        policy = HedgingPolicy(delay=0.01, budget=0, burst=0)
+        con = self.register_hedged_connection(policy)
+        mass_mock, calls = self.slow_first_request_mock(release=release)
+
+        with HTTMock(mass_mock):
+            threading.Timer(0.05, release.set).start()
+            response = con.get_json('json')
+
+        self.assertEqual({'answer': 'primary'}, response)
+        self.assertEqual(0, policy.hedges_sent)
+        self.assertEqual(1, len(calls))
+
+    def test_hedging_to_alternate_endpoint(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        policy = HedgingPolicy(delay=0.01, alternate_base_urls=['http://notlocalhost/api'])
+        con = self.register_hedged_connection(policy)
+        mass_mock, calls = self.slow_first_request_mock(netloc=r'.*localhost', release=release)
+
+        with HTTMock(mass_mock):
+            response = con.get_json('json')
+            release.set()
+
+        self.assertEqual({'answer': 'hedge'}, response)
+        self.assertEqual(['localhost', 'notlocalhost'], calls)
+
+    def test_errors_fall_back_to_other_attempt(self):
+        policy = HedgingPolicy(delay=0.01)
+        con = self.register_hedged_connection(policy)
+        calls = []
+
+        @urlmatch(netloc=r'localhost', path=r'/api/json')
+        def mass_mock(url, request):
+            calls.append(url)
+            if len(calls) == 1:
+                time.sleep(0.05)
+                return {'status_code': 500, 'content': ''}
+            return json.dumps(self.example_data)
+
+        with HTTMock(mass_mock):
+            response = con.get_json('json')
+
+        self.assertEqual(self.example_data, response)
+
+    def test_percentile_delay(self):
+        policy = HedgingPolicy(delay=5, percentile=50, min_samples=3)
+        self.addCleanup(policy.shutdown)
+        self.assertEqual(5, policy.current_delay())
+
+        policy._latencies.extend([0.1, 0.2, 0.3, 0.4])
+
+        self.assertEqual(0.3, policy.current_delay())
+
+    def test_latency_of_losing_primary_is_recorded(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        policy = HedgingPolicy(delay=0.05, percentile=50, min_samples=1)
+        con = self.register_hedged_connection(policy)
+        mass_mock, calls = self.slow_first_request_mock(release=release)
+
+        with HTTMock(mass_mock):
+            self.assertEqual({'answer': 'hedge'}, con.get_json('json'))
+            release.set()
+
+        self.assertEqual(1, policy.hedges_won)
+        self.assertEqual(1, len(policy._latencies))
+        self.assertGreaterEqual(policy.current_delay(), 0.05)
@@ -0,0 +1,129 @@
+import hashlib
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager
+from mass_api_client.hashing import hash_file
+from mass_api_client.ingest import Ingestor, Checkpoint, main
+
+
+class HashingTestCase(unittest.TestCase):
+    def test_single_pass_hashes(self):
+        data = os.urandom(3000)
+        hashes = hash_file(io.BytesIO(data), chunk_size=1024)
+        self.assertEqual(hashlib.md5(data).hexdigest(), hashes['md5sum'])
+        self.assertEqual(hashlib.sha1(data).hexdigest(), hashes['sha1sum'])
+        self.assertEqual(hashlib.sha256(data).hexdigest(), hashes['sha256sum'])
+        self.assertEqual(hashlib.sha512(data).hexdigest(), hashes['sha512sum'])
+        self.assertEqual(3000, hashes['file_size'])
+
+
+class IngestTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MassStandInServer(sample_count=0)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        os.mkdir(os.path.join(self.directory, 'sub'))
+        for i in range(6):
+            self.write('sub/file{}.bin'.format(i), 'content {}'.format(i).encode())
+        self.write('copy.bin', b'content 0')
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_only_new_files_are_uploaded(self):
+        self.server.add_file_sample(b'content 1')
+
+        stats = Ingestor(hash_workers=2, batch_size=3).run([self.directory])
+
+        self.assertEqual(7, stats.files)
+        self.assertEqual(5, stats.uploaded)
+        self.assertEqual(1, stats.existing)
+        self.assertEqual(1, stats.duplicates)
+        self.assertEqual(0, stats.failed)
+        self.assertEqual(6, len(self.server.samples))
+        self.assertIn('files/s', stats.summary())
+
+    def test_failed_existence_checks_do_not_abort_the_ingestion(self):
+        failing = hashlib.sha256(b'content 2').hexdigest()
+
+        class FailingIngestor(Ingestor):
+            @staticmethod
+            def _exists(sha256sum):
+                if sha256sum == failing:
+                    raise ConnectionError('connection reset')
+                return Ingestor._exists(sha256sum)
+
+        with self.assertLogs('mass_api_client.ingest', 'WARNING') as logs:
+            stats = FailingIngestor(hash_workers=1).run([self.directory])
+
+        self.assertEqual(1, stats.failed)
+        self.assertEqual(5, stats.uploaded)
+        self.assertIn('connection reset', logs.output[0])
+        self.assertNotIn(b'content 2', self.server.files.values())
+
+    def test_archives(self):
+        with zipfile.ZipFile(self.write('archive.zip', b''), 'w') as zf:
+            zf.writestr('a.txt', b'zip member')
+            zf.writestr('dir/', b'')
+        with tarfile.open(os.path.join(self.directory, 'archive.tar.gz'), 'w:gz') as tf:
+            info = tarfile.TarInfo('b.txt')
+            info.size = len(b'tar member')
+            tf.addfile(info, io.BytesIO(b'tar member'))
+
+        stats = Ingestor(hash_workers=1, archives=True).run([self.directory])
+
+        self.assertEqual(9, stats.files)
+        self.assertEqual(8, stats.uploaded)
+        contents = set(self.server.files.values())
+        self.assertIn(b'zip member', contents)
+        self.assertIn(b'tar member', contents)
+
+    def test_archives_are_read_once_for_uploading(self):
+        path = os.path.join(self.directory, 'archive.tar.gz')
+        with tarfile.open(path, 'w:gz') as tf:
+            for i in range(4):
+                content = 'tar member {}'.format(i).encode()
+                info = tarfile.TarInfo('member{}.txt'.format(i))
+                info.size = len(content)
+                tf.addfile(info, io.BytesIO(content))
+
+        with mock.patch('tarfile.open', wraps=tarfile.open) as tarfile_open:
+            stats = Ingestor(hash_workers=1, archives=True).run([path])
+
+        self.assertEqual(4, stats.uploaded)
+        # Once to detect the archive, once to hash and once to upload its members.
+        self.assertEqual(3, tarfile_open.call_count)
+        self.assertEqual({'tar member {}'.format(i).encode() for i in range(4)}, set(self.server.files.values()))
+
+    def test_resuming_from_checkpoint(self):
+        checkpoint = os.path.join(self.directory, 'ingest.ckpt')
+        first = Ingestor(hash_workers=1, checkpoint=checkpoint).run([os.path.join(self.directory, 'sub')])
+        self.assertEqual(6, first.uploaded)
+        self.assertEqual(6, len(Checkpoint(checkpoint)))
+
+        requests_before = self.server.request_count
+        self.write('sub/new.bin', b'new content')
+        second = Ingestor(hash_workers=1, checkpoint=checkpoint).run([os.path.join(self.directory, 'sub')])
+        self.assertEqual(6, second.skipped)
+        self.assertEqual(1, second.uploaded)
+        self.assertEqual(2, self.server.request_count - requests_before)
+
+    def test_command_line(self):
+        self.assertEqual(0, main(['--base-url', self.server.base_url, '--api-key', 'key', '--hash-workers', '1',
+                                  '--tag', 'corpus:test', self.directory]))
+        self.assertEqual(['corpus:test'], next(iter(self.server.samples.values()))['tags'])
@@ -0,0 +1,59 @@
+import json
+import unittest
+
+from mass_api_client.json_stream import iter_items
+
+
+def chunked(document, chunk_size):
+    data = json.dumps(document).encode('utf-8')
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+class JSONStreamTestCase(unittest.TestCase):
+    document = {
+        'metadata': {'name': 'tr\u00e4ce', 'numbers': [1, 2.5, -3e5]},
+        'skipped': [{'nested': ['"]}', '\\', None, True, False]}, 12345],
+        'calls': [{'api': 'CreateFileW', 'args': ['C:\\file']}, {'api': 'ExitProcess', 'args': [0]}],
+        'count': 2,
+    }
+
+    def assertItems(self, expected, document, path):
+        for chunk_size in (1, 2, 3, 7, 1024):
+            self.assertEqual(expected, list(iter_items(chunked(document, chunk_size), path)))
+
+    def test_top_level_array(self):
+        array = [1, 22, 3.5, 'text', {'a': [1, 2]}, [], {}, None, True, False]
+        self.assertItems(array, array, 'item')
+
+    def test_whole_document(self):
+        self.assertItems([self.document], self.document, '')
+
+    def test_selected_paths(self):
+        self.assertItems(self.document['calls'], self.document, 'calls.item')
+        self.assertItems([1, 2.5, -3e5], self.document, 'metadata.numbers.item')
+        self.assertItems(['CreateFileW', 'ExitProcess'], self.document, 'calls.item.api')
+        self.assertItems([2], self.document, 'count')
+
+    def test_missing_paths(self):
+        self.assertItems([], self.document, 'missing.item')
+        self.assertItems([], self.document, 'count.item')
+        self.assertItems([], [], 'item')
+
+    def test_early_stop_does_not_read_remaining_chunks(self):
+        read = []
+
+        def chunks():
+            for chunk in chunked(list(range(100000)), 1024):
+                read.append(chunk)
+                yield chunk
+
+        items = iter_items(chunks())
+        self.assertEqual([0, 1, 2], [next(items) for _ in range(3)])
+        self.assertEqual(1, len(read))
+
+    def test_invalid_document(self):
+        with self.assertRaises(ValueError):
+            list(iter_items([b'[1, 2 3]']))
+        with self.assertRaises(ValueError):
+            list(iter_items([b'[1, {"a": ']))
@@ -0,0 +1,125 @@
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager
+from mass_api_client.known_hashes import KnownHashStore
+from mass_api_client.resources import FileSample
+
+
+def _add_hashes(path, start):
+    store = KnownHashStore(path)
+    for i in range(start, start + 50):
+        store.add('server', '{:064x}'.format(i), 'url{}'.format(i))
+
+
+class KnownHashStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'cache', 'known.sqlite3')
+
+    def test_lookup_is_per_server(self):
+        store = KnownHashStore(self.path)
+        store.add('http://a/api/', 'hash', 'http://a/api/sample/1/')
+        self.assertEqual('http://a/api/sample/1/', store.get('http://a/api/', 'hash'))
+        self.assertIsNone(store.get('http://b/api/', 'hash'))
+        store.remove('http://a/api/', 'hash')
+        self.assertIsNone(store.get('http://a/api/', 'hash'))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        store = KnownHashStore(self.path, max_entries=3)
+        for key in ['a', 'b', 'c']:
+            store.add('server', key, key)
+        store.get('server', 'a')
+        store.add('server', 'd', 'd')
+
+        self.assertEqual(3, len(store))
+        self.assertIsNone(store.get('server', 'b'))
+        self.assertEqual('a', store.get('server', 'a'))
+
+    def test_size_is_checked_in_batches(self):
+        store = KnownHashStore(self.path, max_entries=200)
+        for i in range(201):
+            store.add('server', str(i), str(i))
+        self.assertEqual(201, len(store))
+        store.add('server', 'last', 'last')
+        self.assertEqual(200, len(store))
+
+    def test_size_is_kept_by_short_lived_stores(self):
+        for i in range(300):
+            store = KnownHashStore(self.path, max_entries=200)
+            store.add('server', str(i), str(i))
+            store.close()
+        self.assertLessEqual(len(KnownHashStore(self.path, max_entries=200)), 202)
+
+    def test_lookups_do_not_write(self):
+        store = KnownHashStore(self.path)
+        store.add('server', 'a', 'a')
+        con = store._connection()
+        changes = con.total_changes
+        for _ in range(10):
+            self.assertEqual('a', store.get('server', 'a'))
+        self.assertEqual(changes, con.total_changes)
+
+        store.flush()
+        self.assertEqual(changes + 1, con.total_changes)
+
+    def test_concurrent_processes(self):
+        KnownHashStore(self.path)
+        processes = [multiprocessing.Process(target=_add_hashes, args=(self.path, i * 50)) for i in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        self.assertEqual([0] * 4, [process.exitcode for process in processes])
+        self.assertEqual(200, len(KnownHashStore(self.path)))
+
+
+class GetOrCreateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MassStandInServer(sample_count=0)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = KnownHashStore(os.path.join(self.directory, 'known.sqlite3'))
+
+    def test_file_is_uploaded_once(self):
+        path = os.path.join(self.directory, 'sample.bin')
+        with open(path, 'wb') as f:
+            f.write(b'sample content')
+
+        sample, created = FileSample.get_or_create(path, store=self.store)
+        self.assertTrue(created)
+        self.assertEqual('sample.bin', sample.file_names[0])
+
+        requests_before = self.server.request_count
+        known, created = FileSample.get_or_create(io.BytesIO(b'sample content'), store=self.store)
+        self.assertFalse(created)
+        self.assertEqual(sample.id, known.id)
+        # Known locally, so only the sample is fetched.
+        self.assertEqual(1, self.server.request_count - requests_before)
+        self.assertEqual(1, len(self.server.samples))
+
+    def test_existing_sample_on_server(self):
+        existing = self.server.add_file_sample(b'on the server')
+        sample, created = FileSample.get_or_create(io.BytesIO(b'on the server'), store=False)
+        self.assertFalse(created)
+        self.assertEqual(existing['id'], sample.id)
+
+    def test_deleted_sample_is_uploaded_again(self):
+        sample, _ = FileSample.get_or_create(io.BytesIO(b'deleted'), filename='deleted.bin', store=self.store)
+        del self.server.samples[sample.id]
+
+        new_sample, created = FileSample.get_or_create(io.BytesIO(b'deleted'), filename='deleted.bin',
+                                                       store=self.store)
+        self.assertTrue(created)
+        self.assertNotEqual(sample.id, new_sample.id)
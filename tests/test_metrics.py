@@ -0,0 +1,118 @@
+import json
+
+import requests
+from httmock import urlmatch, HTTMock
+
+from mass_api_client.metrics import Metrics, Exporter, PrometheusExporter, CallbackExporter
+from mass_api_client.resources import AnalysisSystem
+from tests.httmock_test_case import HTTMockTestCase
+
+
+class MetricsTestCase(HTTMockTestCase):
+    def setUp(self):
+        super(MetricsTestCase, self).setUp()
+        self.connection._pre_request_hooks = []
+        self.connection._post_request_hooks = []
+        self.connection.metrics = None
+
+    def test_hooks_are_called_around_requests(self):
+        calls = []
+
+        @urlmatch(netloc=r'localhost', path=r'/api/json')
+        def mass_mock(url, request):
+            return json.dumps(self.example_data)
+
+        self.connection.add_pre_request_hook(lambda info: calls.append(('pre', info.method, info.duration)))
+        self.connection.add_post_request_hook(lambda info: calls.append(('post', info.status_code, info.bytes_received)))
+
+        with HTTMock(mass_mock):
+            self.connection.get_json('json')
+
+        self.assertEqual(('pre', 'GET', None), calls[0])
+        self.assertEqual(('post', 200, len(json.dumps(self.example_data))), calls[1])
+
+    def test_streams_are_measured_until_the_iteration_ends(self):
+        body = json.dumps(list(range(100)))
+        calls = []
+
+        @urlmatch(netloc=r'localhost', path=r'/api/json')
+        def mass_mock(url, request):
+            return body
+
+        self.connection.add_post_request_hook(lambda info: calls.append((info.status_code, info.bytes_received)))
+
+        with HTTMock(mass_mock):
+            values = self.connection.iter_json('json', chunk_size=16)
+            self.assertEqual(0, next(values))
+            self.assertEqual([], calls)
+            self.assertEqual(list(range(1, 100)), list(values))
+
+        self.assertEqual([(200, len(body))], calls)
+
+    def test_metrics_are_keyed_by_resource_and_operation(self):
+        with open('tests/data/analysis_system.json') as data_file:
+            data = data_file.read()
+
+        @urlmatch(netloc=r'localhost')
+        def mass_mock(url, request):
+            if url.path.endswith('missing/'):
+                return {'status_code': 404, 'content': ''}
+            return data
+
+        metrics = self.connection.enable_metrics()
+
+        with HTTMock(mass_mock):
+            AnalysisSystem.get('strings')
+            AnalysisSystem.get('strings')
+            with self.assertRaises(requests.HTTPError):
+                AnalysisSystem.get('missing')
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(1, len(snapshot))
+        self.assertEqual('AnalysisSystem', snapshot[0]['resource'])
+        self.assertEqual('get', snapshot[0]['operation'])
+        self.assertEqual(3, snapshot[0]['requests'])
+        self.assertEqual(1, snapshot[0]['errors'])
+        self.assertEqual(2 * len(data), snapshot[0]['bytes_received'])
+        self.assertEqual(3, snapshot[0]['latency_buckets'][-1][1])
+
+    def test_prometheus_exporter(self):
+        @urlmatch(netloc=r'localhost', path=r'/api/json')
+        def mass_mock(url, request):
+            return json.dumps(self.example_data)
+
+        metrics = self.connection.enable_metrics(Metrics(buckets=[1.0]))
+        with HTTMock(mass_mock):
+            self.connection.post_json('json', self.example_data)
+
+        text = PrometheusExporter(metrics).export()
+        self.assertIn('mass_api_client_requests_total{resource="unknown",operation="create"} 1', text)
+        self.assertIn('mass_api_client_bytes_sent_total{resource="unknown",operation="create"} ' +
+                      str(len(self.connection._codec.dumps(self.example_data))), text)
+        self.assertIn('mass_api_client_request_duration_seconds_bucket{resource="unknown",operation="create",le="+Inf"} 1',
+                      text)
+
+    def test_gauges(self):
+        metrics = Metrics()
+        metrics.set_gauge('supervisor_workers', 2)
+        metrics.set_gauge('supervisor_workers', 3)
+        self.assertEqual({'supervisor_workers': 3}, metrics.gauges())
+
+        text = PrometheusExporter(metrics).export()
+        self.assertIn('# TYPE mass_api_client_supervisor_workers gauge\nmass_api_client_supervisor_workers 3\n', text)
+
+        metrics.reset()
+        self.assertEqual({}, metrics.gauges())
+
+    def test_callback_exporter(self):
+        exported = []
+        metrics = Metrics()
+        CallbackExporter(metrics, exported.append).export()
+        self.assertEqual([[]], exported)
+
+    def test_exporter_must_implement_export(self):
+        class IncompleteExporter(Exporter):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteExporter(Metrics())
@@ -0,0 +1,74 @@
+import json
+import unittest
+
+from httmock import urlmatch, HTTMock
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager
+from mass_api_client.pagination import page_urls
+from mass_api_client.resources import Sample, Report
+from tests.httmock_test_case import HTTMockTestCase
+
+
+class PageURLTestCase(unittest.TestCase):
+    def test_page_number_pagination(self):
+        response = {'count': 7, 'next': 'http://localhost/api/sample/?page=2&tags=a', 'results': [1, 2, 3]}
+        self.assertEqual(['http://localhost/api/sample/?page=2&tags=a', 'http://localhost/api/sample/?page=3&tags=a'],
+                         page_urls(response))
+
+    def test_offset_pagination(self):
+        response = {'count': 7, 'next': 'http://localhost/api/sample/?limit=3&offset=3', 'results': [1, 2, 3]}
+        self.assertEqual(['http://localhost/api/sample/?limit=3&offset=3', 'http://localhost/api/sample/?limit=3&offset=6'],
+                         page_urls(response))
+
+    def test_unknown_pagination(self):
+        self.assertEqual([], page_urls({'count': 3, 'next': None, 'results': [1, 2, 3]}))
+        self.assertIsNone(page_urls({'next': 'http://localhost/api/sample/?page=2', 'results': [1, 2, 3]}))
+        self.assertIsNone(page_urls({'count': 7, 'next': 'http://localhost/api/sample/?cursor=abc', 'results': [1]}))
+
+
+class ParallelPaginationTestCase(unittest.TestCase):
+    def start_server(self, **kwargs):
+        server = MassStandInServer(**kwargs)
+        server.start()
+        self.addCleanup(server.stop)
+        ConnectionManager().register_connection('default', 'key', server.base_url)
+        return server
+
+    def test_items_are_ordered(self):
+        server = self.start_server(sample_count=23, page_size=5)
+        self.assertEqual(list(server.samples), [sample.id for sample in Sample.items()])
+        self.assertEqual(list(server.samples), [sample.id for sample in Sample.items(max_workers=1)])
+
+    def test_unordered_items(self):
+        server = self.start_server(sample_count=23, page_size=5)
+        self.assertEqual(sorted(server.samples), sorted(sample.id for sample in Sample.items(ordered=False)))
+
+    def test_all_returns_every_page(self):
+        server = self.start_server(sample_count=23, page_size=5)
+        self.assertEqual(23, len(Sample.all()))
+        self.assertEqual(5, server.request_count)
+
+    def test_sequential_fallback_without_count(self):
+        server = self.start_server(sample_count=12, page_size=5, include_count=False)
+        self.assertEqual(list(server.samples), [sample.id for sample in Sample.all()])
+
+    def test_reports_of_sample_are_complete(self):
+        server = self.start_server(sample_count=1, report_count=12, page_size=5)
+        sample = Sample.get(next(iter(server.samples)))
+        self.assertEqual(12, len(sample.get_reports()))
+
+
+class PaginationHTTMockTestCase(HTTMockTestCase):
+    def test_all_follows_next_links(self):
+        with open('tests/data/sample_list_with_paging_1.json') as f:
+            first = json.load(f)
+        with open('tests/data/sample_list_with_paging_2.json') as f:
+            second = json.load(f)
+
+        @urlmatch(netloc=r'localhost', path=r'/api/sample/')
+        def mass_mock(url, request):
+            return json.dumps(second if 'page=2' in url.query else first)
+
+        with HTTMock(mass_mock):
+            self.assertEqual(4, len(Sample.all()))
@@ -0,0 +1,102 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager, utils
+from mass_api_client.prefetch import Prefetcher, PrefetchedAnalysis
+from mass_api_client.resources import AnalysisSystemInstance
+
+
+class PrefetchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MassStandInServer(sample_count=6, scheduled_analysis_count=6, file_size=1000)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+        self.instance = AnalysisSystemInstance.get('instance')
+
+    def test_handles_wrap_scheduled_analyses(self):
+        scheduled_analyses = self.instance.get_scheduled_analyses()
+        handles = []
+        for handle in Prefetcher(scheduled_analyses, lookahead=2):
+            with handle:
+                self.assertIsInstance(handle, PrefetchedAnalysis)
+                self.assertEqual(handle.scheduled_analysis.sample, handle.sample)
+                sample = handle.get_sample()
+                self.assertTrue(handle.sample.endswith('/sample/{}/'.format(sample.id)))
+
+                requests_before = self.server.request_count
+                with sample.temporary_file() as f:
+                    self.assertEqual(self.server.files[sample.id], f.read())
+                    self.assertEqual(1000, os.path.getsize(f.name))
+                self.assertEqual(requests_before, self.server.request_count)
+                handles.append(handle)
+
+        self.assertEqual([s.id for s in scheduled_analyses], [h.id for h in handles])
+        self.assertIsNone(handles[0].file)
+
+    def test_files_are_downloaded_ahead(self):
+        prefetcher = Prefetcher(self.instance.get_scheduled_analyses(), lookahead=3)
+        iterator = iter(prefetcher)
+        first = next(iterator)
+        for _ in range(100):
+            if prefetcher.bytes_in_use == 4000:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(4000, prefetcher.bytes_in_use)
+        first.close()
+        iterator.close()
+        self.assertEqual(0, prefetcher.bytes_in_use)
+
+    def test_budget_limits_downloaded_bytes(self):
+        prefetcher = Prefetcher(self.instance.get_scheduled_analyses(), lookahead=5, max_bytes=2500)
+        maximum = 0
+        count = 0
+        for handle in prefetcher:
+            maximum = max(maximum, prefetcher.bytes_in_use)
+            handle.close()
+            count += 1
+        self.assertEqual(6, count)
+        self.assertLessEqual(maximum, 2500)
+
+    def test_open_handles_do_not_stall_the_iteration(self):
+        prefetcher = Prefetcher(self.instance.get_scheduled_analyses(), lookahead=3, max_bytes=1500)
+        handles = []
+        thread = threading.Thread(target=lambda: handles.extend(prefetcher), daemon=True)
+        thread.start()
+        thread.join(10)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(6, len(handles))
+        self.assertEqual(0, prefetcher.bytes_in_use)
+        for handle in handles:
+            self.assertEqual(1000, os.path.getsize(handle.file.name))
+            handle.close()
+
+    def test_errors_are_raised_by_get_sample(self):
+        scheduled_analyses = self.instance.get_scheduled_analyses()
+        self.server.samples.pop(scheduled_analyses[0].sample.rstrip('/').rsplit('/', 1)[1])
+
+        handles = list(Prefetcher(scheduled_analyses))
+        with self.assertRaises(Exception):
+            handles[0].get_sample()
+        self.assertIsNotNone(handles[1].get_sample())
+        for handle in handles:
+            handle.close()
+
+    @mock.patch('time.sleep', side_effect=InterruptedError)
+    def test_process_analyses_with_prefetch(self, mocked_sleep):
+        sizes = []
+
+        def analysis_method(scheduled_analysis):
+            with scheduled_analysis.get_sample().temporary_file() as f:
+                sizes.append(os.path.getsize(f.name))
+            scheduled_analysis.create_report(json_report_objects={'size': ('size', {'size': sizes[-1]})})
+
+        with self.assertRaises(InterruptedError):
+            utils.process_analyses(self.instance, analysis_method, 0, prefetch=2)
+
+        self.assertEqual([1000] * 6, sizes)
+        self.assertEqual(0, len(self.server.scheduled_analyses))
@@ -0,0 +1,98 @@
+import json
+import unittest
+from datetime import datetime
+
+from httmock import all_requests, HTTMock
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager
+from mass_api_client.resources import Sample, FileSample, QuerySet
+from tests.httmock_test_case import HTTMockTestCase
+
+
+class QuerySetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MassStandInServer(sample_count=23, page_size=5)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+        self.ids = list(self.server.samples)
+
+    def test_query_is_lazy(self):
+        query_set = Sample.query(tags__all='sample-type:filesample')
+        self.assertIsInstance(query_set, QuerySet)
+        self.assertEqual(0, self.server.request_count)
+        self.assertEqual(self.ids, [sample.id for sample in query_set])
+
+    def test_slicing_fetches_only_the_requested_objects(self):
+        self.assertEqual(self.ids[:3], [sample.id for sample in Sample.query()[:3]])
+        self.assertEqual(1, self.server.request_count)
+
+        self.assertEqual(self.ids[10:20], [sample.id for sample in Sample.query()[10:20]])
+        self.assertEqual(self.ids[7:12], [sample.id for sample in Sample.query()[5:][2:7]])
+        self.assertEqual(self.ids[20:], [sample.id for sample in Sample.query()[20:30]])
+        self.assertEqual(self.ids[4], Sample.query()[4].id)
+        self.assertEqual([], list(Sample.query()[3:3]))
+        with self.assertRaises(IndexError):
+            Sample.query()[30]
+
+    def test_open_ended_slices(self):
+        self.assertEqual(self.ids[20:], [sample.id for sample in Sample.query()[20:]])
+        self.assertEqual(self.ids[7:], [sample.id for sample in Sample.query()[7:]])
+        self.assertEqual(self.ids[7:], [sample.id for sample in Sample.query()[7:].iterator(chunk_size=4)])
+        self.assertEqual([], list(Sample.query()[30:]))
+
+    def test_limit(self):
+        self.assertEqual(self.ids[:8], [sample.id for sample in Sample.query().limit(8)])
+        self.assertEqual(self.ids[:8], [sample.id for sample in Sample.query().limit(8).iterator(chunk_size=3)])
+
+    def test_count(self):
+        self.assertEqual(23, Sample.query().count())
+        self.assertEqual(1, self.server.request_count)
+        self.assertEqual(10, Sample.query()[:10].count())
+        self.assertEqual(3, Sample.query()[20:].limit(10).count())
+
+    def test_count_without_metadata(self):
+        self.server.include_count = False
+        self.assertEqual(23, Sample.query().count())
+
+    def test_first_and_exists(self):
+        self.assertEqual(self.ids[0], Sample.query().first().id)
+        self.assertTrue(Sample.query().exists())
+        self.assertIsNone(FileSample.query(md5sum='unknown').first())
+        self.assertFalse(FileSample.query(md5sum='unknown').exists())
+        self.assertFalse(Sample.query()[30:].exists())
+
+    def test_iterator_with_chunk_size(self):
+        self.assertEqual(self.ids, [sample.id for sample in Sample.query().iterator(chunk_size=10)])
+        self.assertEqual(3, self.server.request_count)
+
+    def test_chained_filters(self):
+        sample = self.server.add_file_sample(b'unique content', tags=['tag:unique'])
+        query_set = FileSample.query(tags__all='tag:unique').filter(md5sum=sample['md5sum'])
+        self.assertEqual([sample['id']], [sample.id for sample in query_set])
+
+    def test_invalid_operations(self):
+        with self.assertRaises(ValueError):
+            Sample.query().filter(invalid_filter='example')
+        with self.assertRaises(ValueError):
+            Sample.query()[:5].filter(tags__all='tag')
+        with self.assertRaises(ValueError):
+            Sample.query()[-1]
+        with self.assertRaises(ValueError):
+            Sample.query()[::2]
+
+
+class QuerySetParametersTestCase(HTTMockTestCase):
+    def test_limit_is_sent_as_page_size(self):
+        requests = []
+
+        @all_requests
+        def mass_mock(url, request):
+            requests.append(request.original.params)
+            return json.dumps({'count': 100, 'next': None, 'previous': None, 'results': []})
+
+        with HTTMock(mass_mock):
+            list(Sample.query(delivery_date__gte=datetime(2016, 11, 8, 17, 3, 46))[20:30])
+
+        self.assertEqual([{'delivery_date__gte': '2016-11-08T17:03:46+00:00', 'per_page': 10, 'page': 3}], requests)
@@ -0,0 +1,92 @@
+import threading
+import unittest
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager
+from mass_api_client.relation_writer import RelationWriter, relation_class
+from mass_api_client.resources import SsdeepSampleRelation, DroppedBySampleRelation, FileSample
+
+
+class RelationWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MassStandInServer(sample_count=10, report_count=0)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+        self.urls = [sample.url for sample in FileSample.items()]
+
+    def test_relation_class(self):
+        self.assertIs(SsdeepSampleRelation, relation_class('ssdeep'))
+        self.assertIs(DroppedBySampleRelation, relation_class('DroppedBySampleRelation'))
+        self.assertIs(DroppedBySampleRelation, relation_class(DroppedBySampleRelation))
+        for relation_type in ('unknown', 'SampleRelation', 'FileSample'):
+            with self.assertRaises(ValueError):
+                relation_class(relation_type)
+
+    def test_relations_are_created(self):
+        with RelationWriter(max_workers=4) as writer:
+            for other in self.urls[1:]:
+                self.assertTrue(writer.write(self.urls[0], other, 'ssdeep', {'match': 80}))
+            writer.write_many([(self.urls[1], self.urls[2], 'dropped_by')])
+
+        self.assertEqual(10, writer.stats.created)
+        self.assertEqual(10, len(self.server.sample_relations))
+        relations = list(self.server.sample_relations.values())
+        ssdeep = [r for r in relations if r['_cls'] == 'SampleRelation.SsdeepSampleRelation']
+        self.assertEqual(9, len(ssdeep))
+        self.assertTrue(all(r['match'] == 80 for r in ssdeep))
+        self.assertIn('10 relations', writer.stats.summary())
+
+    def test_duplicates_and_existing_relations_are_skipped(self):
+        sample_ids = list(self.server.samples)
+        self.server.add_sample_relation(sample_ids[0], sample_ids[1], 'ssdeep', match=50)
+
+        with RelationWriter(max_workers=2) as writer:
+            writer.write(self.urls[0], self.urls[1], 'ssdeep', {'match': 50})
+            writer.write(self.urls[0], self.urls[2], 'ssdeep', {'match': 60})
+            self.assertFalse(writer.write(self.urls[0], self.urls[2], 'ssdeep', {'match': 60}))
+            writer.write(self.urls[0], self.urls[1], 'dropped_by')
+
+        stats = writer.stats
+        self.assertEqual((4, 2, 1, 1, 0), (stats.submitted, stats.created, stats.existing, stats.duplicates,
+                                           stats.failed))
+        self.assertEqual(3, len(self.server.sample_relations))
+
+    def test_errors_are_collected(self):
+        with RelationWriter(max_workers=2, skip_existing=False) as writer:
+            writer.write(self.urls[0], self.server.base_url + 'sample/missing/', 'dropped_by')
+            writer.write(self.urls[0], self.urls[1], 'dropped_by')
+
+        self.assertEqual((1, 1), (writer.stats.created, writer.stats.failed))
+        key, error = writer.stats.errors[0]
+        self.assertEqual(('SampleRelation.DroppedBySampleRelation', self.urls[0],
+                          self.server.base_url + 'sample/missing/'), key)
+
+    def test_backpressure(self):
+        release = threading.Event()
+        writer = RelationWriter(max_workers=1, queue_size=2, skip_existing=False)
+        original = writer._submit
+
+        def blocked_submit(*args):
+            release.wait()
+            original(*args)
+
+        writer._submit = blocked_submit
+        producer = threading.Thread(target=writer.write_many,
+                                    args=([(self.urls[0], other, 'dropped_by') for other in self.urls[1:]],))
+        producer.start()
+        producer.join(0.2)
+        # One relation is being submitted and two are queued.
+        self.assertTrue(producer.is_alive())
+        self.assertEqual(2, writer._queue.qsize())
+
+        release.set()
+        producer.join(5)
+        writer.close()
+        self.assertEqual(9, writer.stats.created)
+
+    def test_write_after_close(self):
+        writer = RelationWriter(max_workers=1)
+        writer.close()
+        with self.assertRaises(ValueError):
+            writer.write(self.urls[0], self.urls[1], 'ssdeep', {'match': 1})
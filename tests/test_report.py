@@ -1,6 +1,10 @@
 import json
+import threading
+
+from httmock import urlmatch, HTTMock
 
 from mass_api_client.resources import Report
+from tests.httmock_test_case import HTTMockTestCase
 from tests.serialization_test_case import SerializationTestCase
 
 
@@ -10,3 +14,99 @@ class ReportTestCase(SerializationTestCase):
             data = json.load(data_file)
 
         self.assertEqualAfterSerialization(Report, data)
+
+
+class JSONReportsTestCase(HTTMockTestCase):
+    def setUp(self):
+        super(JSONReportsTestCase, self).setUp()
+        self.requested = []
+        self.lock = threading.Lock()
+
+    def create_report(self, report_id, keys):
+        with open('tests/data/report.json') as f:
+            data = json.load(f)
+        data['json_report_objects'] = {
+            key: 'http://localhost/api/report/{}/json_report_object/{}/'.format(report_id, key) for key in keys}
+        return Report._create_instance_from_data(Report._deserialize(data))
+
+    def mass_mock(self):
+        @urlmatch(netloc=r'localhost', path=r'/api/report/\w+/json_report_object/\w+/')
+        def mass_mock_report_object(url, request):
+            self.assertAuthorized(request)
+            key = url.path.rstrip('/').rsplit('/', 1)[1]
+            with self.lock:
+                self.requested.append(url.path)
+            return json.dumps({} if key == 'empty' else {'key': key})
+
+        return HTTMock(mass_mock_report_object)
+
+    def test_report_objects_are_loaded_lazily(self):
+        report = self.create_report('1', ['a', 'b', 'empty'])
+
+        with self.mass_mock():
+            self.assertEqual(['a', 'b', 'empty'], sorted(report.json_reports))
+            self.assertEqual([], self.requested)
+            self.assertEqual({'key': 'a'}, report.json_reports['a'])
+            self.assertEqual({'key': 'a'}, report.json_reports['a'])
+            self.assertEqual({}, report.json_reports['empty'])
+            self.assertEqual({}, report.json_reports['empty'])
+
+        self.assertEqual(2, len(self.requested))
+        self.assertFalse(report.json_reports.is_loaded('b'))
+        with self.assertRaises(KeyError):
+            report.json_reports['missing']
+
+    def test_fetching_all_report_objects(self):
+        report = self.create_report('1', ['a', 'b', 'c', 'empty'])
+
+        with self.mass_mock():
+            report.json_reports['a']
+            json_reports = report.fetch_json_reports(max_workers=3)
+            self.assertEqual({'a': {'key': 'a'}, 'b': {'key': 'b'}, 'c': {'key': 'c'}, 'empty': {}}, json_reports)
+
+        self.assertEqual(4, len(self.requested))
+
+    def test_fetching_selected_report_objects(self):
+        report = self.create_report('1', ['a', 'b', 'c'])
+
+        with self.mass_mock():
+            report.fetch_json_reports(keys=['b', 'c'])
+
+        self.assertEqual(['b', 'c'], sorted(path.split('/')[-2] for path in self.requested))
+
+    def test_each_report_has_its_own_cache(self):
+        first = self.create_report('1', ['a'])
+        second = self.create_report('2', ['a'])
+
+        with self.mass_mock():
+            first.json_reports['a']
+            second.json_reports['a']
+
+        self.assertEqual(2, len(self.requested))
+
+    def test_preloading_a_page_of_reports(self):
+        reports = [self.create_report(str(i), ['a', 'b']) for i in range(5)]
+
+        with self.mass_mock():
+            Report.preload_json_reports(reports, keys=['a'])
+
+        self.assertEqual(5, len(self.requested))
+        for report in reports:
+            self.assertTrue(report.json_reports.is_loaded('a'))
+            self.assertFalse(report.json_reports.is_loaded('b'))
+
+
+class StreamingJSONReportTestCase(HTTMockTestCase):
+    def test_iterating_json_report_object(self):
+        with open('tests/data/report.json') as f:
+            report = Report._create_instance_from_data(Report._deserialize(json.load(f)))
+
+        @urlmatch(netloc=r'localhost', path=r'/api/report/58362185a7a7f10843133337/json_report_object/found_strings/')
+        def mass_mock_report_object(url, request):
+            self.assertAuthorized(request)
+            return json.dumps({'strings': ['a', 'b', 'c'], 'count': 3})
+
+        with HTTMock(mass_mock_report_object):
+            strings = report.iter_json_report_object('found_strings', path='strings.item', chunk_size=4)
+            self.assertEqual(['a', 'b', 'c'], list(strings))
+            self.assertEqual([3], list(report.iter_json_report_object('found_strings', path='count')))
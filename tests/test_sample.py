@@ -54,6 +54,52 @@ class FileSampleTestCase(SerializationTestCase, HTTMockTestCase):
                 f.seek(0)
                 self.assertEqual(f.read(), b'Content')
 
+    def _file_sample(self):
+        with open('tests/data/file_sample.json') as data_file:
+            data = json.load(data_file)
+        return FileSample._create_instance_from_data(data)
+
+    def test_open(self):
+        @urlmatch()
+        def mass_mock(url, req):
+            return b'Content'
+
+        file_sample = self._file_sample()
+        with HTTMock(mass_mock):
+            with file_sample.open() as f:
+                self.assertIsInstance(f, tempfile.SpooledTemporaryFile)
+                self.assertFalse(f._rolled)
+                self.assertEqual(f.read(), b'Content')
+            with file_sample.open(threshold=4) as f:
+                self.assertTrue(f._rolled)
+                self.assertEqual(f.read(), b'Content')
+            self.assertEqual(file_sample.read_bytes(), b'Content')
+
+    def test_view(self):
+        @urlmatch()
+        def mass_mock(url, req):
+            return b'Content'
+
+        file_sample = self._file_sample()
+        with HTTMock(mass_mock):
+            for threshold in (None, 4):
+                with file_sample.view(threshold=threshold) as view:
+                    self.assertTrue(view.readonly)
+                    self.assertEqual(view.tobytes(), b'Content')
+                self.assertRaises(ValueError, view.tobytes)
+
+    def test_local_file_is_used(self):
+        file_sample = self._file_sample()
+        with tempfile.NamedTemporaryFile() as local_file:
+            local_file.write(b'Local')
+            local_file.flush()
+            file_sample._local_file = local_file
+            with file_sample.open() as f:
+                self.assertEqual(f.read(), b'Local')
+            self.assertEqual(file_sample.read_bytes(), b'Local')
+            with file_sample.view() as view:
+                self.assertEqual(view.tobytes(), b'Local')
+
 
 class ExecutableBinarySampleTestCase(SerializationTestCase):
     def test_is_data_correct_after_serialization(self):
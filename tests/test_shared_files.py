@@ -0,0 +1,107 @@
+import hashlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager, utils
+from mass_api_client.resources import AnalysisSystemInstance, ScheduledAnalysis
+from mass_api_client.shared_files import SharedFileAnalyzer, share_sample, MMAP, SHARED_MEMORY
+
+
+def digest_analysis(sample, data):
+    sha256sum = hashlib.sha256(data).hexdigest()
+    if not data.readonly or sha256sum != sample.sha256sum:
+        raise ValueError('Unexpected data')
+    return {'json_report_objects': {'digest': ('digest', {'sha256sum': sha256sum})}}
+
+
+def failing_analysis(sample, data):
+    raise RuntimeError('analysis failed')
+
+
+def crashing_analysis(sample, data):
+    os._exit(1)
+
+
+class SharedFilesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MassStandInServer(sample_count=5, scheduled_analysis_count=5, file_size=5000)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+        self.instance = AnalysisSystemInstance.get('instance')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _sample(self):
+        return self.instance.get_scheduled_analyses()[0].get_sample()
+
+    def test_share_sample(self):
+        sample = self._sample()
+        for backend in (SHARED_MEMORY, MMAP):
+            segment = share_sample(sample, backend, self.directory.name)
+            with segment.shared_file.open() as data:
+                self.assertTrue(data.readonly)
+                self.assertEqual(self.server.files[sample.id], data.tobytes())
+            segment.unlink()
+            segment.unlink()
+            self.assertIsNone(segment.shared_file)
+        self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            SharedFileAnalyzer(digest_analysis, backend='pipe')
+
+    def test_analyzer_creates_reports(self):
+        for backend in (SHARED_MEMORY, MMAP):
+            server_reports = len(self.server.reports)
+            with SharedFileAnalyzer(digest_analysis, processes=2, backend=backend, directory=self.directory.name) as a:
+                self.assertEqual((5, 0), a.run(self.instance.get_scheduled_analyses()))
+            self.assertEqual(0, len(self.server.scheduled_analyses))
+            self.assertEqual(server_reports + 5, len(self.server.reports))
+            self.assertEqual([], os.listdir(self.directory.name))
+            for sample_id in self.server.samples:
+                self.server.add_scheduled_analysis(sample_id)
+
+    def test_failed_analyses_are_cleaned_up(self):
+        with SharedFileAnalyzer(failing_analysis, processes=2, backend=MMAP, directory=self.directory.name) as a:
+            with self.assertLogs('mass_api_client.shared_files', 'ERROR'):
+                self.assertEqual((0, 5), a.run(self.instance.get_scheduled_analyses()))
+        self.assertEqual(5, len(self.server.scheduled_analyses))
+        self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_failed_reports_are_counted(self):
+        create_report = ScheduledAnalysis.create_report
+        calls = []
+
+        def flaky_create_report(scheduled_analysis, **kwargs):
+            calls.append(scheduled_analysis)
+            if len(calls) == 1:
+                raise RuntimeError('Service unavailable')
+            return create_report(scheduled_analysis, **kwargs)
+
+        with mock.patch.object(ScheduledAnalysis, 'create_report', flaky_create_report):
+            with SharedFileAnalyzer(digest_analysis, processes=2, backend=MMAP, directory=self.directory.name) as a:
+                with self.assertLogs('mass_api_client.shared_files', 'ERROR'):
+                    self.assertEqual((4, 1), a.run(self.instance.get_scheduled_analyses()))
+        self.assertEqual(1, len(self.server.scheduled_analyses))
+        self.assertEqual([], os.listdir(self.directory.name))
+
+    def test_crashed_process_is_cleaned_up(self):
+        with SharedFileAnalyzer(crashing_analysis, processes=1, backend=MMAP, directory=self.directory.name) as a:
+            with self.assertLogs('mass_api_client.shared_files', 'ERROR'):
+                reports, failed = a.run(self.instance.get_scheduled_analyses())
+            self.assertEqual(0, reports)
+            self.assertGreater(failed, 0)
+            self.assertEqual([], os.listdir(self.directory.name))
+
+            a.analysis_function = digest_analysis
+            self.assertEqual((5, 0), a.run(self.instance.get_scheduled_analyses()))
+
+    @mock.patch('time.sleep', side_effect=InterruptedError)
+    def test_process_analyses_in_pool(self, mocked_sleep):
+        with self.assertRaises(InterruptedError):
+            utils.process_analyses_in_pool(self.instance, digest_analysis, 0, processes=2)
+        self.assertEqual(0, len(self.server.scheduled_analyses))
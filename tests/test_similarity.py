@@ -0,0 +1,87 @@
+import unittest
+
+from benchmarks.mass_server import MassStandInServer
+from benchmarks.ssdeep_index import generate_corpus
+from mass_api_client import ConnectionManager
+from mass_api_client.resources import Sample
+from mass_api_client.similarity import SsdeepIndex, compare, parse_hash
+
+HASH1 = '3:AXGBicFlgVNhBGcL6wCrFQEv:AXGHsNhxLsr2C'
+HASH2 = '3:AXGBicFlIHBGcL6wCrFQEv:AXGH6xLsr2Cx'
+
+
+class CompareTestCase(unittest.TestCase):
+    def test_scores_match_ssdeep(self):
+        self.assertEqual(22, compare(HASH1, HASH2))
+        self.assertEqual(100, compare(HASH1, HASH1))
+        self.assertEqual(100, compare('96:abcdefgh:ij', '96:abcdefgh:xy'))
+        self.assertEqual(8, compare('3:abcdefgh:ij', '3:abcdefgh:xy'))
+        self.assertEqual(100, compare('3:abcdefgh:ij', '3:abcdefgh:ij'))
+        self.assertEqual(0, compare('96:abcdefghijkl:mn', '96:mnopqrstuvwx:yz'))
+
+    def test_block_sizes_must_be_compatible(self):
+        digest = 'FmYLhmXnqWkm7tvOvTCVH1SNPjvR5BXmGtTXrGdDSnYR'
+        # The second digest of a hash is computed at twice its block size.
+        self.assertEqual(100, compare('48:abc:{}'.format(digest), '96:{}:xyz'.format(digest)))
+        self.assertEqual(100, compare('96:{}:xyz'.format(digest), '48:abc:{}'.format(digest)))
+        self.assertEqual(0, compare('48:abc:{}'.format(digest), '192:{}:xyz'.format(digest)))
+
+    def test_parsing(self):
+        self.assertEqual((3, 'abbbc', 'de'), parse_hash('3:abbbbbbc:de,"file.bin"'))
+        for malformed in ['', '3:abc', 'x:abc:def', '1:abc:def', '3:{}:a'.format('a' * 65), None]:
+            with self.assertRaises(ValueError):
+                parse_hash(malformed)
+
+
+class SsdeepIndexTestCase(unittest.TestCase):
+    def test_matches_are_the_same_as_all_pairs(self):
+        hashes = generate_corpus(300, family_size=4, seed=1)
+        expected = {(i, j, compare(hashes[i], hashes[j])) for i in range(len(hashes)) for j in range(i)
+                    if compare(hashes[i], hashes[j]) >= 40}
+
+        index = SsdeepIndex(threshold=40)
+        found = {(i, j, score) for i, ssdeep_hash in enumerate(hashes) for j, score in index.add(i, ssdeep_hash)}
+
+        self.assertTrue(expected)
+        self.assertEqual(expected, found)
+        self.assertLess(index.comparisons, len(hashes) * (len(hashes) - 1) / 20)
+
+    def test_index_grows(self):
+        hashes = generate_corpus(500, seed=2)
+        small, sized = SsdeepIndex(), SsdeepIndex(capacity=len(hashes))
+        for i, ssdeep_hash in enumerate(hashes):
+            self.assertEqual(sized.add(i, ssdeep_hash), small.add(i, ssdeep_hash))
+        self.assertGreater(small._bucket_bits, 10)
+
+    def test_match_does_not_add(self):
+        index = SsdeepIndex(threshold=20)
+        self.assertEqual([], index.add('a', HASH1))
+        self.assertEqual([('a', 22)], index.match(HASH2))
+        self.assertEqual([], index.match(HASH2, threshold=30))
+        self.assertEqual(1, len(index))
+        self.assertEqual([], index.add('a', HASH2))
+        self.assertIn('a', index)
+
+    def test_threshold_is_validated(self):
+        for threshold in (0, 101):
+            with self.assertRaises(ValueError):
+                SsdeepIndex(threshold)
+
+
+class SampleRelationsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = MassStandInServer(sample_count=3, report_count=0)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+
+    def test_relations_of_new_samples(self):
+        samples = list(Sample.items())
+        index = SsdeepIndex()
+        relations = list(index.add_samples(samples))
+
+        urls = [sample.url for sample in samples]
+        self.assertEqual([(urls[1], urls[0], 'ssdeep', {'match': 100}),
+                          (urls[2], urls[0], 'ssdeep', {'match': 100}),
+                          (urls[2], urls[1], 'ssdeep', {'match': 100})], relations)
+        self.assertEqual([], index.add_sample(samples[0]))
@@ -0,0 +1,157 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from benchmarks.mass_server import MassStandInServer
+from mass_api_client import ConnectionManager
+from mass_api_client.metrics import Metrics
+from mass_api_client.resources import AnalysisSystemInstance
+from mass_api_client.supervisor import Supervisor, ScalingPolicy, available_memory
+
+MARKER_DIRECTORY = None
+
+
+def record_analysis(scheduled_analysis):
+    # Fails if the scheduled analysis has already been processed by another worker.
+    with open(os.path.join(MARKER_DIRECTORY, scheduled_analysis.id), 'x'):
+        pass
+    scheduled_analysis.create_report(json_report_objects={'id': ('id', {'id': scheduled_analysis.id})})
+
+
+def crash_once_analysis(scheduled_analysis):
+    try:
+        with open(os.path.join(MARKER_DIRECTORY, 'crashed'), 'x'):
+            pass
+    except FileExistsError:
+        return record_analysis(scheduled_analysis)
+    os._exit(3)
+
+
+def blocking_analysis(scheduled_analysis):
+    with open(os.path.join(MARKER_DIRECTORY, 'started-' + scheduled_analysis.id), 'x'):
+        pass
+    while not os.path.exists(os.path.join(MARKER_DIRECTORY, 'release')):
+        time.sleep(0.01)
+    record_analysis(scheduled_analysis)
+
+
+def release_blocked_analyses():
+    with open(os.path.join(MARKER_DIRECTORY, 'release'), 'x'):
+        pass
+
+
+class ScalingPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.policy = ScalingPolicy(min_workers=1, max_workers=8, drain_time=100, max_load=1.0,
+                                    min_available_memory=0.1)
+
+    def test_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            ScalingPolicy(min_workers=4, max_workers=2)
+
+    def test_idle(self):
+        self.assertEqual((1, 'idle'), self.policy.desired_workers(1, 0, 0.5))
+        self.assertEqual((0, 'idle'), ScalingPolicy(min_workers=0, max_workers=2).desired_workers(0, 0))
+
+    def test_scale_up_with_backlog(self):
+        # 2 workers processing 0.5 analyses per second each drain 1000 analyses in 1000 seconds.
+        self.assertEqual((8, 'backlog'), self.policy.desired_workers(2, 1000, 0.5))
+        self.assertEqual((4, 'backlog'), self.policy.desired_workers(2, 200, 0.5))
+        self.assertEqual((1, 'backlog'), ScalingPolicy(min_workers=0).desired_workers(0, 1, 0.5))
+
+    def test_unknown_rate(self):
+        self.assertEqual((3, 'backlog'), self.policy.desired_workers(2, 1000))
+
+    def test_scale_down_gradually(self):
+        self.assertEqual((5, 'idle'), self.policy.desired_workers(6, 0, 0.5))
+        self.assertEqual((5, 'backlog'), self.policy.desired_workers(6, 10, 0.5))
+
+    def test_host_headroom(self):
+        self.assertEqual((2, 'load'), self.policy.desired_workers(2, 1000, 0.5, load=1.5))
+        self.assertEqual((4, 'backlog'), self.policy.desired_workers(2, 200, 0.5, load=0.5, memory=0.5))
+        self.assertEqual((1, 'memory'), self.policy.desired_workers(2, 1000, 0.5, memory=0.05))
+        self.assertEqual((1, 'memory'), self.policy.desired_workers(1, 1000, 0.5, memory=0.05))
+
+    def test_available_memory(self):
+        with tempfile.NamedTemporaryFile('w') as meminfo:
+            meminfo.write('MemTotal:        1000 kB\nMemFree:          100 kB\nMemAvailable:     250 kB\n')
+            meminfo.flush()
+            self.assertEqual(0.25, available_memory(meminfo.name))
+        self.assertIsNone(available_memory('/nonexistent/meminfo'))
+
+
+class SupervisorTestCase(unittest.TestCase):
+    def setUp(self):
+        global MARKER_DIRECTORY
+        self.server = MassStandInServer(sample_count=4, scheduled_analysis_count=12, file_size=100)
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        ConnectionManager().register_connection('default', 'key', self.server.base_url)
+        self.instance = AnalysisSystemInstance.get('instance')
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        MARKER_DIRECTORY = directory.name
+
+    def supervise(self, analysis_method):
+        metrics = Metrics()
+        supervisor = Supervisor(self.instance, analysis_method, sleep_time=0.05,
+                                policy=ScalingPolicy(min_workers=1, max_workers=3), interval=0.05,
+                                metrics=metrics, shutdown_timeout=5)
+        thread = threading.Thread(target=supervisor.run)
+        thread.start()
+        deadline = time.monotonic() + 30
+        while self.server.scheduled_analyses and time.monotonic() < deadline:
+            time.sleep(0.05)
+        supervisor.stop()
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(0, supervisor.workers)
+        return supervisor, metrics
+
+    def test_all_analyses_are_processed_once(self):
+        supervisor, metrics = self.supervise(record_analysis)
+
+        self.assertEqual(0, len(self.server.scheduled_analyses))
+        self.assertEqual(12, len(os.listdir(MARKER_DIRECTORY)))
+        self.assertEqual(0, supervisor.restarts)
+        gauges = metrics.gauges()
+        self.assertIn('supervisor_workers', gauges)
+        self.assertIn('supervisor_backlog', gauges)
+        self.assertIn('supervisor_completed', gauges)
+
+    def test_crashed_workers_are_restarted(self):
+        supervisor, metrics = self.supervise(crash_once_analysis)
+
+        self.assertEqual(0, len(self.server.scheduled_analyses))
+        self.assertEqual(13, len(os.listdir(MARKER_DIRECTORY)))
+        self.assertGreaterEqual(supervisor.restarts, 1)
+
+    def test_analysis_of_a_crashed_worker_is_processed(self):
+        # The crashed analysis is the last one, so no later claim of the restarted worker replaces its stale claim.
+        for key in list(self.server.scheduled_analyses)[1:]:
+            del self.server.scheduled_analyses[key]
+        supervisor, metrics = self.supervise(crash_once_analysis)
+
+        self.assertEqual(0, len(self.server.scheduled_analyses))
+        self.assertEqual(2, len(os.listdir(MARKER_DIRECTORY)))
+        self.assertGreaterEqual(supervisor.restarts, 1)
+
+    def test_claim_slots_of_retiring_workers_are_not_reused(self):
+        supervisor = Supervisor(self.instance, blocking_analysis, sleep_time=0.05,
+                                policy=ScalingPolicy(min_workers=1, max_workers=2), shutdown_timeout=5)
+        self.addCleanup(supervisor.shutdown)
+        self.addCleanup(release_blocked_analyses)
+        supervisor._scale(2)
+        deadline = time.monotonic() + 10
+        while len(os.listdir(MARKER_DIRECTORY)) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        # The retiring worker is still busy with its analysis when the supervisor scales up again.
+        retiring = supervisor._workers[1]
+        supervisor._scale(1)
+        supervisor._scale(2)
+        self.assertTrue(retiring.is_alive())
+        self.assertNotEqual(supervisor._claim_slot_of[retiring], supervisor._claim_slot_of[supervisor._workers[1]])
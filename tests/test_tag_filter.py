@@ -0,0 +1,130 @@
+import itertools
+import json
+import random
+import unittest
+
+from mass_api_client.resources import AnalysisSystem
+from mass_api_client.tag_filter import TagFilter, TagFilterIndex
+
+TAGS = ['sample-type:filesample', 'sample-type:domainsample', 'tag:packed', 'tag:signed', 'tag:1']
+
+
+def _analysis_system(identifier, expression):
+    with open('tests/data/analysis_system.json') as data_file:
+        data = json.load(data_file)
+    data.update({'identifier_name': identifier, 'tag_filter_expression': expression})
+    return AnalysisSystem._create_instance_from_data(data)
+
+
+def _random_expression(rng, depth=3):
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice(TAGS)
+    choice = rng.random()
+    if choice < 0.2:
+        return 'not {}'.format(_random_expression(rng, depth - 1))
+    operator = 'and' if choice < 0.6 else 'or'
+    return '({} {} {})'.format(_random_expression(rng, depth - 1), operator, _random_expression(rng, depth - 1))
+
+
+def _evaluate(expression, tags):
+    # Reference semantics: the same precedence as Python's boolean operators.
+    words = expression.replace('(', ' ( ').replace(')', ' ) ').split()
+    return eval(' '.join(w if w in ('and', 'or', 'not', '(', ')') else repr(w in tags) for w in words))
+
+
+class TagFilterTestCase(unittest.TestCase):
+    def test_precedence(self):
+        tag_filter = TagFilter('tag:packed or tag:signed and not tag:1')
+        self.assertTrue(tag_filter({'tag:packed', 'tag:1'}))
+        self.assertTrue(tag_filter(['tag:signed']))
+        self.assertFalse(tag_filter({'tag:signed', 'tag:1'}))
+
+        tag_filter = TagFilter('(tag:packed OR tag:signed) AND NOT tag:1')
+        self.assertFalse(tag_filter({'tag:packed', 'tag:1'}))
+        self.assertTrue(tag_filter({'tag:packed'}))
+
+    def test_tags_are_exact_strings(self):
+        tag_filter = TagFilter("sample-type:filesample and not it's")
+        self.assertTrue(tag_filter({'sample-type:filesample'}))
+        self.assertFalse(tag_filter({'sample-type:filesample', "it's"}))
+        self.assertFalse(tag_filter({'sample-type:FileSample'}))
+        self.assertEqual({'sample-type:filesample', "it's"}, tag_filter.tags)
+
+    def test_empty_expression_matches_nothing(self):
+        for expression in ('', '  '):
+            self.assertFalse(TagFilter(expression)(set(TAGS)))
+
+    def test_invalid_expressions(self):
+        for expression in ('a b', '(a', 'a)', 'and', 'a or', 'not', '()', 'a and or b'):
+            with self.assertRaises(ValueError):
+                TagFilter(expression)
+
+    def test_random_expressions_match_reference(self):
+        rng = random.Random(0)
+        tag_sets = [set(tags) for n in range(len(TAGS) + 1) for tags in itertools.combinations(TAGS, n)]
+        for _ in range(200):
+            expression = _random_expression(rng)
+            tag_filter = TagFilter(expression)
+            for tags in tag_sets:
+                self.assertEqual(_evaluate(expression, tags), tag_filter(tags), (expression, tags))
+                if tag_filter(tags):
+                    for option in tag_filter.trigger_options:
+                        self.assertTrue(option & tags, (expression, tags))
+
+    def test_trigger_tags(self):
+        self.assertEqual({'a'}, TagFilter('a and not b').trigger_tags)
+        self.assertEqual({'a', 'b'}, TagFilter('a or b and c').trigger_tags)
+        self.assertEqual({'a'}, TagFilter('not not a').trigger_tags)
+        self.assertIsNone(TagFilter('a or not b').trigger_tags)
+        self.assertIsNone(TagFilter('not (a and b)').trigger_tags)
+        self.assertEqual([{'a'}, {'b', 'c'}], TagFilter('a and (b or c) and not d').trigger_options)
+
+
+class TagFilterIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.systems = [
+            _analysis_system('strings', 'sample-type:filesample'),
+            _analysis_system('unpacker', 'sample-type:filesample and tag:packed'),
+            _analysis_system('whois', 'sample-type:domainsample'),
+            _analysis_system('unsigned', 'not tag:signed'),
+            _analysis_system('manual', ''),
+        ]
+        self.index = TagFilterIndex()
+        self.index.add_analysis_systems(self.systems)
+
+    def match(self, tags):
+        return [system.identifier_name for system in self.index.match(tags)]
+
+    def test_matching_analysis_systems(self):
+        self.assertEqual(['strings', 'unpacker', 'unsigned'], self.match(['sample-type:filesample', 'tag:packed']))
+        self.assertEqual(['whois'], self.match({'sample-type:domainsample', 'tag:signed'}))
+        self.assertEqual(['unsigned'], self.match([]))
+        self.assertEqual(5, len(self.index))
+
+    def test_only_triggered_filters_are_evaluated(self):
+        self.assertEqual(1, self.index.candidates([]))
+        self.assertEqual(2, self.index.candidates(['sample-type:domainsample']))
+        # The unpacker is triggered by tag:packed, which fewer filters reference than the sample type.
+        self.assertEqual(2, self.index.candidates(['sample-type:filesample']))
+        self.assertEqual(3, self.index.candidates(['sample-type:filesample', 'tag:packed']))
+
+    def test_index_matches_all_filters(self):
+        rng = random.Random(1)
+        index = TagFilterIndex()
+        filters = [TagFilter(_random_expression(rng)) for _ in range(100)]
+        for i, tag_filter in enumerate(filters):
+            index.add(i, tag_filter)
+
+        for n in range(len(TAGS) + 1):
+            for tags in itertools.combinations(TAGS, n):
+                self.assertEqual([i for i, tag_filter in enumerate(filters) if tag_filter(tags)], index.match(tags))
+
+    def test_route_samples(self):
+        class FakeSample:
+            def __init__(self, tags):
+                self.tags = tags
+
+        samples = [FakeSample(['sample-type:filesample', 'tag:signed']), FakeSample(None)]
+        routes = [(sample, [system.identifier_name for system in systems])
+                  for sample, systems in self.index.route(samples)]
+        self.assertEqual([(samples[0], ['strings']), (samples[1], ['unsigned'])], routes)
@@ -0,0 +1,126 @@
+import json
+
+from httmock import urlmatch, HTTMock
+
+from mass_api_client import tracing
+from mass_api_client.resources import ScheduledAnalysis
+from tests.httmock_test_case import HTTMockTestCase
+
+
+class TracingTestCase(HTTMockTestCase):
+    def setUp(self):
+        super(TracingTestCase, self).setUp()
+        self.tracer = tracing.RecordingTracer()
+        tracing.set_tracer(self.tracer)
+        self.addCleanup(tracing.set_tracer, None)
+
+    def test_http_requests_are_child_spans_of_operations(self):
+        with open('tests/data/file_sample.json') as data_file:
+            sample_data = data_file.read()
+
+        @urlmatch(netloc=r'localhost')
+        def mass_mock(url, request):
+            if url.path.endswith('download/'):
+                return b'Content'
+            return sample_data
+
+        with open('tests/data/scheduled_analysis.json') as data_file:
+            scheduled_analysis = ScheduledAnalysis._create_instance_from_data(json.load(data_file))
+
+        with HTTMock(mass_mock):
+            with self.tracer.start_span('analysis') as root:
+                sample = scheduled_analysis.get_sample()
+                with sample.temporary_file():
+                    pass
+
+        operations = self.tracer.children(root)
+        self.assertEqual(['ScheduledAnalysis.get_sample', 'FileSample.download_to_file'], [s.name for s in operations])
+
+        get_request = self.tracer.children(operations[0])[0]
+        self.assertEqual('HTTP GET', get_request.name)
+        self.assertEqual('Sample', get_request.attributes['mass.resource'])
+        self.assertEqual(200, get_request.attributes['http.status_code'])
+        self.assertEqual(len(sample_data), get_request.attributes['http.response_content_length'])
+
+        download_request = self.tracer.children(operations[1])[0]
+        self.assertEqual('download', download_request.attributes['mass.operation'])
+        self.assertEqual(len(b'Content'), download_request.attributes['http.response_content_length'])
+        self.assertIsNotNone(download_request.duration)
+
+    def test_exceptions_are_recorded(self):
+        @urlmatch(netloc=r'localhost')
+        def mass_mock(url, request):
+            return {'status_code': 500, 'content': ''}
+
+        with HTTMock(mass_mock), self.assertRaises(Exception):
+            ScheduledAnalysis.get('1')
+
+        http_span, operation_span = self.tracer.spans
+        self.assertEqual('ScheduledAnalysis.get', operation_span.name)
+        self.assertEqual(500, http_span.attributes['http.status_code'])
+        self.assertIsNotNone(operation_span.exception)
+
+    def test_interleaved_and_abandoned_streams(self):
+        @urlmatch(netloc=r'localhost')
+        def mass_mock(url, request):
+            return json.dumps([url.path] * 3)
+
+        with HTTMock(mass_mock):
+            with self.tracer.start_span('analysis') as root:
+                a = self.connection.iter_json('a')
+                b = self.connection.iter_json('b')
+                self.assertEqual('/api/a', next(a))
+                self.assertEqual('/api/b', next(b))
+                self.assertEqual('/api/a', next(a))
+                with self.tracer.start_span('between') as between:
+                    pass
+                a.close()
+                self.assertEqual(['/api/b', '/api/b'], list(b))
+                # A stream which is never consumed up to its end.
+                abandoned = self.connection.iter_json('c')
+                next(abandoned)
+                del abandoned
+                with self.tracer.start_span('after') as after:
+                    pass
+
+        self.assertIs(root, between.parent)
+        self.assertIs(root, after.parent)
+        self.assertIsNone(root.parent)
+        requests = [s for s in self.tracer.children(root) if s.name == 'HTTP GET']
+        self.assertEqual(3, len(requests))
+        self.assertEqual({'http://localhost/api/a', 'http://localhost/api/b', 'http://localhost/api/c'},
+                         {s.attributes['http.url'] for s in requests})
+        self.assertTrue(all(s.duration is not None for s in requests))
+        self.assertEqual(['between', 'after', 'analysis'],
+                         [s.name for s in self.tracer.spans if s.name != 'HTTP GET'])
+
+    def test_default_detached_span(self):
+        class ForwardingTracer(tracing.Tracer):
+            def __init__(self, tracer):
+                self.tracer = tracer
+
+            def start_span(self, name, attributes=None):
+                return self.tracer.start_span(name, attributes)
+
+        span = ForwardingTracer(self.tracer).start_detached_span('detached', {'key': 'value'})
+        with self.tracer.start_span('other'):
+            pass
+        span.set_attribute('other_key', 'other value')
+        span.end()
+
+        other, detached = self.tracer.spans
+        self.assertEqual('detached', detached.name)
+        self.assertEqual('value', detached.attributes['key'])
+        self.assertEqual('other value', detached.attributes['other_key'])
+        self.assertIn('duration', detached.attributes)
+
+    def test_noop_tracer_is_default(self):
+        tracing.set_tracer(None)
+        self.assertFalse(tracing.get_tracer().enabled)
+
+    def test_tracer_must_implement_start_span(self):
+        class IncompleteTracer(tracing.Tracer):
+            pass
+
+        with self.assertRaises(TypeError):
+            IncompleteTracer()
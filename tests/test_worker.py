@@ -0,0 +1,209 @@
+import datetime
+import threading
+import unittest
+
+from mass_api_client.worker import MultiInstanceWorker
+
+
+class FakeScheduledAnalysis:
+    def __init__(self, url, priority=0, minute=0):
+        self.url = url
+        self.priority = priority
+        self.analysis_scheduled = datetime.datetime(2017, 1, 1, 0, minute)
+
+    def __repr__(self):
+        return self.url
+
+
+class FakeInstance:
+    def __init__(self, name, scheduled_analyses):
+        self.name = name
+        self.scheduled_analyses = scheduled_analyses
+
+    def get_scheduled_analyses(self):
+        return list(self.scheduled_analyses)
+
+
+def backlog(name, count, priority=0):
+    return [FakeScheduledAnalysis('{}/{}'.format(name, i), priority, i) for i in range(count)]
+
+
+class MultiInstanceWorkerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.order = []
+        self.lock = threading.Lock()
+
+    def analyze(self, instance):
+        def analysis_method(scheduled_analysis):
+            with self.lock:
+                self.order.append(scheduled_analysis.url)
+            instance.scheduled_analyses.remove(scheduled_analysis)
+        return analysis_method
+
+    def add(self, worker, instance, **kwargs):
+        worker.add_instance(instance, self.analyze(instance), **kwargs)
+
+    def test_instances_are_interleaved(self):
+        a = FakeInstance('a', backlog('a', 5))
+        b = FakeInstance('b', backlog('b', 2))
+        worker = MultiInstanceWorker(threads=1)
+        self.add(worker, a)
+        self.add(worker, b)
+        worker.run_once()
+        worker.close()
+
+        self.assertEqual(['a/0', 'b/0', 'a/1', 'b/1', 'a/2', 'a/3', 'a/4'], self.order)
+
+    def test_priority_and_schedule_time(self):
+        scheduled_analyses = [FakeScheduledAnalysis('a/late', 0, 5), FakeScheduledAnalysis('a/early', 0, 1)]
+        a = FakeInstance('a', scheduled_analyses)
+        b = FakeInstance('b', backlog('b', 2, priority=10))
+        worker = MultiInstanceWorker(threads=1)
+        self.add(worker, a)
+        self.add(worker, b)
+        worker.run_once()
+        worker.close()
+
+        self.assertEqual(['b/0', 'b/1', 'a/early', 'a/late'], self.order)
+
+    def test_idle_instance_does_not_catch_up(self):
+        a = FakeInstance('a', backlog('a', 4))
+        b = FakeInstance('b', [])
+        worker = MultiInstanceWorker(threads=1)
+        self.add(worker, a)
+        self.add(worker, b)
+        worker.poll()
+        # One analysis at a time, so that exactly a/0 and a/1 run before b has scheduled analyses.
+        for _ in range(2):
+            self.assertEqual(1, worker.dispatch())
+            with worker._condition:
+                worker._condition.wait_for(lambda: not worker.running)
+
+        b.scheduled_analyses.extend(backlog('b', 3))
+        worker.run_once()
+        worker.close()
+
+        self.assertEqual(['a/0', 'a/1', 'b/0', 'b/1', 'a/2', 'b/2', 'a/3'], self.order)
+
+    def test_concurrency_limits(self):
+        running = {'a': 0, 'b': 0}
+        maximum = {'a': 0, 'b': 0}
+        release = threading.Event()
+        lock = threading.Lock()
+
+        def analysis_method(scheduled_analysis):
+            name = scheduled_analysis.url.split('/')[0]
+            with lock:
+                running[name] += 1
+                maximum[name] = max(maximum[name], running[name])
+            release.wait()
+            with lock:
+                running[name] -= 1
+
+        worker = MultiInstanceWorker(threads=4)
+        worker.add_instance(FakeInstance('a', backlog('a', 6)), analysis_method, max_concurrency=1)
+        worker.add_instance(FakeInstance('b', backlog('b', 6)), analysis_method, max_concurrency=2)
+        threading.Timer(0.1, release.set).start()
+        worker.run_once()
+        worker.close()
+
+        self.assertEqual({'a': 1, 'b': 2}, maximum)
+
+    def test_instances_at_their_limit_are_not_scanned(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        a = FakeInstance('a', backlog('a', 50))
+        b = FakeInstance('b', backlog('b', 1))
+
+        started = []
+
+        def analysis_method(scheduled_analysis):
+            started.append(scheduled_analysis.url)
+            if scheduled_analysis.url.startswith('a/'):
+                release.wait()
+
+        worker = MultiInstanceWorker(threads=4)
+        worker.add_instance(a, analysis_method)
+        worker.add_instance(b, analysis_method)
+        worker.poll()
+        self.assertEqual(2, worker.dispatch())
+        with worker._condition:
+            worker._condition.wait_for(lambda: worker.running == 1)
+
+        # The remaining analyses of a are not popped while it is at its limit.
+        self.assertEqual(0, worker.dispatch())
+        self.assertEqual(49, len(worker._instances[0].queue))
+        self.assertEqual([], worker._ready)
+
+        # A higher priority analysis queued while a is at its limit is started first once a slot frees.
+        a.scheduled_analyses.append(FakeScheduledAnalysis('a/urgent', 10))
+        self.assertEqual(1, worker.poll())
+        release.set()
+        with worker._condition:
+            worker._condition.wait_for(lambda: not worker.running)
+        self.assertEqual(1, worker.dispatch())
+        self.assertEqual(49, worker.queued)
+        worker.close()
+        self.assertEqual(['a/0', 'b/0', 'a/urgent'], sorted(started[:2]) + started[2:])
+
+    def test_analyses_are_not_started_twice(self):
+        started = []
+        release = threading.Event()
+        a = FakeInstance('a', backlog('a', 2))
+
+        def analysis_method(scheduled_analysis):
+            started.append(scheduled_analysis.url)
+            release.wait()
+            a.scheduled_analyses.remove(scheduled_analysis)
+
+        worker = MultiInstanceWorker(threads=4)
+        worker.add_instance(a, analysis_method, max_concurrency=1)
+        self.assertEqual(2, worker.poll())
+        worker.dispatch()
+        self.assertEqual(0, worker.poll())
+        self.assertEqual(1, worker.queued)
+
+        # A poll which was sent before the analysis finished still returns it.
+        stale = a.get_scheduled_analyses()
+        release.set()
+        worker.run_once()
+        a.scheduled_analyses.extend(stale)
+        worker.run_once()
+        worker.close()
+
+        self.assertEqual(['a/0', 'a/1'], started)
+
+    def test_failed_analyses_are_retried(self):
+        attempts = []
+        a = FakeInstance('a', backlog('a', 1))
+
+        def analysis_method(scheduled_analysis):
+            attempts.append(scheduled_analysis.url)
+            if len(attempts) == 1:
+                raise RuntimeError('analysis failed')
+            a.scheduled_analyses.remove(scheduled_analysis)
+
+        worker = MultiInstanceWorker(threads=1)
+        worker.add_instance(a, analysis_method)
+        with self.assertLogs('mass_api_client.worker', 'ERROR'):
+            worker.run_once()
+        worker.run_once()
+        worker.close()
+
+        self.assertEqual(['a/0', 'a/0'], attempts)
+
+    def test_stop(self):
+        worker = MultiInstanceWorker(threads=1, sleep_time=60)
+        a = FakeInstance('a', backlog('a', 3))
+        self.add(worker, a)
+        thread = threading.Thread(target=worker.run)
+        thread.start()
+        for _ in range(200):
+            if len(self.order) == 3:
+                break
+            threading.Event().wait(0.01)
+        worker.stop()
+        thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(['a/0', 'a/1', 'a/2'], self.order)